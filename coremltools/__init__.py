@@ -104,6 +104,7 @@ from .converters import (
 from .converters.mil._deployment_compatibility import AvailableTarget as target
 from .converters.mil.mil.passes import quantization_passes as transform
 from .converters.mil.mil.passes.quantization_passes import ComputePrecision as precision
+from .converters.mil.mil.passes.pass_pipeline import PassPipeline
 
 try:
     from . import libcoremlpython
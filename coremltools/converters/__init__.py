@@ -7,6 +7,7 @@
 from . import libsvm
 from . import sklearn
 from . import xgboost
+from ._batch_convert import batch_convert
 from ._converters_entry import convert
 from .mil import (
     ClassifierConfig,
@@ -0,0 +1,180 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+import importlib as _importlib
+import multiprocessing as _multiprocessing
+import os as _os
+import sys as _sys
+import time as _time
+import traceback as _traceback
+from collections import namedtuple as _namedtuple
+from concurrent.futures import ProcessPoolExecutor as _ProcessPoolExecutor
+from concurrent.futures import as_completed as _as_completed
+
+try:
+    import resource as _resource
+except ImportError:
+    _resource = None
+
+from ._converters_entry import convert as _convert
+
+BatchConversionResult = _namedtuple(
+    "BatchConversionResult", ["index", "output_path", "error", "conversion_time", "peak_rss"]
+)
+BatchConversionResult.__doc__ = """
+Result of a job of ``batch_convert``.
+
+Attributes
+----------
+index: int
+    Index of the job in the list of jobs.
+
+output_path: str
+    Path the converted model is saved to.
+
+error: str or None
+    Traceback of the exception raised by the conversion or the saving of the model, if
+    the job failed.
+
+conversion_time: float
+    Time, in seconds, taken by the conversion and the saving of the model.
+
+peak_rss: int or None
+    Peak resident set size, in bytes, of the process which ran the job. On Linux, it is
+    measured from the start of the job. On other systems, it is the peak since the
+    process started, so it also covers the previous jobs of the worker. None if it
+    can't be measured.
+"""
+
+
+def _reset_peak_rss():
+    # Writing 5 to clear_refs resets the peak RSS (VmHWM) of the process on Linux
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _get_peak_rss():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if _resource is None:
+        return None
+    peak_rss = _resource.getrusage(_resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in kilobytes elsewhere
+    return peak_rss if _sys.platform == "darwin" else peak_rss * 1024
+
+
+def _init_worker(warm_imports):
+    for module_name in warm_imports:
+        _importlib.import_module(module_name)
+
+
+def _run_job(index, job):
+    kwargs = dict(job)
+    output_path = kwargs.pop("output_path")
+    _reset_peak_rss()
+    start = _time.perf_counter()
+    error = None
+    try:
+        _convert(**kwargs).save(output_path)
+    except Exception:
+        error = _traceback.format_exc()
+    conversion_time = _time.perf_counter() - start
+    return BatchConversionResult(index, output_path, error, conversion_time, _get_peak_rss())
+
+
+def batch_convert(jobs, num_workers=None, warm_imports=()):
+    """
+    Converts a batch of models in a pool of processes, and saves each converted model
+    as soon as it is converted.
+
+    A failing job doesn't stop the others: its error is reported in its result.
+
+    Parameters
+    ----------
+    jobs: list of dict
+        The conversions to run. Each job holds the keyword arguments of
+        ``coremltools.convert``, including ``model``, and ``output_path``: the path the
+        converted model is saved to (``.mlmodel`` for a neural network, ``.mlpackage``
+        for an ML program).
+
+        The jobs are pickled to be sent to the workers, so a PyTorch model is given as
+        the path of a TorchScript file, and a TensorFlow model as the path of a
+        SavedModel, ``.h5`` or ``.pb`` file.
+
+    num_workers: int (Optional)
+        Number of worker processes. Defaults to the number of CPUs. With 0, the jobs
+        run one after the other in the calling process.
+
+    warm_imports: list of str
+        Modules, such as ``"torch"``, imported by each worker when it starts, so that
+        the time taken to import the frontends is not counted in the first job of every
+        worker.
+
+    Returns
+    -------
+    iterator of BatchConversionResult
+        The results of the jobs, in the order in which they complete.
+
+    Examples
+    --------
+    .. sourcecode:: python
+
+        jobs = [
+            {
+                "model": "model.pt",
+                "inputs": [ct.TensorType(shape=(batch_size, 3, 224, 224))],
+                "output_path": "model_{}.mlpackage".format(batch_size),
+            }
+            for batch_size in (1, 8)
+        ]
+        for result in ct.converters.batch_convert(jobs, warm_imports=["torch"]):
+            print(result.output_path, result.error, result.conversion_time, result.peak_rss)
+
+    The workers are started with the ``spawn`` method, so a script calling
+    ``batch_convert`` must guard its entry point with ``if __name__ == "__main__":``.
+    """
+    jobs = list(jobs)
+    for index, job in enumerate(jobs):
+        if "output_path" not in job:
+            raise ValueError("Job {} has no output_path".format(index))
+    if num_workers is None:
+        num_workers = _os.cpu_count() or 1
+    if not isinstance(num_workers, int) or num_workers < 0:
+        raise ValueError("num_workers must be a non-negative integer, got {}".format(num_workers))
+
+    return _run_jobs(jobs, num_workers, list(warm_imports))
+
+
+def _run_jobs(jobs, num_workers, warm_imports):
+    if num_workers == 0:
+        _init_worker(warm_imports)
+        for index, job in enumerate(jobs):
+            yield _run_job(index, job)
+        return
+
+    # Forking a process which already runs threads (e.g. those of PyTorch) may deadlock
+    executor = _ProcessPoolExecutor(
+        max_workers=min(num_workers, max(len(jobs), 1)),
+        mp_context=_multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(warm_imports,),
+    )
+    futures = [executor.submit(_run_job, index, job) for index, job in enumerate(jobs)]
+    try:
+        for future in _as_completed(futures):
+            yield future.result()
+    finally:
+        # The jobs which didn't start are dropped if the results are not all consumed
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -21,6 +21,7 @@ from coremltools.converters.mil.input_types import (ClassifierConfig,
                                                     ImageType, InputType,
                                                     TensorType)
 from coremltools.converters.mil.mil import Program, types
+from coremltools.converters.mil.mil.passes.pass_pipeline import PassPipeline
 from coremltools.converters.mil.mil.passes.quantization_passes import \
     ComputePrecision as precision
 from coremltools.converters.mil.mil.passes.quantization_passes import \
@@ -57,6 +58,7 @@ def convert(
     compute_units=_ComputeUnit.ALL,
     package_dir=None,
     debug=False,
+    pass_pipeline=None,
 ):
     """
     Convert a TensorFlow or PyTorch model to the Core ML model format as either
@@ -264,12 +266,15 @@ def convert(
           support that type).
           ::
               coremltools.transform.FP16ComputePrecision(op_selector=
-                                                         lambda op:True)
+                                                         lambda op:True,
+                                                         in_place=True)
 
           The above transform iterates through all the ops, looking at each op's
           inputs and outputs. If they are of type float 32, ``cast``
           ops are injected to convert those tensors (also known as `vars`) to
-          type float 16.
+          type float 16. With ``in_place=True``, the dtype of the ops is changed
+          in place, and ``cast`` ops are only injected where float 16 tensors
+          meet float 32 ones.
 
         - ``coremltools.precision.FLOAT32`` enum: No transform is applied.
           
@@ -292,7 +297,8 @@ def convert(
 
           The above casts all the float32 tensors to be float 16, except
           the input/output tensors to any ``linear`` op. See more examples
-          below.
+          below. Pass ``in_place=True`` as well to speed up the transform of
+          large models.
 
         - ``None``: The default
             - When ``convert_to="mlprogram"``, the ``compute_precision`` parameter
@@ -349,6 +355,9 @@ def convert(
           rather than creating a temporary directory.
         * If not ``None``, this must be a path to a directory with the extension
           ``.mlpackage``.
+        * The weights of the model are written once, straight into the package. For
+          large models, providing ``package_dir`` is therefore cheaper than saving
+          the returned model to its final location.
 
     debug : bool
         This flag should generally be ``False`` except for debugging purposes.
@@ -359,6 +368,20 @@ def convert(
           - For Tensorflow conversion, it will cause to display extra logging
             and visualizations.
 
+    pass_pipeline : ``coremltools.PassPipeline``
+        The graph passes to run on the MIL program during conversion. Defaults to
+        ``None``, which runs the default ``coremltools.PassPipeline()``. Use it to
+        drop, reorder, or add graph passes:
+
+        .. sourcecode:: python
+
+            pipeline = ct.PassPipeline()
+            pipeline.remove_passes(["common::fuse_conv_batchnorm"])
+            mlmodel = ct.convert(model, pass_pipeline=pipeline)
+
+        The pipeline also sets how much the program is validated along the passes,
+        for instance ``ct.PassPipeline(validation_level="per_pass")``.
+
     Returns
     -------
     
@@ -421,16 +444,19 @@ def convert(
                                    exact_target, minimum_deployment_target)
 
     if compute_precision is None:
-        transforms = [FP16ComputePrecision(op_selector=lambda op: True)] if convert_to != "neuralnetwork" else list()
+        transforms = [FP16ComputePrecision(op_selector=lambda op: True, in_place=True)] if convert_to != "neuralnetwork" else list()
     elif compute_precision == precision.FLOAT32:
         transforms = list()
     elif compute_precision == precision.FLOAT16:
-        transforms = [FP16ComputePrecision(op_selector=lambda op: True)]
+        transforms = [FP16ComputePrecision(op_selector=lambda op: True, in_place=True)]
     elif isinstance(compute_precision, FP16ComputePrecision):
         transforms = [compute_precision]
     else:
         raise ValueError("Invalid value of the argument 'compute_precision'")
 
+    if pass_pipeline is not None and not isinstance(pass_pipeline, PassPipeline):
+        raise ValueError("Invalid value of the argument 'pass_pipeline', it must be a coremltools.PassPipeline")
+
     if package_dir is not None:
         _, ext = os.path.splitext(package_dir)
         if ext != _MLPACKAGE_EXTENSION:
@@ -454,6 +480,7 @@ def convert(
         package_dir=package_dir,
         debug=debug,
         specification_version=specification_version,
+        pass_pipeline=pass_pipeline,
     )
 
     if exact_target == 'milinternal':
@@ -461,7 +488,7 @@ def convert(
 
     if minimum_deployment_target is not None:
         check_deployment_compatibility(
-            spec=mlmodel.get_spec(),
+            spec=mlmodel.get_spec(read_only=True),
             representation=exact_target,
             deployment_target=minimum_deployment_target,
         )
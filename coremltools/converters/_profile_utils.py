@@ -59,12 +59,12 @@ def _profiler(frame, event, arg, indent=[0]):
                 " (" + ".".join(function_name.split(".")[2:-1]) + ")",
             )
         )
-        start_time = time.clock()
+        start_time = time.perf_counter()
         _FUNCTION_PROFILE_REGISTRY[function_name].append(start_time)
 
     elif event == "return" and profile_function:
-        duration = time.clock() - _FUNCTION_PROFILE_REGISTRY[function_name][-1]
-        duration = round(duration)
+        duration = time.perf_counter() - _FUNCTION_PROFILE_REGISTRY[function_name][-1]
+        duration = round(duration, 3)
         _pr_color(
             "{} exit {} {} ".format(
                 "<" + "=" * indent[0],
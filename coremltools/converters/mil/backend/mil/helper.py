@@ -283,17 +283,19 @@ def types_to_proto(valuetype):
 
 
 def create_file_value(output_var, blob_writer):
-    if output_var.val.dtype.kind == 'f' and output_var.val.dtype.itemsize == 4:
-        offset = blob_writer.write_float_data(output_var.val.flatten())
-    elif output_var.val.dtype.kind == 'f' and output_var.val.dtype.itemsize == 2:
-        output_var_fp16_to_bytes_to_uint16 = np.frombuffer(output_var.val.flatten().tobytes(), np.uint16)
-        offset = blob_writer.write_fp16_data(output_var_fp16_to_bytes_to_uint16)
-    elif output_var.val.dtype.kind == "u" and output_var.val.dtype.itemsize == 1:
-        offset = blob_writer.write_uint8_data(output_var.val.flatten())
-    elif output_var.val.dtype.kind == "i" and output_var.val.dtype.itemsize == 1:
-        offset = blob_writer.write_int8_data(output_var.val.flatten())
+    # The writer reads the data through the buffer protocol, so contiguous arrays are
+    # written without any intermediate copy.
+    val = np.ascontiguousarray(output_var.val)
+    if val.dtype.kind == 'f' and val.dtype.itemsize == 4:
+        offset = blob_writer.write_float_buffer(val)
+    elif val.dtype.kind == 'f' and val.dtype.itemsize == 2:
+        offset = blob_writer.write_fp16_buffer(val)
+    elif val.dtype.kind == "u" and val.dtype.itemsize == 1:
+        offset = blob_writer.write_uint8_buffer(val)
+    elif val.dtype.kind == "i" and val.dtype.itemsize == 1:
+        offset = blob_writer.write_int8_buffer(val)
     else:
-        raise TypeError("Unsupported type, {}, for net buffer serialization.".format(output_var.val.dtype))
+        raise TypeError("Unsupported type, {}, for net buffer serialization.".format(val.dtype))
 
     return create_file_value_tensor(
         file_name=os.path.join(os.path.join('@model_path', _WEIGHTS_DIR_NAME), _WEIGHTS_FILE_NAME),
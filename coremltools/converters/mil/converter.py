@@ -3,17 +3,18 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
-import tempfile as _tempfile
+import shutil as _shutil
 import warnings as _warnings
 
 from coremltools.converters._profile_utils import _profile
 from coremltools.converters.mil.mil import Builder as mb
 from coremltools.converters.mil.mil.passes.quantization_passes import \
     AbstractQuantizationPass
-from coremltools.converters.mil.mil.types.symbolic import (k_num_internal_syms,
-                                                           k_used_symbols)
+from coremltools.converters.mil.mil.types.symbolic import k_symbol_table
 from coremltools.models import MLModel
-from coremltools.models.model import _create_mlpackage
+from coremltools.models.utils import (_add_weights_dir_to_mlpackage,
+                                      _create_empty_mlpackage,
+                                      _set_mlpackage_root_model)
 
 from . import ImageType, InputType
 from .mil.passes.apply_common_pass_pipeline import apply_common_pass_pipeline
@@ -133,17 +134,16 @@ class MILProtoBackend:
 def _reset_conversion_state():
     '''
     Reset any stateful properties/variables that are populated during conversion.
+    The state is that of the current thread, so conversions may run in several threads.
     '''
 
     # Clear the "name_count" dict,
     # which is used to generate unique op names in the mil builder class.
     mb.name_count.clear()
 
-    # Clear "k_used_symbols" dict, and the int counter "k_num_internal_syms" that are used to track symbolic names
-    global k_used_symbols
-    global k_num_internal_syms
-    k_used_symbols.clear()
-    k_num_internal_syms = 0
+    # Clear the symbols by name. The numbers of the internal symbols keep increasing,
+    # so that they don't clash with the symbols of the inputs, created before.
+    k_symbol_table.used_symbols.clear()
 
 @_profile
 def mil_convert(
@@ -204,17 +204,23 @@ def _mil_convert(
         convert_to = registry.backend_alias_names[convert_to]
 
     if convert_to == 'mlprogram':
-        # mil_convert_to_proto places weight files inside the weights_dir
-        weights_dir = _tempfile.TemporaryDirectory()
-        kwargs["weights_dir"] = weights_dir.name
-
-    proto, mil_program = mil_convert_to_proto(
-                            model,
-                            convert_from,
-                            convert_to,
-                            registry,
-                            **kwargs
-                         )
+        # mil_convert_to_proto places weight files inside the weights_dir, which is the one of
+        # the final package, so that they are written once and never copied
+        package_path = _create_empty_mlpackage(kwargs.get("package_dir"))
+        kwargs["weights_dir"] = _add_weights_dir_to_mlpackage(package_path)
+
+    try:
+        proto, mil_program = mil_convert_to_proto(
+                                model,
+                                convert_from,
+                                convert_to,
+                                registry,
+                                **kwargs
+                             )
+    except:
+        if convert_to == 'mlprogram':
+            _shutil.rmtree(package_path, ignore_errors=True)
+        raise
 
     _reset_conversion_state()
 
@@ -224,9 +230,7 @@ def _mil_convert(
         return proto  # internal mil data structure
 
     elif convert_to == "mlprogram":
-        package_path = _create_mlpackage(
-            proto, kwargs.get("weights_dir"), kwargs.get("package_dir")
-        )
+        _set_mlpackage_root_model(package_path, proto)
         return modelClass(
             package_path,
             is_temp_package=not kwargs.get("package_dir"),
@@ -286,7 +290,7 @@ def mil_convert_to_proto(
         # Post training Quantization Passes not available on NN proto backend.
         passes = [p for p in kwargs.get("transforms", list()) if not isinstance(p, AbstractQuantizationPass)]
 
-    apply_common_pass_pipeline(prog, passes)
+    apply_common_pass_pipeline(prog, passes, pass_pipeline=kwargs.get("pass_pipeline"))
 
     if convert_to == 'milinternal':
         return None, prog # Returns (None, coremltools.converters.mil.Program)
@@ -3,8 +3,7 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
-import itertools
-from functools import partial
+from collections import defaultdict
 
 from coremltools.converters.mil.mil.passes.helper import block_context_manager
 
@@ -80,118 +79,256 @@ class Pattern:
     def op_list(self):
         return list(self.op_set)
 
-def _lists_op_equality(oplist1, oplist2):
-    if (len(oplist1) != len(oplist2)):
-        return False
+class _PatternNode:
+    """
+    An operation of a user defined pattern, compiled for matching: its op type, its
+    number of outputs, and the nodes of the child ops of each of its outputs, bucketed
+    by op type. The outputs are only looked at up to the first one without child ops,
+    which makes the operation the final operation of the pattern.
+    """
 
-    for i in range(len(oplist1)):
-        if oplist1[i].op_type != oplist2[i].op_type:
-            return False
+    __slots__ = ("name", "op_type", "num_outputs", "output_children", "is_final")
 
-    return True
+    def __init__(self, op):
+        self.name = op.name
+        self.op_type = op.op_type
+        self.num_outputs = len(op.outputs)
+        self.output_children = []
+        self.is_final = False
 
-def _pattern_detected(pattern, program_op, pattern_op, program_root_var, pattern_root_var, block):
-    # If the pattern_op is None, that means we are dealing with root_var checking (which don't have op_types or outputs)
-    if pattern_op is not None and program_op.op_type != pattern_op.op_type:
-        return False
 
-    if pattern_op is not None and len(program_op.outputs) != len(pattern_op.outputs):
-        return False
+def _child_signature(ops):
+    # Multiset of the op types of ops, which two lists of child ops must share to match
+    return tuple(sorted(op.op_type for op in ops))
 
-    for i in range(len(program_op.outputs) if pattern_op is not None else 1):
-        output_same = False
 
-        # ASSUMTION: Assumming that the outputs of an operation are ordered in a particular way
-        # So, two identical operations will have the same ordering of outputs.
-        program_child_op_list = list(program_op.outputs[i].child_ops) if pattern_op is not None else program_root_var.child_ops
-        pattern_child_op_list = list(pattern_op.outputs[i].child_ops) if pattern_op is not None else pattern_root_var.child_ops
+def _bucket_by_op_type(ops):
+    buckets = defaultdict(list)
+    for op in ops:
+        buckets[op.op_type].append(op)
+    return buckets
 
-        # Last op in the pattern
-        if len(pattern_child_op_list) == 0:
-            if pattern.final_op is not None and pattern.final_op != program_op:
-                raise ValueError("User defined pattern has more than one final operation")
-            pattern.set_final_op(pattern_op.name, program_op)
-            return True
 
-        if len(program_child_op_list) != len(pattern_child_op_list):
-            return False
+class _CompiledPattern:
+    """
+    A user defined pattern along with its var_constraints and transform_pattern
+    functions. The pattern is compiled once into a graph of _PatternNode, rooted at the
+    child ops of its root variable, so that matching it against a program only compares
+    op types, counts of outputs and multisets of child ops, without enumerating the
+    orders of the child ops.
 
-        # Permuting the program child operations so that at least one of the permutations will be in
-        # the exact same order as the pattern child operations
-        op_combos = list(itertools.permutations(pattern_child_op_list))
+    Calling it on a program fuses all the instances of the pattern in the program.
+    """
 
-        for combo in op_combos:
-            if _lists_op_equality(combo, program_child_op_list):
-                truly_equal = True
+    def __init__(self, ops_arrangement, var_constraints, transform_pattern):
+        self.var_constraints = var_constraints
+        self.transform_pattern = transform_pattern
+
+        root_var = list(ops_arrangement.functions.values())[0].function_inputs[0]
+        nodes = {}
+
+        def get_node(op):
+            if op in nodes:
+                return nodes[op]
+            node = _PatternNode(op)
+            nodes[op] = node
+            for output in op.outputs:
+                if len(output.child_ops) == 0:
+                    node.is_final = True
+                    break
+                node.output_children.append(
+                    _bucket_by_op_type([get_node(child_op) for child_op in output.child_ops])
+                )
+            return node
 
-                for i in range(len(combo)):
-                    truly_equal = truly_equal and _pattern_detected(pattern, program_child_op_list[i], combo[i], program_root_var, pattern_root_var, block)
+        self.root_children = _bucket_by_op_type(
+            [get_node(child_op) for child_op in root_var.child_ops]
+        )
+        self.root_signature = _child_signature(root_var.child_ops)
 
-                if truly_equal:
-                    # The operations in this sequence match perfectly with the pattern
-                    output_same = True
+    def __call__(self, prog):
+        _fuse_all_blocks_with_patterns([self], prog)
+
+    def _match_op(self, node, program_op, memo):
+        """
+        Returns the captured (name, program op) pairs, in post order, and the final op
+        if node matches program_op, None otherwise. Memoized in memo, since the pattern
+        is a DAG whose operations may be reached through several paths.
+        """
+        key = (node, program_op)
+        if key in memo:
+            return memo[key]
+        memo[key] = None
+
+        result = None
+        if program_op.op_type == node.op_type and len(program_op.outputs) == node.num_outputs:
+            captured, final_op = [], None
+            for output, pattern_children in zip(program_op.outputs, node.output_children):
+                children_result = self._match_children(pattern_children, output.child_ops, memo)
+                if children_result is None:
                     break
-
-        if output_same is False:
+                final_op = _merge_final_ops(final_op, children_result[1])
+                captured.extend(children_result[0])
+            else:
+                captured.append((node.name, program_op))
+                if node.is_final:
+                    final_op = _merge_final_ops(final_op, program_op)
+                result = (captured, final_op)
+
+        memo[key] = result
+        return result
+
+    def _match_bucket(self, nodes, program_ops, memo):
+        """
+        Finds an assignment of program_ops to the nodes (of the same op type) under
+        which every node matches its op, as a bipartite matching by augmenting paths.
+        Returns the list of the ops assigned to nodes, or None.
+        """
+        if len(nodes) == 1:
+            if self._match_op(nodes[0], program_ops[0], memo) is None:
+                return None
+            return program_ops
+
+        node_of_op = {}
+
+        def augment(i, visited):
+            for j, program_op in enumerate(program_ops):
+                if j in visited or self._match_op(nodes[i], program_op, memo) is None:
+                    continue
+                visited.add(j)
+                if j not in node_of_op or augment(node_of_op[j], visited):
+                    node_of_op[j] = i
+                    return True
             return False
 
-    if pattern_op is not None:
-        pattern.add_op(pattern_op.name, program_op)
-    return True
-
+        for i in range(len(nodes)):
+            if not augment(i, set()):
+                return None
+        assigned_ops = [None] * len(nodes)
+        for j, i in node_of_op.items():
+            assigned_ops[i] = program_ops[j]
+        return assigned_ops
+
+    def _match_children(self, pattern_children, program_child_ops, memo):
+        if sum(len(nodes) for nodes in pattern_children.values()) != len(program_child_ops):
+            return None
+        program_children = _bucket_by_op_type(program_child_ops)
+        if len(program_children) != len(pattern_children):
+            return None
+
+        captured, final_op = [], None
+        for op_type, nodes in pattern_children.items():
+            program_ops = program_children.get(op_type, [])
+            if len(program_ops) != len(nodes):
+                return None
+            assigned_ops = self._match_bucket(nodes, program_ops, memo)
+            if assigned_ops is None:
+                return None
+            for node, program_op in zip(nodes, assigned_ops):
+                op_captured, op_final_op = self._match_op(node, program_op, memo)
+                final_op = _merge_final_ops(final_op, op_final_op)
+                captured.extend(op_captured)
+        return captured, final_op
+
+    def match(self, root_var, block, memo):
+        """
+        Returns the Pattern captured from the child ops of root_var, or None if they
+        don't match the pattern.
+        """
+        result = self._match_children(self.root_children, root_var.child_ops, memo)
+        if result is None:
+            return None
+        captured, final_op = result
 
-# This function finds the root_variable in the program that matches with the root_variable in the pattern,
-# And then kicks off the pattern matching from there
-def _detect_pattern(program_op, ops_arrangement_root_var, block):
-    # The goal of this function is to find the root variable of both operations
-    program_op_inputs = program_op.get_flattened_inputs()
-
-    for potential_program_root_variable in program_op_inputs:
         pattern = Pattern()
         pattern.set_block(block)
+        pattern.set_root_var(root_var)
+        for name, program_op in captured:
+            if program_op is final_op:
+                pattern.set_final_op(name, program_op)
+            else:
+                pattern.add_op(name, program_op)
+
+        # check that none of the ops in this pattern is connected to the output
+        # (except the last one)
+        for op in pattern.op_list():
+            if op is not pattern.final_op:
+                for out in op.outputs:
+                    if out in pattern.block.outputs:
+                        return None
+        return pattern
+
+
+def _merge_final_ops(final_op, other_final_op):
+    if final_op is None:
+        return other_final_op
+    if other_final_op is not None and other_final_op is not final_op:
+        raise ValueError("User defined pattern has more than one final operation")
+    return final_op
+
+
+class _PatternIndex:
+    """
+    Compiled patterns keyed by the multiset of the op types of the child ops of their
+    root variable, so that each variable of a program is only matched against the
+    patterns which can start from it.
+    """
 
-        if _pattern_detected(pattern, program_op, ops_arrangement_root_var.op, potential_program_root_variable, ops_arrangement_root_var, block):
-            pattern.set_root_var(potential_program_root_variable)
-
-            # check that none of the ops in this pattern is connected to the output
-            # (except the last one)
-            for op in pattern.op_list():
-               if op is not pattern.final_op:
-                   for out in op.outputs:
-                       if out in pattern.block.outputs:
-                           return False, None
+    def __init__(self, compiled_patterns):
+        self._patterns_by_signature = defaultdict(list)
+        for compiled_pattern in compiled_patterns:
+            self._patterns_by_signature[compiled_pattern.root_signature].append(compiled_pattern)
+        self._num_children = set(len(signature) for signature in self._patterns_by_signature)
 
-            return True, pattern
+    def candidates(self, var):
+        if len(var.child_ops) not in self._num_children:
+            return []
+        return self._patterns_by_signature.get(_child_signature(var.child_ops), [])
 
-    return False, None
 
-@block_context_manager
-def _fuse_one_block(block, ops_arrangement, var_constraints, transform_pattern):
-    fusion_status = False
+def _fuse_one_block(block, pattern_index):
+    """
+    Fuses the first instance of any of the patterns in block, rooted at an input of
+    one of the ops of block, in the order of the ops. Returns whether it fused one.
+    """
+    tried_vars = set()
+    memo = {}
     for op in list(block.operations):
         for b in op.blocks:
-            block_changed = True
-            while block_changed:
-                block_changed = _fuse_one_block(b, ops_arrangement, var_constraints, transform_pattern)
+            _fuse_block_until_unchanged(b, pattern_index)
 
-        ops_arrangement_root_var = list(ops_arrangement.functions.values())[0].function_inputs[0]
-        fusion_status, pattern = _detect_pattern(op, ops_arrangement_root_var, block)
+        for root_var in op.get_flattened_inputs():
+            if root_var in tried_vars:
+                continue
+            tried_vars.add(root_var)
+            for compiled_pattern in pattern_index.candidates(root_var):
+                pattern = compiled_pattern.match(root_var, block, memo)
+                if pattern is not None and compiled_pattern.var_constraints(pattern):
+                    compiled_pattern.transform_pattern(pattern)
+                    return True
 
-        if fusion_status:
-            fusion_status &= var_constraints(pattern)
+    return False
 
-        if fusion_status:
-            transform_pattern(pattern)
-            return fusion_status
 
-    return fusion_status
+@block_context_manager
+def _fuse_block_until_unchanged(block, pattern_index):
+    # All the instances are fused under a single context of block, since exiting it is
+    # expensive
+    block_changed = True
+    while block_changed:
+        block_changed = _fuse_one_block(block, pattern_index)
 
 
-def fuse_all_blocks(ops_arrangement, var_constraints, transform_pattern, prog):
+def _fuse_all_blocks_with_patterns(compiled_patterns, prog):
+    pattern_index = _PatternIndex(compiled_patterns)
     for f in prog.functions.values():
-        block_changed = True
-        while block_changed:
-            block_changed = _fuse_one_block(f, ops_arrangement, var_constraints, transform_pattern)
+        _fuse_block_until_unchanged(f, pattern_index)
+
+
+def fuse_all_blocks(ops_arrangement, var_constraints, transform_pattern, prog):
+    _fuse_all_blocks_with_patterns(
+        [_CompiledPattern(ops_arrangement, var_constraints, transform_pattern)], prog
+    )
 
 
 class PassContainer():
@@ -203,19 +340,32 @@ class PassContainer():
         if len(self.passes) == 0:
             raise ValueError("no pass functions associated with " + self.pass_name)
 
+        # Consecutive patterns registered with register_generic_pass are matched together,
+        # in a single walk over the program
+        compiled_patterns = []
         for one_pass in self.passes:
+            if isinstance(one_pass, _CompiledPattern):
+                compiled_patterns.append(one_pass)
+                continue
+            if len(compiled_patterns) > 0:
+                _fuse_all_blocks_with_patterns(compiled_patterns, prog)
+                prog.validate()
+                compiled_patterns = []
             one_pass(prog)
             prog.validate()
 
+        if len(compiled_patterns) > 0:
+            _fuse_all_blocks_with_patterns(compiled_patterns, prog)
+            prog.validate()
+
     def add(self, pass_function):
         self.passes.append(pass_function)
 
 def register_generic_pass(ops_arrangement, var_constraints, transform_pattern, pass_name, namespace):
-    pass_function = partial(fuse_all_blocks, ops_arrangement, var_constraints, transform_pattern)
+    pass_function = _CompiledPattern(ops_arrangement, var_constraints, transform_pattern)
 
     pass_id = namespace + "::" + pass_name
     if pass_id not in pass_registry.PASS_REGISTRY or not isinstance(pass_registry.PASS_REGISTRY[pass_id], PassContainer):
         pass_registry.PASS_REGISTRY.passes[pass_id] = PassContainer(pass_name)
 
     pass_registry.PASS_REGISTRY[pass_id].add(pass_function)
-
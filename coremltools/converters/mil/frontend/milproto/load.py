@@ -16,6 +16,7 @@ from coremltools.converters.mil.mil import (Function, ListVar, Placeholder,
                                             Program, TupleInputType, Var,
                                             mil_list, types)
 from coremltools.converters.mil.mil.block import curr_block
+from coremltools.converters.mil.mil.lazy_value import FileValue
 from coremltools.converters.mil.mil.ops.registry import \
     SSAOpRegistry as _SSAOpRegistry
 from coremltools.proto import MIL_pb2 as pm
@@ -34,12 +35,13 @@ class TranscriptionContext:
     Holds shared variables needed for transcription.
     """
 
-    def __init__(self, weights_dir=""):
+    def __init__(self, weights_dir="", lazy_file_values=False):
         self.name_to_var = {} # mapping from name -> var object
         self.blob_reader_from_filename = (
             {}
         )  # mapping from filename -> BlobReader object
         self.weights_dir = weights_dir
+        self.lazy_file_values = lazy_file_values
 
     def register_var_with_name(self, name, var):
         var.name = name
@@ -91,7 +93,12 @@ def _load_immediate_value(immediatevalue_spec):
         )
 
 
-def _load_file_value(context, filevalue_spec, dtype):
+def _load_file_value(context, filevalue_spec, dtype, shape):
+    """
+    Returns a FileValue handle to the blob. The data is memory-mapped straight from the
+    weight file when the handle is materialized, instead of being copied out through
+    the reader.
+    """
     if BlobReader is None:
         raise RuntimeError("BlobReader not loaded")
     if not isinstance(filevalue_spec, pm.Value.BlobFileValue):
@@ -106,19 +113,25 @@ def _load_file_value(context, filevalue_spec, dtype):
         blob_reader = BlobReader(filename)
         context.blob_reader_from_filename[filename] = blob_reader
 
-    if dtype == types.uint8:
-        np_value = np.array(blob_reader.read_uint8_data(offset), np.uint8)
-    elif dtype == types.int8:
-        np_value = np.array(blob_reader.read_int8_data(offset), np.int8)
-    elif dtype == types.fp16:
-        np_value_uint16 = np.array(blob_reader.read_fp16_data(offset), np.uint16)
-        np_value = np.frombuffer(np_value_uint16.tobytes(), np.float16)
-    elif dtype == types.fp32:
-        np_value = np.array(blob_reader.read_float_data(offset), np.float32)
-    else:
+    if dtype not in (types.uint8, types.int8, types.fp16, types.fp32):
         raise ValueError("Invalid dtype for blob file value type")
 
-    return np_value
+    np_dtype = types.nptype_from_builtin(dtype)
+    data_size = blob_reader.get_data_size(offset)
+    expected_size = int(np.prod(shape)) * np.dtype(np_dtype).itemsize
+    if data_size != expected_size:
+        raise ValueError(
+            "Blob at offset {} in {} has {} bytes, expected {} bytes".format(
+                offset, filename, data_size, expected_size
+            )
+        )
+
+    return FileValue(
+        file_name=filename,
+        offset=blob_reader.get_data_offset(offset),
+        dtype=np_dtype,
+        shape=shape,
+    )
 
 
 def _load_value(context, value_spec):
@@ -139,7 +152,10 @@ def _load_value(context, value_spec):
         if value_spec.WhichOneof("value") == "immediateValue":
             value = _load_immediate_value(value_spec.immediateValue)
         else:
-            value = _load_file_value(context, value_spec.blobFileValue, dtype)
+            value = _load_file_value(context, value_spec.blobFileValue, dtype, shape)
+            if context.lazy_file_values:
+                return value
+            return value.materialize()
 
         if dtype in (types.fp16, types.int8, types.uint8, types.uint32):
             value = np.frombuffer(value, types.nptype_from_builtin(dtype)).reshape(
@@ -395,7 +411,14 @@ def _load_function(context, func_spec, spec_version):
     return pymil_func
 
 
-def load(model_spec, specification_version, file_weights_dir="", **kwargs):
+def load(model_spec, specification_version, file_weights_dir="", lazy_file_values=False, **kwargs):
+    """
+    Converts a MIL proto based ``model_spec`` into a pymil Program.
+
+    If ``lazy_file_values`` is True, const values stored in blob files are loaded as
+    FileValue handles, and only mapped into memory when ``Var.val`` is accessed. Passes
+    that never read weight values then run without paging in the weight file.
+    """
     if not isinstance(model_spec, ml.Model):
         raise TypeError("Invalid Model sepc object")
 
@@ -415,7 +438,7 @@ def load(model_spec, specification_version, file_weights_dir="", **kwargs):
     if program_spec.version != 1:
         raise ValueError("Invalid program version")
 
-    context = TranscriptionContext(file_weights_dir)
+    context = TranscriptionContext(file_weights_dir, lazy_file_values)
     pymil_program = Program()
     for func_name, func_spec in program_spec.functions.items():
         pymil_program.add_function(
@@ -21,6 +21,7 @@ from coremltools.converters.mil.frontend.tensorflow.test.testing_utils import \
     run_compare_tf
 from coremltools.converters.mil.frontend.torch.test.test_torch_ops import \
     TestScriptedModels as _TestScriptedModels
+from coremltools.converters.mil.mil.lazy_value import FileValue
 from coremltools.converters.mil.mil.ops.tests.testing_utils import \
     compare_backend
 from coremltools.converters.mil.testing_utils import get_op_types_in_program
@@ -88,6 +89,25 @@ class TestLoadAPIUsage:
         if get_op_types_in_program(loaded_pymil_prog) != get_op_types_in_program(prog):
             raise AssertionError("Mismatch between defined PyMIL prog and loaded PyMIL prog")
 
+    def test_mil_proto_to_pymil_lazy_file_values(self):
+        weight = np.random.rand(10, 3, 20, 20).astype(np.float32)
+
+        @mb.program(input_specs=[mb.TensorSpec(shape=(1, 3, 100, 100)), ])
+        def prog(x):
+            return mb.conv(x=x, weight=weight, name="conv")
+
+        mlmodel = ct.convert(prog, convert_to="mlprogram", compute_precision=ct.precision.FLOAT32)
+        model_spec = mlmodel.get_spec()
+        loaded_pymil_prog = milproto_to_pymil(
+            model_spec=model_spec,
+            specification_version=model_spec.specificationVersion,
+            file_weights_dir=mlmodel.weights_dir,
+            lazy_file_values=True,
+        )
+        weight_var = loaded_pymil_prog.functions["main"].find_ops(op_type="conv")[0].weight
+        assert isinstance(weight_var._sym_val.val, FileValue)
+        np.testing.assert_array_equal(weight_var.val, weight)
+
     def test_mil_proto_to_pymil_with_version_handling(self):
         # This test makes sure the correct version of the op is picked up during mil_proto -> pymil conversion
         
@@ -433,3 +433,40 @@ class TestTf1ModelFormats:
         with pytest.raises(ValueError) as e:
             converter.convert(non_exist_filename, source="tensorflow")
             e.match(r"Input model .* does not exist")
+
+
+@pytest.mark.skipif(not _HAS_TF_1, reason=MSG_TF1_NOT_FOUND)
+class TestTf1ConstantPropagation:
+    @staticmethod
+    def _get_tf_ssa(graph):
+        from coremltools.converters.mil.frontend.tensorflow.load import TF1Loader
+
+        loader = TF1Loader(graph)
+        loader._graph_def = loader._graph_def_from_model()
+        return loader._tf_ssa_from_graph_def()
+
+    @pytest.mark.parametrize("use_numpy_kernels", [True, False])
+    def test_constant_propagation(self, use_numpy_kernels):
+        from coremltools.converters.mil.frontend.tensorflow.tf_graph_pass import \
+            constant_propagation
+
+        with tf.Graph().as_default() as graph:
+            x = tf.placeholder(tf.float32, shape=(2, 3))
+            a = tf.constant(np.arange(6, dtype=np.float32).reshape(3, 2), name="a")
+            b = tf.reduce_sum(tf.transpose(a) * 2.0 + 1.0, axis=1, name="b")
+            # cumsum has no NumPy kernel, and its consumers must be evaluated by
+            # TensorFlow as well
+            c = tf.math.cumsum(b, name="c")
+            d = tf.cast(tf.reshape(c, [1, 3]), tf.int32, name="d")
+            tf.add(x, tf.cast(d, tf.float32), name="y")
+
+        tf_ssa = self._get_tf_ssa(graph)
+        constant_propagation(tf_ssa, use_numpy_kernels=use_numpy_kernels)
+        nodes = tf_ssa.functions["main"].graph
+
+        expected_b = (np.arange(6).reshape(3, 2).T * 2.0 + 1.0).sum(axis=1)
+        np.testing.assert_allclose(nodes["b"].value.val, expected_b)
+        np.testing.assert_allclose(nodes["c"].value.val, np.cumsum(expected_b))
+        assert nodes["d"].value.val.dtype == np.int32
+        np.testing.assert_equal(nodes["d"].value.val, np.cumsum(expected_b).reshape(1, 3))
+        assert nodes["y"].value is None
@@ -6,6 +6,7 @@
 import gc
 from distutils.version import StrictVersion as _StrictVersion
 
+import numpy as np
 import tensorflow as tf
 
 from coremltools import _logger as logger
@@ -17,105 +18,306 @@ from coremltools.converters.mil.mil.types.type_mapping import \
 from ..basic_graph_ops import const_determined_nodes
 
 
-def _get_const_nodes(fn):
-    from tensorflow.core.framework import graph_pb2, node_def_pb2
+def _attr_dtype(node, attr_name):
+    return tf.as_dtype(node.original_node.attr[attr_name].type).as_numpy_dtype
 
-    new_graph = graph_pb2.GraphDef()
-    constant_nodes = set()
+
+def _axes(axis):
+    return tuple(np.asarray(axis).reshape(-1).tolist())
+
+
+def _unary(np_func):
+    return lambda node, x: np_func(x).astype(x.dtype, copy=False)
+
+
+def _binary(np_func):
+    return lambda node, x, y: np_func(x, y).astype(x.dtype, copy=False)
+
+
+def _comparison(np_func):
+    return lambda node, x, y: np_func(x, y)
+
+
+def _reduction(np_func):
+    def kernel(node, x, axis):
+        keep_dims = node.attr.get("keep_dims", False)
+        return np_func(x, axis=_axes(axis), keepdims=keep_dims).astype(x.dtype, copy=False)
+
+    return kernel
+
+
+def _squeeze(node, x):
+    squeeze_dims = node.attr.get("squeeze_dims", [])
+    return np.squeeze(x, axis=tuple(squeeze_dims)) if len(squeeze_dims) > 0 else np.squeeze(x)
+
+
+def _gather(node, params, indices, axis):
+    if node.attr.get("batch_dims", 0) != 0:
+        raise NotImplementedError("GatherV2 with batch_dims")
+    return np.take(params, indices, axis=int(axis))
+
+
+def _select(node, cond, x, y):
+    if node.op == "Select" and cond.shape != x.shape:
+        raise NotImplementedError("Select with a condition of lower rank")
+    return np.where(cond, x, y)
+
+
+def _slice(node, x, begin, size):
+    return x[tuple(
+        slice(b, None if s == -1 else b + s) for b, s in zip(begin.tolist(), size.tolist())
+    )]
+
+
+def _matmul(node, x, y):
+    if node.attr.get("transpose_a", False):
+        x = x.T
+    if node.attr.get("transpose_b", False):
+        y = y.T
+    return np.matmul(x, y).astype(x.dtype, copy=False)
+
+
+# NumPy implementations of the ops commonly found in the const-determined parts of
+# graphs. Each one takes the node and the values of its inputs, and returns the value
+# of the single output of the node. Other ops (and the ops whose kernel raises) are
+# evaluated by TensorFlow.
+_NUMPY_KERNELS = {
+    "Const": lambda node: tf.make_ndarray(node.original_node.attr["value"].tensor),
+    "Identity": lambda node, x: x,
+    "Snapshot": lambda node, x: x,
+    "StopGradient": lambda node, x: x,
+    "Cast": lambda node, x: x.astype(_attr_dtype(node, "DstT")),
+    "Shape": lambda node, x: np.array(x.shape, dtype=_attr_dtype(node, "out_type")),
+    "Size": lambda node, x: np.array(x.size, dtype=_attr_dtype(node, "out_type")),
+    "Rank": lambda node, x: np.array(x.ndim, dtype=np.int32),
+    "Neg": _unary(np.negative),
+    "Abs": _unary(np.abs),
+    "Square": _unary(np.square),
+    "Sqrt": _unary(np.sqrt),
+    "Rsqrt": _unary(lambda x: 1.0 / np.sqrt(x)),
+    "Exp": _unary(np.exp),
+    "Log": _unary(np.log),
+    "Add": _binary(np.add),
+    "AddV2": _binary(np.add),
+    "Sub": _binary(np.subtract),
+    "Mul": _binary(np.multiply),
+    "RealDiv": _binary(np.true_divide),
+    "FloorDiv": _binary(np.floor_divide),
+    "FloorMod": _binary(np.mod),
+    "Maximum": _binary(np.maximum),
+    "Minimum": _binary(np.minimum),
+    "Pow": _binary(np.power),
+    "Less": _comparison(np.less),
+    "LessEqual": _comparison(np.less_equal),
+    "Greater": _comparison(np.greater),
+    "GreaterEqual": _comparison(np.greater_equal),
+    "Equal": _comparison(np.equal),
+    "NotEqual": _comparison(np.not_equal),
+    "LogicalAnd": _comparison(np.logical_and),
+    "LogicalOr": _comparison(np.logical_or),
+    "LogicalNot": lambda node, x: np.logical_not(x),
+    "Sum": _reduction(np.sum),
+    "Prod": _reduction(np.prod),
+    "Max": _reduction(np.max),
+    "Min": _reduction(np.min),
+    "Mean": _reduction(np.mean),
+    "Reshape": lambda node, x, shape: x.reshape(shape.tolist()),
+    "ExpandDims": lambda node, x, axis: np.expand_dims(x, int(axis)),
+    "Squeeze": _squeeze,
+    "Transpose": lambda node, x, perm: np.transpose(x, perm.tolist()),
+    "ConcatV2": lambda node, *values: np.concatenate(values[:-1], axis=int(values[-1])),
+    "Pack": lambda node, *values: np.stack(values, axis=node.attr.get("axis", 0)),
+    "Fill": lambda node, dims, value: np.full(dims.tolist(), value, dtype=value.dtype),
+    "Range": lambda node, start, limit, delta: np.arange(
+        start, limit, delta, dtype=_attr_dtype(node, "Tidx")
+    ),
+    "Tile": lambda node, x, multiples: np.tile(x, multiples.tolist()),
+    "GatherV2": _gather,
+    "Select": _select,
+    "SelectV2": _select,
+    "Slice": _slice,
+    "MatMul": _matmul,
+}
+
+
+def _as_session_value(value):
+    # Session.run returns scalars, rather than arrays of rank 0
+    value = np.asarray(value)
+    return value[()] if value.ndim == 0 else value
+
+
+def _get_const_nodes(fn):
+    """
+    Returns the const-determined nodes of fn, in topological order, and the number of
+    outputs of each one.
+    """
     constant_node_num_outputs = {}
     generated_nodes = [k for k, v in fn.graph.items() if v.original_node is None]
     const_nodes_in_this_graph = const_determined_nodes(fn.graph, set(generated_nodes))
     # we can only run TF on nodes with outputs since we must evaluate
     # tensors and not ops
-    const_nodes_in_this_graph = [
+    const_nodes_in_this_graph = set(
         i for i in const_nodes_in_this_graph if fn.graph[i].op != "NoOp"
-    ]
-    constant_nodes = constant_nodes.union(set(const_nodes_in_this_graph))
+    )
 
-    # topological sort const nodes
+    # topological sort const nodes, by depth first search
     topsort = []
-    topsort_set = set()
-    while len(const_nodes_in_this_graph) > 0:
-        for n in const_nodes_in_this_graph:
-            input_names = fn.graph[n].inputs
-            if len(set(input_names).difference(topsort_set)) == 0:
-                topsort.append(n)
-                topsort_set.add(n)
-
-        const_nodes_in_this_graph = set(const_nodes_in_this_graph).difference(
-            topsort_set
-        )
+    visited = set()
+    for root in sorted(const_nodes_in_this_graph):
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(fn.graph[root].inputs))]
+        while len(stack) > 0:
+            node, input_names = stack[-1]
+            for input_name in input_names:
+                if input_name in const_nodes_in_this_graph and input_name not in visited:
+                    visited.add(input_name)
+                    stack.append((input_name, iter(fn.graph[input_name].inputs)))
+                    break
+            else:
+                stack.pop()
+                topsort.append(node)
 
     for node in topsort:
+        if "_output_shapes" in fn.graph[node].attr:
+            constant_node_num_outputs[node] = len(fn.graph[node].attr["_output_shapes"])
+        else:
+            constant_node_num_outputs[node] = 1
+    return topsort, constant_node_num_outputs
+
+
+def _evaluate_with_numpy(fn, constant_nodes, constant_node_num_outputs):
+    """
+    Evaluates the constant nodes which have a NumPy kernel and whose inputs are all
+    evaluated with NumPy. Returns their values, keyed by "name:0".
+    """
+    values = {}
+    for node_name in constant_nodes:
+        node = fn.graph[node_name]
+        kernel = _NUMPY_KERNELS.get(node.op)
+        if kernel is None or constant_node_num_outputs[node_name] != 1:
+            continue
+        input_queries = [i + ":0" for i in node.inputs]
+        if any(query not in values for query in input_queries):
+            continue
+        try:
+            value = kernel(node, *[np.asarray(values[query]) for query in input_queries])
+        except Exception:
+            continue
+        values[node_name + ":0"] = _as_session_value(value)
+    return values
+
+
+def _get_graph_def(fn, constant_nodes, values):
+    """
+    Returns a GraphDef of the given nodes, in which their inputs already in values are
+    Const nodes holding these values.
+    """
+    from tensorflow.core.framework import graph_pb2, node_def_pb2
+
+    new_graph = graph_pb2.GraphDef()
+    input_names = set()
+    for node in constant_nodes:
         new_node = node_def_pb2.NodeDef()
         new_node.CopyFrom(fn.graph[node].original_node)
         if "_class" in new_node.attr:
             del new_node.attr["_class"]
         del new_node.input[:]
         new_node.input.extend(fn.graph[node].inputs)
-        if "_output_shapes" in fn.graph[node].attr:
-            constant_node_num_outputs[node] = len(fn.graph[node].attr["_output_shapes"])
-        else:
-            constant_node_num_outputs[node] = 1
+        input_names.update(fn.graph[node].inputs)
         new_graph.node.extend([new_node])
         del new_node
+
+    for input_name in sorted(input_names):
+        query = input_name + ":0"
+        if query not in values:
+            continue
+        tensor = tf.make_tensor_proto(values[query])
+        const_node = new_graph.node.add()
+        const_node.name = input_name
+        const_node.op = "Const"
+        const_node.attr["dtype"].type = tensor.dtype
+        const_node.attr["value"].tensor.CopyFrom(tensor)
     gc.collect()
-    return new_graph, list(constant_nodes), constant_node_num_outputs
+    return new_graph
 
 
-def _constant_propagation(fn, new_graph, constant_nodes, constant_node_num_outputs):
-    try:
-        if len(constant_nodes) > 0:
-            with tf.Graph().as_default() as graph:
-                tf.import_graph_def(new_graph, name="")
-
-                # We're only making one call to `sess.run()` in order to compute constant values.
-                # In this context, the default optimization settings make everything dramatically
-                # slower and more memory-intensive.
-                if _get_version(tf.__version__) < _StrictVersion("1.13.1"):
-                    session_config = tf.ConfigProto()
-                    session_config.graph_options.optimizer_options.opt_level = (
-                        tf.OptimizerOptions.L0
-                    )
-                    sess = tf.Session(graph=graph, config=session_config)
+def _evaluate_with_session(graph_def, constant_nodes, constant_node_num_outputs):
+    """
+    Evaluates the outputs of constant_nodes in graph_def with TensorFlow, in one
+    batched run for the control flow outputs and one for the others. Returns their
+    values, keyed by "name:index", None for "dead" tensors.
+    """
+    with tf.Graph().as_default() as graph:
+        tf.import_graph_def(graph_def, name="")
+
+        # We're only making a couple of calls to `sess.run()` in order to compute constant values.
+        # In this context, the default optimization settings make everything dramatically
+        # slower and more memory-intensive.
+        if _get_version(tf.__version__) < _StrictVersion("1.13.1"):
+            session_config = tf.ConfigProto()
+            session_config.graph_options.optimizer_options.opt_level = (
+                tf.OptimizerOptions.L0
+            )
+            sess = tf.Session(graph=graph, config=session_config)
+        else:
+            session_config = tf.compat.v1.ConfigProto()
+            session_config.graph_options.optimizer_options.opt_level = (
+                tf.compat.v1.OptimizerOptions.L0
+            )
+            session_config.graph_options.rewrite_options.disable_meta_optimizer = (
+                True
+            )
+            sess = tf.compat.v1.Session(graph=graph, config=session_config)
+
+        query_list = list()
+        control_flow_ops = list()
+        for c in constant_nodes:
+            for j in range(constant_node_num_outputs[c]):
+                query = c + ":" + str(j)
+                lower_query = query.lower()
+                if "switch" in lower_query or "cond" in lower_query:
+                    control_flow_ops.append(query)
                 else:
-                    session_config = tf.compat.v1.ConfigProto()
-                    session_config.graph_options.optimizer_options.opt_level = (
-                        tf.compat.v1.OptimizerOptions.L0
-                    )
-                    session_config.graph_options.rewrite_options.disable_meta_optimizer = (
-                        True
-                    )
-                    sess = tf.compat.v1.Session(graph=graph, config=session_config)
-
-                query_list = list()
-                control_flow_ops = list()
-                for c in constant_nodes:
-                    for j in range(constant_node_num_outputs[c]):
-                        query = c + ":" + str(j)
-                        lower_query = query.lower()
-                        if "switch" in lower_query or "cond" in lower_query:
-                            control_flow_ops.append(query)
-                        else:
-                            query_list.append(query)
-                result_list = sess.run(query_list)
-                result = {
-                    query_list[i]: result_list[i] for i in range(len(query_list))
-                }
-                # propagate switch one by one
-                for op in control_flow_ops:
-                    try:
-                        res = sess.run([op])
-                        result.update({op: res[0]})
-                    except:
-                        logger.warning(
-                            '[Constant Propagation] Skip "dead" tensor: {}'.format(
-                                op
-                            )
+                    query_list.append(query)
+        result_list = sess.run(query_list)
+        result = {
+            query_list[i]: result_list[i] for i in range(len(query_list))
+        }
+        # propagate switch in a single run, unless one of them is "dead", which
+        # fails the run: then one by one
+        try:
+            result.update(zip(control_flow_ops, sess.run(control_flow_ops)))
+        except:
+            for op in control_flow_ops:
+                try:
+                    res = sess.run([op])
+                    result.update({op: res[0]})
+                except:
+                    logger.warning(
+                        '[Constant Propagation] Skip "dead" tensor: {}'.format(
+                            op
                         )
-                        result.update({op: None})
+                    )
+                    result.update({op: None})
+
+        sess.close()
+    return result
 
-                sess.close()
+
+def _constant_propagation(fn, constant_nodes, constant_node_num_outputs, use_numpy_kernels=True):
+    try:
+        if len(constant_nodes) > 0:
+            result = {}
+            if use_numpy_kernels:
+                result = _evaluate_with_numpy(fn, constant_nodes, constant_node_num_outputs)
+            session_nodes = [c for c in constant_nodes if c + ":0" not in result]
+            if len(session_nodes) > 0:
+                graph_def = _get_graph_def(fn, session_nodes, result)
+                result.update(
+                    _evaluate_with_session(graph_def, session_nodes, constant_node_num_outputs)
+                )
 
             for k, v in fn.graph.items():
                 if k in constant_node_num_outputs:
@@ -153,11 +355,12 @@ def _constant_propagation(fn, new_graph, constant_nodes, constant_node_num_outpu
         logger.exception("Constant Propagation pass failed: {}".format(e))
 
 
-def constant_propagation(tfssa):
-    # we are going to rely on the TensorFlow graph to perform constant
-    # propagation. For each graph, we construct a new graph comprising
-    # only a subset of nodes that are constant nodes.
+def constant_propagation(tfssa, use_numpy_kernels=True):
+    # The constant nodes are evaluated with NumPy kernels where possible. For
+    # each graph, we rely on the TensorFlow graph to evaluate the others: we
+    # construct a new graph comprising only these constant nodes, and the
+    # values of their inputs already computed with NumPy.
 
     for f in tfssa.functions.values():
         const_nodes_info = _get_const_nodes(f)
-        _constant_propagation(f, *const_nodes_info)
+        _constant_propagation(f, *const_nodes_info, use_numpy_kernels=use_numpy_kernels)
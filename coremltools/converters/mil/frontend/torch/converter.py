@@ -3,7 +3,10 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
-from collections import OrderedDict
+import copy as _copy
+import hashlib as _hashlib
+import threading as _threading
+from collections import OrderedDict, namedtuple
 
 import numpy as _np
 import torch as _torch
@@ -42,6 +45,12 @@ torch_to_mil_types = {
 mil_to_torch_types = {v: k for k, v in torch_to_mil_types.items()}
 
 
+# A TorchScript model lowered to an InternalTorchIRGraph, before the Torch IR passes
+# and without inputs, along with the params_dict and the names of the inputs of the
+# lowered graph.
+_LoweredGraph = namedtuple("_LoweredGraph", ["graph", "params_dict", "input_names"])
+
+
 class TranscriptionContext:
     """
     Maintains a map from torch operations to their MIL values
@@ -166,11 +175,9 @@ class TorchConverter:
         self.output_names = get_output_names(self.outputs)
         self.opset_version = _target(opset_version) if opset_version is not None else None
         self.context = TranscriptionContext()
-        raw_graph, params_dict = self._expand_and_optimize_ir(self.torchscript)
-        self.params_dict = params_dict
-        self.graph = InternalTorchIRGraph(
-            raw_graph, params_dict, self.inputs, cut_at_symbols
-        )
+        lowered_graph = self._lower_torchscript(self.torchscript)
+        self.params_dict = lowered_graph.params_dict
+        self.graph = self._instantiate_lowered_graph(lowered_graph, self.inputs, cut_at_symbols)
 
         # Apply Torch IR passes
         passes = [
@@ -187,6 +194,90 @@ class TorchConverter:
         self.torch_passes = torch_passes
         self._prog = Program()
 
+    # Lowered graphs of the last converted models, keyed by _get_lowering_cache_key, so that
+    # converting a model again (e.g. with other input shapes, precision or deployment
+    # target) skips the lowering of the TorchScript model.
+    _lowering_cache = OrderedDict()
+    _lowering_cache_lock = _threading.Lock()
+    _LOWERING_CACHE_SIZE = 2
+
+    @staticmethod
+    def clear_lowering_cache():
+        with TorchConverter._lowering_cache_lock:
+            TorchConverter._lowering_cache.clear()
+
+    @staticmethod
+    def _get_lowering_cache_key(torchscript):
+        """
+        Returns the digests of the inlined graph of @torchscript and of its state_dict,
+        and the names in its state_dict. Returns None if a value of the state_dict
+        is not a tensor which can be digested.
+        """
+        # The graph is modified in place as _expand_and_optimize_ir does, so that the digest
+        # doesn't change once the model has been converted
+        graph = torchscript.forward.graph
+        TorchConverter._optimize_ir_in_place(graph)
+        graph_digest = _hashlib.blake2b(str(graph).encode("utf-8"), digest_size=16).hexdigest()
+
+        params_hash = _hashlib.blake2b(digest_size=16)
+        state_dict = torchscript.state_dict(keep_vars=True)
+        for name, value in state_dict.items():
+            if not isinstance(value, _torch.Tensor) or value.is_quantized:
+                return None
+            value = value.detach().cpu().contiguous()
+            params_hash.update("{}:{}:{}".format(name, value.dtype, tuple(value.shape)).encode("utf-8"))
+            params_hash.update(value.reshape(-1).view(_torch.uint8).numpy().data)
+
+        return graph_digest, params_hash.hexdigest(), frozenset(state_dict.keys())
+
+    @staticmethod
+    def _lower_torchscript(torchscript):
+        """
+        Returns the _LoweredGraph of @torchscript, from the lowering cache if the same
+        model, with the same parameters, was lowered before.
+        """
+        cache = TorchConverter._lowering_cache
+        key = None
+        if TorchConverter._LOWERING_CACHE_SIZE > 0:
+            key = TorchConverter._get_lowering_cache_key(torchscript)
+        if key is not None:
+            with TorchConverter._lowering_cache_lock:
+                if key in cache:
+                    cache.move_to_end(key)
+                    return cache[key]
+
+        raw_graph, params_dict = TorchConverter._expand_and_optimize_ir(torchscript)
+        lowered_graph = _LoweredGraph(
+            graph=InternalTorchIRGraph(raw_graph, params_dict, [], None),
+            params_dict=params_dict,
+            input_names=[_input.debugName() for _input in list(raw_graph.inputs())[1:]],
+        )
+
+        # The parameters which are not in the state_dict are not covered by the key
+        if key is not None and all(name in key[2] for name in params_dict):
+            with TorchConverter._lowering_cache_lock:
+                cache[key] = lowered_graph
+                while len(cache) > TorchConverter._LOWERING_CACHE_SIZE:
+                    cache.popitem(last=False)
+        return lowered_graph
+
+    @staticmethod
+    def _instantiate_lowered_graph(lowered_graph, input_values, cut_at_symbols=None):
+        """
+        Returns a copy of the graph of @lowered_graph, which the Torch IR passes can
+        modify, with the given inputs and outputs. The parameter arrays are shared.
+        """
+        template = lowered_graph.graph
+        graph = InternalTorchIRGraph(
+            params=dict(template.params),
+            inputs=OrderedDict(zip(lowered_graph.input_names, input_values)),
+            outputs=list(cut_at_symbols if cut_at_symbols is not None else template.outputs),
+        )
+        memo = {id(template): graph}
+        memo.update((id(value), value) for value in template.params.values())
+        graph.nodes = _copy.deepcopy(template.nodes, memo)
+        return graph
+
     @staticmethod
     def _check_ops(graph):
         """
@@ -436,13 +527,11 @@ class TorchConverter:
         return graph, params_dict
 
     @staticmethod
-    def _expand_and_optimize_ir(torchscript):
+    def _optimize_ir_in_place(graph):
         """
-        Given a torch.jit.ScriptModule, convert it to a optimized
-        torch._C.Graph and dict of model parameter's names to tensors.
+        Runs the passes of _expand_and_optimize_ir which modify the forward graph of
+        the torch.jit.ScriptModule in place. Running them again is a no-op.
         """
-        graph = torchscript.forward.graph
-
         # From PyTorch code: Inline function and method calls.
         _torch._C._jit_pass_inline(graph)
         # From PyTorch code: This inlines the forked section in the fork()
@@ -471,6 +560,15 @@ class TorchConverter:
             _torch._C._jit_pass_canonicalize_graph_fuser_ops(graph)
         _torch._C._jit_pass_lint(graph)
 
+    @staticmethod
+    def _expand_and_optimize_ir(torchscript):
+        """
+        Given a torch.jit.ScriptModule, convert it to a optimized
+        torch._C.Graph and dict of model parameter's names to tensors.
+        """
+        graph = torchscript.forward.graph
+        TorchConverter._optimize_ir_in_place(graph)
+
         # From PyTorch docs: Renumber the graph so that all structurally
         # equivalent graphs have same numbers.
         graph = _torch._C._jit_pass_canonicalize(graph)
@@ -29,6 +29,17 @@ def _ssa_name_list(names):
     return [_make_ssa_name(x) for x in names]
 
 
+def _tensor_to_numpy(tensor):
+    """
+    Returns the value of a tensor as a read-only NumPy array. The array of a CPU tensor
+    shares its memory, so the weights of the model are not copied when they become
+    consts, and no pass can modify them in place.
+    """
+    value = tensor.detach().cpu().numpy().view()
+    value.flags.writeable = False
+    return value
+
+
 def _find_new_name(old_name, node_names):
     """
     Disambiguate a node's name from a list of existing node names by adding
@@ -269,7 +280,7 @@ class InternalTorchIRGraph:
             # Add params
             for name, param in params_dict.items():
                 if isinstance(param, torch.Tensor):
-                    value = param.detach().cpu().numpy()
+                    value = _tensor_to_numpy(param)
                 else:
                     value = param
                 self.params[name] = value
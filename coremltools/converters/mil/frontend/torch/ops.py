@@ -34,6 +34,7 @@ from coremltools.converters.mil.mil.types.symbolic import (
 from coremltools.converters.mil.mil.var import ListVar, Var
 
 from .._utils import value_at, build_einsum_mil
+from .internal_graph import _tensor_to_numpy
 from .torch_op_registry import _TORCH_OPS_REGISTRY, register_torch_op
 
 # The pytorch args for many of the below ops were sourced from
@@ -223,7 +224,7 @@ def _list_select(shape_var, index):
 def _construct_constant(val, name):
     # Converter cannot handle torch tensors.
     if isinstance(val, torch.Tensor):
-        val = val.cpu().numpy()
+        val = _tensor_to_numpy(val)
 
     # MIL casts ints to int32, which can't represent the 64 bit magic number.
     # So we instead represent it with None, and any ops that might get the
@@ -1399,3 +1399,68 @@ class TestGrayscaleImagePredictions:
         reference_output = rank4_grayscale_input_model(torch.from_numpy(sample_input)).detach().numpy()
         reference_output = np.squeeze(reference_output)
         np.testing.assert_allclose(reference_output, model_output_as_numpy, rtol=1e-2, atol=1e-2)
+
+
+@pytest.mark.skipif(not _HAS_TORCH, reason=MSG_TORCH_NOT_FOUND)
+class TestTorchLoweringCache:
+    @staticmethod
+    def test_repeated_conversions_reuse_lowered_graph(monkeypatch):
+        from coremltools.converters.mil.frontend.torch.converter import TorchConverter
+
+        num_lowerings = []
+        expand_and_optimize_ir = TorchConverter._expand_and_optimize_ir
+
+        def counting_expand_and_optimize_ir(torchscript):
+            num_lowerings.append(1)
+            return expand_and_optimize_ir(torchscript)
+
+        monkeypatch.setattr(
+            TorchConverter, "_expand_and_optimize_ir", staticmethod(counting_expand_and_optimize_ir)
+        )
+        TorchConverter.clear_lowering_cache()
+
+        torch_model = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.ReLU()).eval()
+        traced_model = torch.jit.trace(torch_model, torch.rand(1, 3, 8, 8))
+
+        def convert(shape):
+            prog = ct.convert(
+                traced_model, inputs=[ct.TensorType(shape=shape)], convert_to="milinternal"
+            )
+            return prog.functions["main"].outputs[0].shape
+
+        assert convert((1, 3, 8, 8)) == (1, 4, 6, 6)
+        assert convert((2, 3, 10, 10)) == (2, 4, 8, 8)
+        assert len(num_lowerings) == 1
+
+        # Changing the parameters invalidates the cached lowering
+        with torch.no_grad():
+            torch_model[0].weight.mul_(2.0)
+        convert((1, 3, 8, 8))
+        assert len(num_lowerings) == 2
+        TorchConverter.clear_lowering_cache()
+
+
+class TestTorchParamsSharedMemory:
+    @staticmethod
+    def test_consts_share_memory_of_params():
+        torch_model = torch.nn.Sequential(torch.nn.Linear(4, 3), torch.nn.ReLU()).eval()
+        traced_model = torch.jit.trace(torch_model, torch.rand(2, 4))
+        prog = ct.convert(
+            traced_model,
+            inputs=[ct.TensorType(shape=(2, 4))],
+            convert_to="milinternal",
+            compute_precision=ct.precision.FLOAT32,
+        )
+
+        weight = prog.find_ops(op_type="linear", exactly_one=True)[0].weight.val
+        assert np.shares_memory(weight, torch_model[0].weight.detach().numpy())
+        # The weights of the model can't be modified through the program
+        assert not weight.flags.writeable
+
+        # Converting to fp16 allocates new weights, the original ones are left as-is
+        prog = ct.convert(
+            traced_model, inputs=[ct.TensorType(shape=(2, 4))], convert_to="milinternal"
+        )
+        weight = prog.find_ops(op_type="linear", exactly_one=True)[0].weight.val
+        assert weight.dtype == np.float16
+        assert torch_model[0].weight.dtype == torch.float32
@@ -3,26 +3,83 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
+import bisect
 import copy
-from collections import Counter, OrderedDict
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
 
 from coremltools import _OPSET, _logger as logger
 from coremltools.converters.mil._deployment_compatibility import \
     AvailableTarget as _target
 
 from . import SPACES, types
-from .types.symbolic import is_symbolic, k_used_symbols
+from .types.symbolic import is_symbolic
 from .var import ComplexVar, InternalVar, Var
 from .visitors.dot_visitor import DotVisitor
 
-# BLOCK_STACK[-1] is the current block
-BLOCK_STACK = []
 DEBUG = False
 
+# Spacing between the order labels of consecutive ops appended to a block.
+_OP_LABEL_GAP = 1 << 32
+
+
+class _ThreadState(threading.local):
+    # The blocks being built and the mutations being tracked are those of the current
+    # thread, so that programs can be built or converted in several threads at once
+    def __init__(self):
+        # block_stack[-1] is the current block
+        self.block_stack = []
+        # Sets filled by track_mutations(), innermost last
+        self.mutations_stack = []
+        # Number of names generated for each op type, see Builder._get_free_name
+        self.name_counts = defaultdict(int)
+
+
+_THREAD_STATE = _ThreadState()
+
+
+def _get_thread_state():
+    """
+    Returns the state of the current thread which worker threads share to modify its
+    programs, see _shared_thread_state.
+    """
+    return list(_THREAD_STATE.mutations_stack), _THREAD_STATE.name_counts
+
+
+@contextmanager
+def _shared_thread_state(state):
+    """
+    Within the context, the current thread records its mutations in the sets tracked by
+    the thread that @state was taken from, and generates names from the same counts.
+    Its block stack stays its own.
+    """
+    saved_state = _THREAD_STATE.mutations_stack, _THREAD_STATE.name_counts
+    _THREAD_STATE.mutations_stack, _THREAD_STATE.name_counts = list(state[0]), state[1]
+    try:
+        yield
+    finally:
+        _THREAD_STATE.mutations_stack, _THREAD_STATE.name_counts = saved_state
+
+# Whether the ops of a class may have nested blocks, by class
+_MAY_HAVE_BLOCKS = {}
+
+def _may_have_blocks(op):
+    # The nested blocks of an op are built by build_nested_blocks after the op is
+    # inserted in its block, so the ops which may have some are told by their class
+    op_class = type(op)
+    if op_class not in _MAY_HAVE_BLOCKS:
+        from .operation import Operation
+        _MAY_HAVE_BLOCKS[op_class] = (
+            op_class.build_nested_blocks is not Operation.build_nested_blocks
+        )
+    return _MAY_HAVE_BLOCKS[op_class]
+
 def curr_block():
-    if len(BLOCK_STACK) == 0:
+    block_stack = _THREAD_STATE.block_stack
+    if len(block_stack) == 0:
         raise ValueError("Must call Builder inside an Function" + " or Block")
-    return BLOCK_STACK[-1]
+    return block_stack[-1]
 
 def curr_opset_version():
     block = curr_block()
@@ -40,12 +97,57 @@ class InvalidBlockStateError(Exception):
     pass
 
 
+@contextmanager
+def track_mutations():
+    """
+    Records, within the context, the ops which are created, whose inputs change, or
+    whose outputs gain or lose consumers, and the blocks whose outputs change.
+
+    Yields the set the ops and blocks are recorded in. Pass it to validate_mutations()
+    to validate only the part of the program which changed.
+    """
+    mutations = set()
+    _THREAD_STATE.mutations_stack.append(mutations)
+    try:
+        yield mutations
+    finally:
+        _THREAD_STATE.mutations_stack.pop()
+
+
+def _record_mutations(ops_or_blocks):
+    for mutations in _THREAD_STATE.mutations_stack:
+        mutations.update(x for x in ops_or_blocks if x is not None)
+
+
+def validate_mutations(mutations):
+    """
+    Runs the checks of Block.validate on the ops and blocks recorded by
+    track_mutations() only. Ops which are no longer in a block are skipped.
+    """
+    blocks = set()
+    for x in mutations:
+        if isinstance(x, Block):
+            blocks.add(x)
+            continue
+        block = x.enclosing_block
+        if block is None or x not in block._op_to_label:
+            continue
+        block._validate_op(x)
+        blocks.add(block)
+    for block in blocks:
+        block._validate_outputs()
+
+
 class Block:
     __slots__ = [
         "name",
         "_block_inputs",
         "_outputs",
         "operations",
+        "_op_labels",
+        "_op_to_label",
+        "_ops_by_type",
+        "_ops_with_blocks",
         "_internal_vars",
         "outer_op",
     ]
@@ -108,6 +210,20 @@ class Block:
         # list[Operation]. Topologically sorted.
         self.operations = []
 
+        # Order-maintenance labels of the ops. _op_labels[i] is the label of
+        # operations[i], and labels strictly increase along self.operations, so that
+        # the position of an op and the relative order of two ops are found in
+        # O(log n) / O(1) instead of scanning self.operations. Only
+        # _insert_op_before and remove_ops may mutate self.operations.
+        self._op_labels = []
+        self._op_to_label = {}
+
+        # Index of the ops by op_type: dict[str, dict[Operation, None]], and the ops
+        # which may have nested blocks. The inner dicts are ordered sets, which
+        # _insert_op_label and remove_ops keep up to date with self.operations.
+        self._ops_by_type = {}
+        self._ops_with_blocks = {}
+
         # Must be set before self.validate()
         self.outer_op = outer_op
 
@@ -128,66 +244,72 @@ class Block:
 
         self.validate()
 
-    def validate(self):
+    def validate(self, force=False):
         """
-        Basic validation to protect against some invalid state.
+        Basic validation to protect against some invalid state. It is skipped
+        unless DEBUG is set or force is True.
         """
-        if not DEBUG:
+        if not DEBUG and not force:
             return
 
         for op in self.operations:
             for b in op.blocks:
-                b.validate()
-            if op.outputs is None:
-                raise InvalidBlockStateError()
-
-            # Check the input output relationships
-            # from outputs -> inputs
-            for ov in op.outputs:
-                child_op_count = Counter(ov.child_ops)
-                for next_op, c in child_op_count.items():
-                    c_actual = next_op.get_flattened_inputs().count(ov)
-                    if c_actual != c:
-                        msg = (
-                            "Var {} should be consumed by op {} {}"
-                            + " times, but op {} uses it {} times.\n{}"
-                        )
-                        raise InvalidBlockStateError(
-                            msg.format(
-                                ov.name,
-                                next_op.name,
-                                c,
-                                next_op.name,
-                                c_actual,
-                                next_op,
-                            )
-                        )
+                b.validate(force=force)
+            self._validate_op(op)
+
+        self._validate_outputs()
 
-            # from inputs -> outputs
-            input_var_count = Counter(op.get_flattened_inputs())
-            for iv, c in input_var_count.items():
-                c_actual = iv.child_ops.count(op)
+    def _validate_op(self, op):
+        if op.outputs is None:
+            raise InvalidBlockStateError()
+
+        # Check the input output relationships
+        # from outputs -> inputs
+        for ov in op.outputs:
+            child_op_count = Counter(ov.child_ops)
+            for next_op, c in child_op_count.items():
+                c_actual = next_op.get_flattened_inputs().count(ov)
                 if c_actual != c:
                     msg = (
                         "Var {} should be consumed by op {} {}"
                         + " times, but op {} uses it {} times.\n{}"
                     )
                     raise InvalidBlockStateError(
-                        msg.format(iv.name, op.name, c_actual, op.name, c, op)
+                        msg.format(
+                            ov.name,
+                            next_op.name,
+                            c,
+                            next_op.name,
+                            c_actual,
+                            next_op,
+                        )
                     )
 
+        # from inputs -> outputs
+        input_var_count = Counter(op.get_flattened_inputs())
+        for iv, c in input_var_count.items():
+            c_actual = iv.child_ops.count(op)
+            if c_actual != c:
+                msg = (
+                    "Var {} should be consumed by op {} {}"
+                    + " times, but op {} uses it {} times.\n{}"
+                )
+                raise InvalidBlockStateError(
+                    msg.format(iv.name, op.name, c_actual, op.name, c, op)
+                )
+
         # 1 to 1 mapping between Block outputs and Var.consuming_blocks
-        for op in self.operations:
-            for ov in op.outputs:
-                for b in ov.consuming_blocks:
-                    if ov not in b.outputs:
-                        msg = "Var {} should be output of block {}: {}"
-                        raise ValueError(msg.format(ov.name, b.name, b))
+        for ov in op.outputs:
+            for b in ov.consuming_blocks:
+                if ov not in b.outputs:
+                    msg = "Var {} should be output of block {}: {}"
+                    raise ValueError(msg.format(ov.name, b.name, b))
 
+    def _validate_outputs(self):
         for v in self.outputs:
             if self not in v.consuming_blocks:
                 msg = "Var {} should be output of block {}: {}"
-                raise ValueError(msg.format(ov.name, b.name, b))
+                raise ValueError(msg.format(v.name, self.name, self))
 
     def remove_inputs(self, curr_input_vars):
         """
@@ -212,7 +334,11 @@ class Block:
         if prefix is None and op_type is None:
             raise ValueError("Must specify one of {prefix, op_type}")
         found_ops = []
-        for op in self.operations:
+        if op_type is not None:
+            candidate_ops = self.find_ops_by_type([op_type], include_ops_with_blocks=True)
+        else:
+            candidate_ops = self.operations
+        for op in candidate_ops:
             prefix_match = prefix is None or op.name[: len(prefix)] == prefix
             op_type_match = op_type is None or op.op_type == op_type
             if prefix_match and op_type_match:
@@ -221,6 +347,29 @@ class Block:
                 found_ops.extend(b.find_ops(prefix=prefix, op_type=op_type))
         return found_ops
 
+    def find_ops_by_type(self, op_types, include_ops_with_blocks=False):
+        """
+        Return the ops of this block (not of its nested blocks) whose op_type is in
+        `op_types`, in the order of self.operations. If `include_ops_with_blocks` is True,
+        the ops which may have nested blocks (e.g. cond and while_loop) are returned too,
+        so that a pass can recurse into them.
+
+        The ops come from the op_type index of the block, so the cost is proportional to
+        the number of ops returned rather than to the number of ops in the block. A graph
+        pass which only matches patterns anchored at a few op types can therefore iterate
+        over this list instead of over self.operations.
+
+        op_types: Iterable[str]
+
+        Return list[Operation], which the caller may mutate the block while iterating on.
+        """
+        ops = {}
+        for op_type in op_types:
+            ops.update(self._ops_by_type.get(op_type, {}))
+        if include_ops_with_blocks:
+            ops.update(self._ops_with_blocks)
+        return sorted(ops, key=self._op_to_label.__getitem__)
+
     def add_internal_var(self, internal_var):
         if not isinstance(internal_var, InternalVar):
             raise ValueError("Only InternalVar can be manually added to Block.")
@@ -255,11 +404,12 @@ class Block:
         if var in inputs:
             return True
 
-        idx = len(self.operations) if upto_op_with_id is None else upto_op_with_id
-
-        for i in range(idx-1, -1, -1):
-            op_outputs = self.operations[i].outputs
-            if op_outputs is not None and var in op_outputs:
+        # The defining op of var gives its position in the block directly.
+        op = var.op
+        if op is not None and op in self._op_to_label and op.outputs is not None and var in op.outputs:
+            if upto_op_with_id is None or upto_op_with_id >= len(self.operations):
+                return True
+            if self._op_to_label[op] < self._op_labels[upto_op_with_id]:
                 return True
 
         if self.outer_op is not None:
@@ -271,11 +421,72 @@ class Block:
         return False
 
     def find_op_id_in_block(self, target_op):
-        try:
-            idx = self.operations.index(target_op)
-        except ValueError:
+        label = self._op_to_label.get(target_op)
+        if label is None:
             raise ValueError("Op {} not found in {}: {}".format(target_op.name, self.name, self))
-        return idx
+        return bisect.bisect_left(self._op_labels, label)
+
+    def is_op_before(self, op1, op2):
+        """
+        Returns True if op1 comes before op2 in this block. Both ops must be in the block.
+        """
+        for op in (op1, op2):
+            if op not in self._op_to_label:
+                raise ValueError("Op {} not found in {}: {}".format(op.name, self.name, self))
+        return self._op_to_label[op1] < self._op_to_label[op2]
+
+    def _insert_op_label(self, idx, op):
+        """
+        Inserts `op` in self.operations at position `idx`, and gives it an order label
+        between the labels of its neighbors.
+        """
+        labels = self._op_labels
+        prev_label = labels[idx - 1] if idx > 0 else 0
+        if idx == len(labels):
+            label = prev_label + _OP_LABEL_GAP
+        else:
+            label = (prev_label + labels[idx]) // 2
+
+        self.operations.insert(idx, op)
+        labels.insert(idx, label)
+        self._op_to_label[op] = label
+        self._ops_by_type.setdefault(op.op_type, {})[op] = None
+        if _may_have_blocks(op):
+            self._ops_with_blocks[op] = None
+
+        if label == prev_label:
+            # No free label left between the neighbors
+            self._relabel_ops_around(idx)
+
+    def _relabel_ops_around(self, idx):
+        """
+        Spreads out the labels of the smallest window of ops around `idx` that is sparse
+        enough. The window (and the minimum spacing it must reach) doubles until the
+        labels fit, which keeps the amortized cost of an insertion logarithmic.
+        """
+        labels = self._op_labels
+        num_ops = len(labels)
+        level = 0
+        while True:
+            half_width = 1 << level
+            lo = max(0, idx - half_width)
+            hi = min(num_ops, idx + half_width + 1)
+            low_bound = labels[lo - 1] if lo > 0 else 0
+            count = hi - lo
+            if hi == num_ops:
+                # Nothing after the window, so there is no upper bound
+                high_bound = low_bound + (count + 1) * _OP_LABEL_GAP
+            else:
+                high_bound = labels[hi]
+            step = (high_bound - low_bound) // (count + 1)
+            if step >= (1 << level) or (lo == 0 and hi == num_ops):
+                break
+            level += 1
+
+        for i in range(lo, hi):
+            label = low_bound + step * (i - lo + 1)
+            labels[i] = label
+            self._op_to_label[self.operations[i]] = label
 
     def set_outputs(self, outputs):
         """
@@ -293,6 +504,9 @@ class Block:
                 )
                 raise ValueError(msg.format(ov.name, self.name, self))
 
+        if _THREAD_STATE.mutations_stack:
+            _record_mutations([self] + [v.op for v in self._outputs + outputs])
+
         # For duplicate vars in self._outputs, only remove block once.
         for ov in set(self._outputs):
             ov.consuming_blocks.remove(self)
@@ -306,14 +520,12 @@ class Block:
             ov.consuming_blocks.append(self)
 
     def __enter__(self):
-        global BLOCK_STACK
-        BLOCK_STACK.append(self)
+        _THREAD_STATE.block_stack.append(self)
         return self
 
     def __exit__(self, type, value, traceback):
         self._propagate_nonreplaceable_vars()
-        global BLOCK_STACK
-        BLOCK_STACK = BLOCK_STACK[:-1]
+        _THREAD_STATE.block_stack.pop()
 
     def _insert_op_before(self, new_op, before_op=None):
         """
@@ -365,10 +577,7 @@ class Block:
                     )
 
         # add new_op
-        if before_op is None:
-            self.operations.append(new_op)
-        else:
-            self.operations.insert(idx, new_op)
+        self._insert_op_label(idx, new_op)
 
     def _replace_var(
         self,
@@ -380,15 +589,59 @@ class Block:
     ):
         """
         Helper function for replace_uses_of_var_after_op
+
+        Replaces old_var in the ops self.operations[start:end_id+1] (end_id=-1 for
+        the end of the block) and in all the blocks nested in them. Only the
+        consumers of old_var (old_var.child_ops and old_var.consuming_blocks) are
+        visited, so the cost does not depend on the size of the block.
         """
         num_ops_affected = 0
 
-        if end_id == -1:
-            op_list = self.operations[start:]
+        last_id = len(self.operations) - 1 if end_id == -1 else end_id
+        if start <= last_id:
+            label_range = (self._op_labels[start], self._op_labels[last_id])
         else:
-            op_list = self.operations[start : end_id + 1]
+            label_range = None
+
+        def is_in_range(op):
+            label = self._op_to_label.get(op)
+            return (
+                label is not None
+                and label_range is not None
+                and label_range[0] <= label <= label_range[1]
+            )
 
-        for op in op_list:
+        def find_nested_blocks(block):
+            # Returns the op of self containing `block`, and the blocks between them.
+            nested_blocks = []
+            while block is not self:
+                if block is None or block.outer_op is None:
+                    return None, nested_blocks
+                nested_blocks.append(block)
+                op = block.outer_op
+                block = op.enclosing_block
+            return op, nested_blocks
+
+        # Consumers of old_var within the range, in the order of self.operations
+        consumers = []
+        affected_blocks = OrderedDict()
+        for op in OrderedDict.fromkeys(old_var.child_ops):
+            if op.enclosing_block is self:
+                top_op, nested_blocks = op, []
+            else:
+                top_op, nested_blocks = find_nested_blocks(op.enclosing_block)
+            if is_in_range(top_op):
+                consumers.append((self._op_to_label[top_op], op))
+                affected_blocks.update((b, None) for b in nested_blocks)
+        for block in old_var.consuming_blocks:
+            if block is self:
+                continue
+            top_op, nested_blocks = find_nested_blocks(block)
+            if is_in_range(top_op):
+                affected_blocks.update((b, None) for b in nested_blocks)
+        consumers.sort(key=lambda x: x[0])
+
+        for _, op in consumers:
             new_inputs = {}
             affected = False
             for k, v in op.inputs.items():
@@ -405,13 +658,18 @@ class Block:
                 op.set_inputs(no_check_var_types=no_check_var_types,
                     **new_inputs)
 
-            # Replace recursively.
-            for b in op.blocks:
-                num_ops_affected += b._replace_var(old_var, new_var)
+        # Block inputs and outputs of the nested blocks are replaced as well.
+        for block in affected_blocks:
+            block._replace_block_input_and_output_var(old_var, new_var)
 
-        if end_id != -1 and old_var.op not in op_list:
+        if end_id != -1 and not is_in_range(old_var.op):
             return num_ops_affected
 
+        self._replace_block_input_and_output_var(old_var, new_var)
+
+        return num_ops_affected
+
+    def _replace_block_input_and_output_var(self, old_var, new_var):
         if old_var in self._block_inputs:
             idx = self._block_inputs.index(old_var)
             self._block_inputs = list(self._block_inputs)
@@ -421,8 +679,6 @@ class Block:
         # If old_var is block's output, replace as well.
         self.replace_block_output_var(old_var, new_var)
 
-        return num_ops_affected
-
     def replace_block_output_var(
             self,
             old_var,
@@ -440,6 +696,8 @@ class Block:
                 found_old_var_in_output = True
                 self._outputs[idx] = new_var
         if found_old_var_in_output:
+            if _THREAD_STATE.mutations_stack:
+                _record_mutations([self, old_var.op, new_var.op])
             new_var.consuming_blocks.append(self)
             # This block no longer uses `old_var` as its outputs
             old_var.consuming_blocks.remove(self)
@@ -650,27 +908,18 @@ class Block:
         self.validate()
 
         # Dedup ops because each op can only be deleted once.
-        existing_ops_set = set(existing_ops)
-        existing_ops = list(existing_ops_set)
-        # Find the idx of each to-be-removed op, and raise errors if any op couldn't be found.
-        idxs = [-1] * len(existing_ops)
-        for i, op in enumerate(self.operations):
-            if op in existing_ops_set:
-                idxs[existing_ops.index(op)] = i
-        if -1 in idxs:
-            not_found = []
-            for i, op in zip(idxs, existing_ops):
-                if i == -1:
-                    not_found.append(op.name)
+        existing_ops = list(set(existing_ops))
+        # Raise errors if any op couldn't be found.
+        not_found = [op.name for op in existing_ops if op not in self._op_to_label]
+        if len(not_found) > 0:
             raise ValueError(
                 "Ops {} not found in block {}".format(not_found, self.name)
             )
 
         # Remove ops in reverse topological order
-        pairs = list(zip(idxs, existing_ops))
-        pairs.sort(key=lambda x: x[0], reverse=True)
+        existing_ops.sort(key=lambda op: self._op_to_label[op], reverse=True)
 
-        for idx, op in pairs:
+        for op in existing_ops:
             for i, v in enumerate(op.outputs):
                 # Check that no ops depend on op's outputs
                 if len(v.child_ops) > 0:
@@ -693,9 +942,21 @@ class Block:
                 b.remove_ops(b.operations)
 
             # Remove the op (in reverse topological order)
+            idx = self.find_op_id_in_block(op)
             self.operations.pop(idx)
+            self._op_labels.pop(idx)
+            del self._op_to_label[op]
+            ops_of_type = self._ops_by_type[op.op_type]
+            del ops_of_type[op]
+            if len(ops_of_type) == 0:
+                del self._ops_by_type[op.op_type]
+            self._ops_with_blocks.pop(op, None)
             op.enclosing_block = None
 
+            if _THREAD_STATE.mutations_stack:
+                # The producers of the inputs lose a consumer
+                _record_mutations([v.op for v in op.get_flattened_inputs()])
+
             for v in op.inputs.values():
                 if isinstance(v, (tuple, list)):
                     for vv in v:
@@ -845,14 +1106,6 @@ class Function(Block):
             self._input_dict[k] = v.outputs[0]
         self.function_inputs = tuple(self._input_dict.values())
 
-        global k_used_symbols
-        global k_num_internal_syms
-        for inp in self.function_inputs:
-            if types.is_tensor(inp.dtype):
-                shapes = inp.dtype.get_shape()
-                for s in shapes:
-                    if is_symbolic(s):
-                        k_used_symbols.add(s)
         super().__init__()
 
     # Override Block's input
@@ -4,16 +4,17 @@
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
 import numbers
-from collections import defaultdict
+import threading
 
 import numpy as np
 
 from coremltools import _logger as logger
 from coremltools.converters.mil.mil.types.symbolic import any_symbolic
 
-from .block import Function, curr_block
+from .block import _THREAD_STATE, Function, curr_block
 from .input_type import (InternalInputType, ListOrTensorInputType,
                          TensorInputType, TupleInputType)
+from .lazy_value import LazyValue
 from .program import Placeholder, Program
 from .var import InternalVar, Var
 
@@ -24,10 +25,27 @@ def is_python_value(val):
         or isinstance(val, numbers.Number)
         or isinstance(val, str)
         or isinstance(val, bool)
+        or isinstance(val, LazyValue)
         or (isinstance(val, (tuple, list)) and all(is_python_value(v) for v in val))
     )
 
 
+class _NameCount:
+    """
+    Number of names generated for each op type, by the current thread (and the worker
+    threads modifying its programs).
+    """
+
+    def __getitem__(self, name):
+        return _THREAD_STATE.name_counts[name]
+
+    def __setitem__(self, name, count):
+        _THREAD_STATE.name_counts[name] = count
+
+    def clear(self):
+        _THREAD_STATE.name_counts.clear()
+
+
 class Builder:
     """
     This class is a singleton builder to construct a MIL program. For more
@@ -56,13 +74,15 @@ class Builder:
 
     """
 
-    name_count = defaultdict(int)
+    name_count = _NameCount()
+    _name_count_lock = threading.Lock()
 
     @classmethod
     def _get_free_name(cls, name):
-        new_name = name + "_" + str(cls.name_count[name])
-        cls.name_count[name] += 1
-        return new_name
+        with cls._name_count_lock:
+            count = cls.name_count[name]
+            cls.name_count[name] = count + 1
+        return name + "_" + str(count)
 
     @classmethod
     def _maybe_set_name(cls, kwargs, op_type):
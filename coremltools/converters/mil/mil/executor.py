@@ -0,0 +1,494 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+"""
+A reference implementation of MIL programs in NumPy.
+
+It runs wherever NumPy does (unlike ``MLModel.predict``, which needs the Core ML
+framework), so that the numerics of a converted model can be checked on any machine.
+
+.. sourcecode:: python
+
+    from coremltools.converters.mil.mil.executor import ProgramExecutor
+
+    executor = ProgramExecutor(prog)
+    outputs = executor.predict({"x": np.random.rand(1, 3, 224, 224)})
+
+    # From an mlprogram model, emulating fp16 precision
+    executor = ProgramExecutor.from_mlmodel("model.mlpackage", fp16_emulation=True)
+
+A few ops come with a dedicated (vectorized) kernel in this module, including conv,
+matmul, pooling and the normalization ops. The other ops are run by their
+``value_inference`` implementation, and are not supported if they have none (such as
+the recurrent ops and the list ops).
+"""
+
+import inspect
+from types import MethodType
+
+import numpy as np
+
+from coremltools.converters.mil.mil import types
+from coremltools.converters.mil.mil.input_type import InternalVar, TupleInputType
+from coremltools.converters.mil.mil.operation import Operation
+from coremltools.converters.mil.mil.ops.defs._utils import (
+    aggregated_pad, spatial_dimensions_out_shape)
+
+_KERNELS = {}
+
+
+def _register_kernel(*op_types):
+    """
+    Registers a kernel for ops of type `op_types`. A kernel takes the op, the executor and a
+    dict of input name to value (None for the optional inputs which are not set), and
+    returns the value of the output, or a tuple of the values of the outputs.
+    """
+    def decorator(func):
+        for op_type in op_types:
+            _KERNELS[op_type] = func
+        return func
+
+    return decorator
+
+
+def _get_pads(pad_type, pad, input_shape, kernel_shape, strides, dilations):
+    """
+    Returns the (begin, end) padding of each spatial dimension.
+    """
+    num_spatial_dims = len(kernel_shape)
+    if pad_type == "custom":
+        return [(int(pad[2 * i]), int(pad[2 * i + 1])) for i in range(num_spatial_dims)]
+    if pad_type == "valid":
+        return [(0, 0)] * num_spatial_dims
+    total_pads = aggregated_pad(
+        pad_type=pad_type,
+        kernel_shape=kernel_shape,
+        input_shape=input_shape,
+        strides=strides,
+        dilations=dilations,
+    )
+    if pad_type == "same_lower":
+        return [(p - p // 2, p // 2) for p in total_pads]
+    return [(p // 2, p - p // 2) for p in total_pads]
+
+
+def _sliding_windows(x, kernel_shape, strides, dilations):
+    """
+    Returns a strided view of x, of shape [N, C, *D_out, *K], such that
+    ``windows[n, c, o_1, ..., k_1, ...]`` is ``x[n, c, o_1 * s_1 + k_1 * d_1, ...]``.
+    """
+    spatial_shape = x.shape[2:]
+    out_shape = tuple(
+        (size - (k - 1) * d - 1) // s + 1
+        for size, k, s, d in zip(spatial_shape, kernel_shape, strides, dilations)
+    )
+    window_strides = (
+        x.strides[:2]
+        + tuple(x_stride * s for x_stride, s in zip(x.strides[2:], strides))
+        + tuple(x_stride * d for x_stride, d in zip(x.strides[2:], dilations))
+    )
+    return np.lib.stride_tricks.as_strided(
+        x, x.shape[:2] + out_shape + tuple(kernel_shape), window_strides, writeable=False
+    )
+
+
+def _channel_param(param, rank):
+    # Reshapes a per channel param of shape [C] to broadcast with a tensor [N, C, *D]
+    return np.reshape(param, (-1,) + (1,) * (rank - 2))
+
+
+@_register_kernel("conv")
+def _conv(op, executor, inputs):
+    x, weight = inputs["x"], inputs["weight"]
+    num_spatial_dims = x.ndim - 2
+    kernel_shape = weight.shape[2:]
+    groups = int(inputs["groups"])
+    strides = [int(s) for s in inputs["strides"]]
+    dilations = [int(d) for d in inputs["dilations"]]
+    pads = _get_pads(
+        inputs["pad_type"], inputs["pad"], x.shape[2:], kernel_shape, strides, dilations
+    )
+    x = np.pad(x, [(0, 0), (0, 0)] + pads)
+    windows = _sliding_windows(x, kernel_shape, strides, dilations)
+    out_spatial_shape = windows.shape[2:2 + num_spatial_dims]
+
+    # Split the channels in groups, and contract the input channels and the kernel dims:
+    # windows [N, G, C_in/G, *D_out, *K] x weight [G, C_out/G, C_in/G, *K]
+    batch, c_in = x.shape[:2]
+    c_out = weight.shape[0]
+    windows = windows.reshape((batch, groups, c_in // groups) + windows.shape[2:])
+    weight = weight.reshape((groups, c_out // groups) + weight.shape[1:])
+    out_dims = "opq"[:num_spatial_dims]
+    kernel_dims = "klm"[:num_spatial_dims]
+    equation = "ngc{0}{1},gfc{1}->ngf{0}".format(out_dims, kernel_dims)
+    out = np.einsum(equation, windows, weight, optimize=True)
+    out = out.reshape((batch, c_out) + out_spatial_shape)
+    if inputs["bias"] is not None:
+        out = out + _channel_param(inputs["bias"], out.ndim)
+    return out
+
+
+def _pool(inputs, mode):
+    x = inputs["x"]
+    num_spatial_dims = x.ndim - 2
+    kernel_shape = [int(k) for k in inputs["kernel_sizes"]]
+    strides = [int(s) for s in inputs["strides"]]
+    dilations = [1] * num_spatial_dims
+    spatial_shape = x.shape[2:]
+    pads = _get_pads(
+        inputs["pad_type"], inputs["pad"], spatial_shape, kernel_shape, strides, dilations
+    )
+    ceil_mode = bool(inputs["ceil_mode"]) if inputs["ceil_mode"] is not None else False
+    out_shape = spatial_dimensions_out_shape(
+        pad_type="custom",
+        input_shape=spatial_shape,
+        kernel_shape=kernel_shape,
+        strides=strides,
+        custom_pad=[p for pad in pads for p in pad],
+        ceil_mode=ceil_mode,
+    )
+    # ceil_mode may need windows which go past the end padding: pad further, and
+    # leave that extra padding out of the averages
+    extra_pads = [
+        (0, max(0, (out - 1) * s + k - (size + begin + end)))
+        for out, s, k, size, (begin, end) in zip(out_shape, strides, kernel_shape, spatial_shape, pads)
+    ]
+    pad_value = -np.inf if mode == "max" else 0
+    all_pads = [(0, 0), (0, 0)] + [
+        (begin, end + extra) for (begin, end), (_, extra) in zip(pads, extra_pads)
+    ]
+    x_padded = np.pad(x, all_pads, constant_values=pad_value)
+    windows = _sliding_windows(x_padded, kernel_shape, strides, dilations)
+    window_axes = tuple(range(2 + num_spatial_dims, 2 + 2 * num_spatial_dims))
+
+    if mode == "max":
+        return np.max(windows, axis=window_axes)
+    if mode == "l2":
+        return np.sqrt(np.sum(np.square(windows), axis=window_axes))
+
+    # Number of elements averaged by each window
+    counts = np.ones((1, 1) + spatial_shape, dtype=np.float32)
+    exclude_padding = bool(inputs["exclude_padding_from_average"])
+    counts = np.pad(counts, [(0, 0), (0, 0)] + pads, constant_values=0 if exclude_padding else 1)
+    counts = np.pad(counts, [(0, 0), (0, 0)] + extra_pads, constant_values=0)
+    counts = np.sum(_sliding_windows(counts, kernel_shape, strides, dilations), axis=window_axes)
+    return np.sum(windows, axis=window_axes) / counts.astype(x.dtype)
+
+
+@_register_kernel("avg_pool")
+def _avg_pool(op, executor, inputs):
+    return _pool(inputs, mode="avg")
+
+
+@_register_kernel("max_pool")
+def _max_pool(op, executor, inputs):
+    return _pool(inputs, mode="max")
+
+
+@_register_kernel("l2_pool")
+def _l2_pool(op, executor, inputs):
+    return _pool(inputs, mode="l2")
+
+
+@_register_kernel("matmul")
+def _matmul(op, executor, inputs):
+    x, y = inputs["x"], inputs["y"]
+    if inputs["transpose_x"] and x.ndim > 1:
+        x = np.swapaxes(x, -1, -2)
+    if inputs["transpose_y"] and y.ndim > 1:
+        y = np.swapaxes(y, -1, -2)
+    return np.matmul(x, y)
+
+
+@_register_kernel("linear")
+def _linear(op, executor, inputs):
+    out = np.matmul(inputs["x"], np.transpose(inputs["weight"]))
+    if inputs["bias"] is not None:
+        out = out + inputs["bias"]
+    return out
+
+
+def _normalize(x, axes, epsilon):
+    mean = np.mean(x, axis=axes, keepdims=True)
+    variance = np.mean(np.square(x - mean), axis=axes, keepdims=True)
+    return (x - mean) / np.sqrt(variance + epsilon)
+
+
+@_register_kernel("batch_norm")
+def _batch_norm(op, executor, inputs):
+    x = inputs["x"]
+    mean = _channel_param(inputs["mean"], x.ndim)
+    variance = _channel_param(inputs["variance"], x.ndim)
+    out = (x - mean) / np.sqrt(variance + inputs["epsilon"])
+    if inputs["gamma"] is not None:
+        out = out * _channel_param(inputs["gamma"], x.ndim)
+    if inputs["beta"] is not None:
+        out = out + _channel_param(inputs["beta"], x.ndim)
+    return out
+
+
+@_register_kernel("instance_norm")
+def _instance_norm(op, executor, inputs):
+    x = inputs["x"]
+    out = _normalize(x, tuple(range(2, x.ndim)), inputs["epsilon"])
+    if inputs["gamma"] is not None:
+        out = out * _channel_param(inputs["gamma"], x.ndim)
+    if inputs["beta"] is not None:
+        out = out + _channel_param(inputs["beta"], x.ndim)
+    return out
+
+
+@_register_kernel("layer_norm")
+def _layer_norm(op, executor, inputs):
+    x = inputs["x"]
+    axes = sorted(int(a) % x.ndim for a in inputs["axes"])
+    out = _normalize(x, tuple(axes), inputs["epsilon"])
+    # gamma and beta have the shape of the normalized dims
+    param_shape = [x.shape[i] if i in axes else 1 for i in range(x.ndim)]
+    if inputs["gamma"] is not None:
+        out = out * np.reshape(inputs["gamma"], param_shape)
+    if inputs["beta"] is not None:
+        out = out + np.reshape(inputs["beta"], param_shape)
+    return out
+
+
+@_register_kernel("silu")
+def _silu(op, executor, inputs):
+    x = inputs["x"]
+    with np.errstate(over="ignore"):
+        return x / (1 + np.exp(-x))
+
+
+@_register_kernel("cond")
+def _cond(op, executor, inputs):
+    block = op.blocks[0] if inputs["pred"] else op.blocks[1]
+    return tuple(executor._run_block(block))
+
+
+@_register_kernel("while_loop")
+def _while_loop(op, executor, inputs):
+    cond_block, body_block = op.blocks
+    loop_vals = inputs["loop_vars"]
+    while True:
+        executor._bind(cond_block.inputs, loop_vals)
+        if not executor._run_block(cond_block)[0]:
+            return tuple(loop_vals)
+        executor._bind(body_block.inputs, loop_vals)
+        loop_vals = executor._run_block(body_block)
+
+
+class _RuntimeVar:
+    """
+    Stands in for a Var in a ``value_inference`` call, with the value computed by the
+    executor as its ``val``. Other attributes are looked up on the Var.
+    """
+    def __init__(self, var, val):
+        self._var = var
+        self.val = val
+        self.sym_val = val
+        self._sym_val = None
+
+    @property
+    def shape(self):
+        return tuple(np.shape(self.val)) if not types.is_str(self._var.dtype) else ()
+
+    @property
+    def rank(self):
+        return len(self.shape)
+
+    @property
+    def sym_type(self):
+        if types.is_tensor(self._var.sym_type):
+            return types.tensor(self._var.dtype, self.shape)
+        return self._var.sym_type
+
+    def __getattr__(self, name):
+        return getattr(self._var, name)
+
+
+class _RuntimeOp:
+    """
+    Stands in for an op in a ``value_inference`` call, with its inputs replaced by
+    _RuntimeVar. Methods and properties of the op class are bound to the _RuntimeOp, so
+    that they see the runtime values too. Other attributes are looked up on the op.
+    """
+    def __init__(self, op, input_vars):
+        self._op = op
+        self._input_vars = input_vars
+        for name, var in input_vars.items():
+            setattr(self, name, var)
+
+    def __getattr__(self, name):
+        try:
+            attr = inspect.getattr_static(type(self._op), name)
+        except AttributeError:
+            return getattr(self._op, name)
+        if isinstance(attr, property):
+            return attr.fget(self)
+        if inspect.isfunction(attr):
+            return MethodType(attr, self)
+        return getattr(self._op, name)
+
+
+class ProgramExecutor:
+    """
+    Runs a function of a MIL program on NumPy.
+
+    Parameters
+    ----------
+    prog: Program
+        The program to run.
+
+    function_name: str
+        Name of the function of the program to run. Defaults to "main".
+
+    fp16_emulation: bool
+        If True, every fp32 value (the inputs, the consts and the outputs of the ops) is
+        rounded to fp16, to emulate the storage precision of a model which runs in fp16.
+        The ops still compute in fp32. Programs converted with fp16 compute precision
+        already hold fp16 tensors, and do not need it.
+    """
+
+    def __init__(self, prog, function_name="main", fp16_emulation=False):
+        if function_name not in prog.functions:
+            raise ValueError("Function {} not found in the program".format(function_name))
+        self.prog = prog
+        self.function = prog.functions[function_name]
+        self.fp16_emulation = fp16_emulation
+        self._env = {}
+
+    @classmethod
+    def from_mlmodel(cls, model, function_name="main", fp16_emulation=False):
+        """
+        Creates an executor for an mlprogram model.
+
+        Parameters
+        ----------
+        model: MLModel or str
+            An mlprogram MLModel, or the path to an mlpackage.
+        """
+        from coremltools.converters.mil.frontend.milproto.load import \
+            load as _milproto_to_pymil
+        from coremltools.models import MLModel
+
+        if isinstance(model, str):
+            model = MLModel(model, skip_model_load=True)
+        # The spec is only read, so it isn't copied
+        model_spec = model._spec
+        if model_spec.WhichOneof("Type") != "mlProgram":
+            raise ValueError(
+                "Only mlprogram models can be run by the executor, got a model of type {}".format(
+                    model_spec.WhichOneof("Type")
+                )
+            )
+        prog = _milproto_to_pymil(
+            model_spec=model_spec,
+            specification_version=model_spec.specificationVersion,
+            file_weights_dir=model.weights_dir,
+            lazy_file_values=True,
+        )
+        return cls(prog, function_name=function_name, fp16_emulation=fp16_emulation)
+
+    def predict(self, inputs):
+        """
+        Runs the function.
+
+        Parameters
+        ----------
+        inputs: dict[str, np.ndarray] or list[dict[str, np.ndarray]]
+            Values of the inputs of the function, by name. A list of dicts runs the
+            function on each of them. Inputs with a symbolic batch dimension may also be
+            given a whole batch at once, which is faster.
+
+        Returns
+        -------
+        dict[str, np.ndarray], or a list of them for a list of inputs: values of the
+        outputs of the function, by name.
+        """
+        if isinstance(inputs, (list, tuple)):
+            return [self.predict(x) for x in inputs]
+
+        missing = set(self.function.inputs.keys()) - set(inputs.keys())
+        if len(missing) > 0:
+            raise ValueError("Missing values for the inputs: {}".format(sorted(missing)))
+        unknown = set(inputs.keys()) - set(self.function.inputs.keys())
+        if len(unknown) > 0:
+            raise ValueError("Unknown inputs: {}".format(sorted(unknown)))
+
+        self._env = {}
+        try:
+            for name, var in self.function.inputs.items():
+                self._env[var] = self._to_var_type(var, inputs[name])
+            out_vals = self._run_block(self.function)
+        finally:
+            self._env = {}
+        return {v.name: val for v, val in zip(self.function.outputs, out_vals)}
+
+    def _bind(self, vars, vals):
+        for var, val in zip(vars, vals):
+            self._env[var] = val
+
+    def _run_block(self, block):
+        for op in block.operations:
+            out_vals = self._run_op(op)
+            self._bind(op.outputs, [self._to_var_type(v, val) for v, val in zip(op.outputs, out_vals)])
+        return [self._env[v] for v in block.outputs]
+
+    def _run_op(self, op):
+        if op.op_type == "const":
+            return (op.outputs[0].val,)
+
+        if op.op_type in _KERNELS:
+            inputs = {}
+            for name, var in op._input_vars.items():
+                if isinstance(var, (list, tuple)):
+                    inputs[name] = [self._env[v] for v in var]
+                elif var is not None and not isinstance(var, InternalVar):
+                    inputs[name] = self._env[var]
+                else:
+                    inputs[name] = None
+            out_vals = _KERNELS[op.op_type](op, self, inputs)
+        else:
+            out_vals = self._value_inference(op)
+
+        if not isinstance(out_vals, (tuple, list)):
+            out_vals = (out_vals,)
+        return out_vals
+
+    def _value_inference(self, op):
+        if type(op).value_inference is Operation.value_inference:
+            raise NotImplementedError(
+                "Op {} of type {} is not supported by the executor".format(op.name, op.op_type)
+            )
+        input_vars = {}
+        for name, var in op._input_vars.items():
+            if isinstance(op._input_types[name], TupleInputType):
+                input_vars[name] = tuple(_RuntimeVar(v, self._env[v]) for v in var)
+            elif var is not None and not isinstance(var, InternalVar):
+                input_vars[name] = _RuntimeVar(var, self._env[var])
+            else:
+                input_vars[name] = var
+        out_vals = type(op).value_inference(_RuntimeOp(op, input_vars))
+        if out_vals is None:
+            raise NotImplementedError(
+                "Op {} of type {} could not be run by the executor".format(op.name, op.op_type)
+            )
+        return out_vals
+
+    def _to_var_type(self, var, val):
+        """
+        Casts `val` to the dtype of `var`, and rounds it to fp16 under fp16 emulation.
+        """
+        if types.is_tensor(var.sym_type):
+            nptype = types.nptype_from_builtin(var.dtype)
+            val = np.asarray(val, dtype=nptype)
+        elif types.is_scalar(var.sym_type) and not types.is_str(var.sym_type):
+            nptype = types.nptype_from_builtin(var.sym_type)
+            val = nptype(val)
+        else:
+            return val
+        if self.fp16_emulation and nptype == np.float32:
+            val = val.astype(np.float16).astype(np.float32)
+        return val
@@ -0,0 +1,182 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+
+class LazyValue:
+    """
+    Placeholder for a const value which is expensive to materialize.
+
+    A LazyValue can be passed to ``mb.const`` in place of a numpy array. The const op
+    infers its type from ``dtype`` and ``shape`` only, and the numpy value is produced
+    by ``materialize()`` the first time ``Var.val`` (or ``Var.sym_val``) is read.
+
+    # Properties
+
+    dtype: (np.dtype)
+        Numpy dtype of the value.
+
+    shape: tuple[int]
+        Shape of the value.
+    """
+
+    __slots__ = ["dtype", "shape"]
+
+    # Whether the var holding the value keeps it once materialized. Otherwise the value
+    # is materialized on every read.
+    _keep_materialized = True
+
+    def __init__(self, dtype, shape):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+
+    def materialize(self):
+        """
+        Returns the value as a numpy array of ``self.dtype`` and ``self.shape``.
+        """
+        raise NotImplementedError("materialize() is not implemented by {}".format(type(self).__name__))
+
+
+# Each np.memmap holds an open file descriptor, so a weight file is mapped only once and
+# every FileValue in it is a view into that single mapping. The mapping is released
+# once no value refers to it anymore.
+_file_mappings = weakref.WeakValueDictionary()
+
+
+def _map_file(file_name):
+    stat = os.stat(file_name)
+    key = (os.path.abspath(file_name), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    mapping = _file_mappings.get(key)
+    if mapping is None:
+        mapping = np.memmap(file_name, dtype=np.uint8, mode="c")
+        _file_mappings[key] = mapping
+    return mapping
+
+
+class FileValue(LazyValue):
+    """
+    Handle to a tensor stored in a weight file (e.g. the ``weight.bin`` of an mlpackage).
+
+    The data is memory-mapped (copy-on-write) when the value is materialized, so only
+    the pages that are actually read are brought into memory, and writes to the
+    value never reach the file.
+
+    # Properties
+
+    file_name: (str)
+        Path of the weight file.
+
+    offset: (int)
+        Offset in bytes of the raw data in the file.
+    """
+
+    __slots__ = ["file_name", "offset"]
+
+    def __init__(self, file_name, offset, dtype, shape):
+        super().__init__(dtype, shape)
+        self.file_name = file_name
+        self.offset = offset
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def materialize(self):
+        mapping = _map_file(self.file_name)
+        if self.offset + self.nbytes > mapping.size:
+            raise ValueError(
+                "{} bytes at offset {} are out of the bounds of {}".format(
+                    self.nbytes, self.offset, self.file_name
+                )
+            )
+        value = mapping[self.offset : self.offset + self.nbytes]
+        return np.asarray(value).view(self.dtype).reshape(self.shape)
+
+
+class _DecompressedValueCache:
+    """
+    Least recently used values of DecompressedValues, which hold up to ``max_bytes``
+    bytes. The value of a DecompressedValue which is garbage collected is dropped.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._values = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        value = self._values.pop(key, None)
+        if value is not None:
+            self._nbytes -= value.nbytes
+
+    def discard(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._nbytes = 0
+
+    def get(self, key, compute_value):
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+                return value
+
+        value = compute_value()
+        with self._lock:
+            self._pop(key)
+            if value.nbytes <= self.max_bytes:
+                self._values[key] = value
+                self._nbytes += value.nbytes
+                while self._nbytes > self.max_bytes:
+                    self._pop(next(iter(self._values)))
+        return value
+
+
+class DecompressedValue(LazyValue):
+    """
+    Value of the output of a constexpr op (e.g. ``constexpr_lut_to_dense``), which is
+    decompressed from the values of the inputs of the op only when it is read, so that
+    a compressed program stays compressed in memory.
+
+    The var holding the value doesn't keep it: the values are instead kept in
+    ``DecompressedValue.cache``, which holds the most recently read ones, up to
+    ``DecompressedValue.cache.max_bytes`` bytes. A value which was evicted is
+    decompressed again on its next read. The values are read-only.
+
+    # Properties
+
+    decompress: (callable)
+        Returns the decompressed value.
+    """
+
+    __slots__ = ["decompress", "__weakref__"]
+
+    _keep_materialized = False
+
+    cache = _DecompressedValueCache(max_bytes=256 * 1024 * 1024)
+
+    def __init__(self, decompress, dtype, shape):
+        super().__init__(dtype, shape)
+        self.decompress = decompress
+        weakref.finalize(self, DecompressedValue.cache.discard, id(self))
+
+    def _decompress(self):
+        value = np.asarray(self.decompress()).astype(self.dtype, copy=False).reshape(self.shape)
+        value.flags.writeable = False
+        return value
+
+    def materialize(self):
+        return DecompressedValue.cache.get(id(self), self._decompress)
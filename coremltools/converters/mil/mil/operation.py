@@ -13,8 +13,9 @@ from coremltools.converters.mil.mil.types.symbolic import (any_symbolic,
                                                            is_symbolic)
 
 from . import SPACES
-from .block import curr_block
+from .block import _THREAD_STATE, _record_mutations, curr_block
 from .input_type import DefaultInputs, TensorInputType, TupleInputType
+from .lazy_value import LazyValue
 from .var import ComplexVar, InternalVar, ListVar, Var
 
 VALUE = 1
@@ -74,6 +75,9 @@ def precondition(allow=ALL):
 
         Return updated has_value, has_symbol, has_none
         """
+        if v._sym_val is not None and isinstance(v._sym_val.val, LazyValue):
+            # Known value, no need to materialize it for the check
+            return True, has_symbol, has_none
         if any_symbolic(v.sym_val):
             return has_value, True, has_none
         elif v.val is None:
@@ -336,7 +340,12 @@ class Operation:
                 if overwrite_output:
                     out_var._sym_val = sym_val
 
-                if sym_val is not None and out_var.sym_val is not None:
+                # Lazy values are never compared, as that would materialize them.
+                if (
+                    sym_val is not None
+                    and not isinstance(sym_val.val, LazyValue)
+                    and out_var.sym_val is not None
+                ):
                     if np.any(sym_val.val != out_var.sym_val):
                         if overwrite_output:
                             out_var._sym_val = sym_val
@@ -502,6 +511,10 @@ class Operation:
 
         self.input_spec.validate_inputs(self.name, self.op_type, input_kvs)
 
+        if _THREAD_STATE.mutations_stack:
+            # The producers of the replaced inputs lose a consumer
+            _record_mutations([self] + [v.op for v in self.get_flattened_inputs()])
+
         for name, var in input_kvs.items():
             # Remove this operation itself from existing input
             # Var's child_ops
@@ -527,6 +540,10 @@ class Operation:
             self._input_vars[name] = var
             setattr(self, name, var)
 
+        if _THREAD_STATE.mutations_stack:
+            # The producers of the new inputs gain a consumer
+            _record_mutations([v.op for v in self.get_flattened_inputs()])
+
     @property
     def inputs(self):
         """
@@ -17,6 +17,7 @@ from coremltools.converters.mil.mil.input_type import (DefaultInputs,
                                                        PyFunctionInputType,
                                                        TensorInputType,
                                                        TupleInputType)
+from coremltools.converters.mil.mil.lazy_value import LazyValue
 from coremltools.converters.mil.mil.operation import (NONE, SYMBOL, VALUE,
                                                       Operation, mil_list,
                                                       precondition)
@@ -150,15 +151,27 @@ class Const(Operation):
     )
 
     def type_inference(self):
-        builtin_type, _ = self._get_type_val(self.val.val)
+        builtin_type, _ = self._get_type_val(self._get_const_val())
         return builtin_type
 
     def value_inference(self):
-        _, val = self._get_type_val(self.val.val)
+        _, val = self._get_type_val(self._get_const_val())
         return val
 
+    def _get_const_val(self):
+        # Read the raw value of the input, so that a LazyValue is passed through
+        # as-is instead of being materialized by ``Var.val``.
+        value = self.val._sym_val.val
+        if isinstance(value, LazyValue):
+            return value
+        return self.val.val
+
     def _get_type_val(self, value):
 
+        if isinstance(value, LazyValue):
+            builtin_type = types.tensor(numpy_type_to_builtin_type(value.dtype), value.shape)
+            return builtin_type, value
+
         if isinstance(value, (float, np.float64)):
             value = np.float32(value)
         elif isinstance(value, bool):
@@ -166,7 +179,9 @@ class Const(Operation):
         elif isinstance(value, (int, np.int64)):
             value = np.int32(value)
         elif isinstance(value, (tuple, list, np.ndarray)):
-            value = np.array(value)
+            # An array is not copied: a const may share the memory of the weights of the
+            # source model, and is only copied when its dtype has to change.
+            value = np.asarray(value)
 
             # For the int type, we use int32 by default
             if value.dtype in [np.uint16, np.int16, np.uint64, np.int64]:
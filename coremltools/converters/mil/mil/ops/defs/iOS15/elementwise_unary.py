@@ -895,4 +895,4 @@ class cast(Operation):
         if not types.is_tensor(input_var.sym_type):
             return input_var.val.astype(dtype=type_map[dtype_val])
         else:
-            return np.array(input_var.val).astype(dtype=type_map[dtype_val])
+            return np.asarray(input_var.val).astype(dtype=type_map[dtype_val])
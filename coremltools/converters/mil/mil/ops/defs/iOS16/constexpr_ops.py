@@ -4,13 +4,32 @@ import numpy as np
 from coremltools.converters.mil.mil import types
 from coremltools.converters.mil.mil.input_type import (InputSpec,
                                                        TensorInputType)
+from coremltools.converters.mil.mil.lazy_value import DecompressedValue
 from coremltools.converters.mil.mil.operation import Operation
 from coremltools.converters.mil.mil.ops.defs._op_reqs import register_op
 from coremltools.converters.mil.mil.ops.defs.iOS16 import _IOS16_TARGET
+from coremltools.models._bit_packing import unpack_bits
+
+
+class _ConstexprOperation(Operation):
+    """
+    Base class of the constexpr ops. The value of the output is only computed (i.e.
+    decompressed) by ``value_inference`` when it is read, see DecompressedValue.
+    """
+
+    def _auto_val(self, output_types):
+        output_type = output_types[0]
+        builtin_val = output_type()
+        builtin_val.val = DecompressedValue(
+            self.value_inference,
+            types.nptype_from_builtin(output_type.get_primitive()),
+            output_type.get_shape(),
+        )
+        return (builtin_val,)
 
 
 @register_op(opset_version=_IOS16_TARGET)
-class constexpr_affine_dequantize(Operation):
+class constexpr_affine_dequantize(_ConstexprOperation):
     """
     A compile-time operation that returns a constant output value upon dequantizing its constant inputs.
 
@@ -136,7 +155,7 @@ class constexpr_affine_dequantize(Operation):
 
 
 @register_op(opset_version=_IOS16_TARGET)
-class constexpr_cast(Operation):
+class constexpr_cast(_ConstexprOperation):
     """
     A compile-time operation that returns a constant output value upon casting its constant input.
     ::
@@ -177,7 +196,7 @@ class constexpr_cast(Operation):
 
 
 @register_op(opset_version=_IOS16_TARGET)
-class constexpr_lut_to_dense(Operation):
+class constexpr_lut_to_dense(_ConstexprOperation):
     """
     A compile-time operation that returns a constant output value upon decompressing 
     a look-up table (LUT) to a dense tensor.
@@ -270,25 +289,14 @@ class constexpr_lut_to_dense(Operation):
 
     @staticmethod
     def decompress(lut, indices, shape):
-        bitarray = np.unpackbits(indices, bitorder="little")
         nbits = np.log2(lut.size).astype(np.int32)
-
-        pad_required = bitarray.size % nbits != 0
-        if pad_required:
-            bitarray = np.concatenate([bitarray, np.zeros(bitarray.size % nbits)])
-
-        assert bitarray.size % nbits == 0
-
-        size = np.prod(shape)
-        bitarray = bitarray.reshape(-1, nbits)[:size, :]
-
-        indices = np.packbits(bitarray, bitorder="little", axis=-1).reshape(-1)
+        indices = unpack_bits(indices, np.prod(shape), nbits, bitorder="little")
         flatten_val = lut[indices]
         return flatten_val.reshape(shape)
 
 
 @register_op(opset_version=_IOS16_TARGET)
-class constexpr_sparse_to_dense(Operation):
+class constexpr_sparse_to_dense(_ConstexprOperation):
     """
     A compile-time operation that returns a constant output value upon de-sparsification of its constant inputs.
 
@@ -12,6 +12,7 @@ import coremltools as ct
 from coremltools.converters.mil import testing_reqs
 from coremltools.converters.mil.mil import Builder as mb
 from coremltools.converters.mil.mil import types
+from coremltools.converters.mil.mil.lazy_value import DecompressedValue
 from coremltools.converters.mil.mil.ops.defs.iOS16 import constexpr_ops
 from coremltools.converters.mil.mil.ops.tests.testing_utils import \
     run_compare_builder
@@ -644,3 +645,47 @@ class TestConstexprSparseToDense:
         prog = mlmodel._mil_program
         if "constexpr_sparse_to_dense" not in get_op_types_in_program(prog):
             raise AssertionError("Invalidated: Test Failed")
+
+
+class TestConstexprLazyValue:
+    def test_value_decompressed_on_read(self, monkeypatch):
+        num_decompressions = []
+        decompress = constexpr_ops.constexpr_lut_to_dense.decompress
+
+        def counting_decompress(*args):
+            num_decompressions.append(1)
+            return decompress(*args)
+
+        monkeypatch.setattr(
+            constexpr_ops.constexpr_lut_to_dense, "decompress", staticmethod(counting_decompress)
+        )
+        monkeypatch.setattr(DecompressedValue.cache, "max_bytes", 1 << 20)
+
+        @mb.program(input_specs=[mb.TensorSpec(shape=(5,))], opset_version=ct.target.iOS16)
+        def prog(x):
+            weights = [
+                mb.constexpr_lut_to_dense(
+                    lut=np.array([1.0, 2.0, 3.0, 4.0], dtype=np.float32) * (i + 1),
+                    indices=np.array([10, 4], dtype=np.uint8),
+                    shape=np.array([5], dtype=np.uint32),
+                )
+                for i in range(2)
+            ]
+            return mb.add(x=mb.add(x=x, y=weights[0]), y=weights[1])
+
+        # Building (and printing) the program doesn't decompress the weights
+        str(prog)
+        assert len(num_decompressions) == 0
+
+        first, second = [op.outputs[0] for op in prog.find_ops(op_type="constexpr_lut_to_dense")]
+        np.testing.assert_allclose(first.val, [3, 3, 1, 1, 1])
+        assert not first.val.flags.writeable
+        assert len(num_decompressions) == 1
+
+        # The cache holds a single value: reading the other one evicts the first one
+        monkeypatch.setattr(DecompressedValue.cache, "max_bytes", first.val.nbytes)
+        np.testing.assert_allclose(second.val, [6, 6, 2, 2, 2])
+        np.testing.assert_allclose(second.val, [6, 6, 2, 2, 2])
+        assert len(num_decompressions) == 2
+        np.testing.assert_allclose(first.val, [3, 3, 1, 1, 1])
+        assert len(num_decompressions) == 3
@@ -36,7 +36,7 @@ def _match_pattern(op):
 
 @block_context_manager
 def _handle_block(block):
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["conv_transpose"], include_ops_with_blocks=True):
         for b in op.blocks:
             _handle_block(b)
 
@@ -3,21 +3,75 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
+import os
+from collections import Counter
+from functools import partial
+
 from tqdm import tqdm as _tqdm
 
 from coremltools import _logger as logger
 from coremltools.converters._profile_utils import _profile
 from coremltools.converters.mil.experimental.passes.generic_pass_infrastructure import \
     PassContainer
+from coremltools.converters.mil.mil.block import (InvalidBlockStateError,
+                                                  track_mutations,
+                                                  validate_mutations)
+from coremltools.converters.mil.mil.passes.graph_pass import \
+    AbstractFunctionPass
+from coremltools.converters.mil.mil.passes.pass_pipeline import (
+    PassPipeline, ValidationLevel, _program_fingerprint)
+from coremltools.converters.mil.mil.passes.pass_profiler import (
+    PASS_PROFILE_ENV_VAR, PassPipelineProfile)
 from coremltools.converters.mil.mil.passes.pass_registry import PASS_REGISTRY
 from coremltools.converters.mil.mil.passes.quantization_passes import \
     AbstractQuantizationPass
 
 
 @_profile
-def apply_common_pass_pipeline(prog, passes):
+def apply_common_pass_pipeline(prog, passes, profile=False, pass_pipeline=None):
+    """
+    Runs the common graph passes, the quantization passes in `passes`, and the clean up
+    passes on `prog`, in place.
+
+    profile: bool
+        True to record the wall time, the op counts and the peak memory of every pass.
+        Profiling is also enabled by setting the COREMLTOOLS_PASS_PROFILE environment
+        variable to a file path, in which case the profile is written to that file in
+        the Chrome trace format.
+
+    pass_pipeline: PassPipeline
+        The common and clean up passes to run. Defaults to PassPipeline().
+
+    Returns a PassPipelineProfile if profiling is enabled, otherwise None.
+    """
+    profile_path = os.environ.get(PASS_PROFILE_ENV_VAR)
+    pipeline_profile = PassPipelineProfile() if profile or profile_path else None
+
+    if pass_pipeline is None:
+        pass_pipeline = PassPipeline()
+
+    # A pass that runs several times is skipped when its previous run left the program
+    # unchanged, and the program did not change since. The program is compared by its
+    # fingerprint, which is computed only around the runs of such passes.
+    pass_counts = Counter(pass_pipeline.passes + pass_pipeline.cleanup_passes)
+    repeated_passes = {p for p, count in pass_counts.items() if count > 1}
+    # pass name -> fingerprint of the program after a run of the pass which did not change it
+    unchanged_by_pass = {}
+    # fingerprint of the program in its current state, or None if unknown
+    fingerprint = None
+
+    validation_level = pass_pipeline.validation_level
+
+    def _run_pass(graph_pass, p, name):
+        if pass_pipeline.num_workers > 1 and isinstance(graph_pass, AbstractFunctionPass):
+            graph_pass = partial(graph_pass, num_workers=pass_pipeline.num_workers)
+        if pipeline_profile is not None:
+            pipeline_profile._run_pass(graph_pass, prog, str(p), name)
+        else:
+            graph_pass(prog)
 
     def _apply(passes, name="common"):
+        nonlocal fingerprint
 
         if len(passes) == 0:
             return
@@ -27,9 +81,32 @@ def apply_common_pass_pipeline(prog, passes):
         prog.validate()
         s = 'passes' if len(passes) > 1 else 'pass'
         for p in _tqdm(passes, desc="Running MIL {} {}".format(name, s), unit=" passes"):
+            is_repeated = not isinstance(p, AbstractQuantizationPass) and p in repeated_passes
+            if is_repeated:
+                if fingerprint is None:
+                    fingerprint = _program_fingerprint(prog)
+                if unchanged_by_pass.get(p) == fingerprint:
+                    logger.info('Skipping pass "{}": the program is unchanged since its last run'.format(p))
+                    continue
+                fingerprint_before = fingerprint
+
             logger.info('Performing pass: "{}"'.format(p))
             graph_pass = PASS_REGISTRY[p] if not isinstance(p, AbstractQuantizationPass) else p
-            graph_pass(prog)
+            if validation_level == ValidationLevel.PER_PASS:
+                with track_mutations() as mutations:
+                    _run_pass(graph_pass, p, name)
+                try:
+                    validate_mutations(mutations)
+                except (InvalidBlockStateError, ValueError) as e:
+                    raise type(e)('Invalid program after pass "{}": {}'.format(p, e)) from e
+            else:
+                _run_pass(graph_pass, p, name)
+
+            fingerprint = None
+            if is_repeated:
+                fingerprint = _program_fingerprint(prog)
+                unchanged_by_pass[p] = fingerprint if fingerprint == fingerprint_before else None
+
             if isinstance(p, AbstractQuantizationPass) or not isinstance(PASS_REGISTRY[p], PassContainer):
                 prog.validate()
 
@@ -37,71 +114,34 @@ def apply_common_pass_pipeline(prog, passes):
 
         return
 
-    common_passes = [
-        "common::lower_complex_dialect_ops",
-        "common::update_output_dtypes",
-        "common::cast_optimization",
-        "common::const_elimination",
-        "common::sanitize_input_output_names",
-        "common::divide_to_multiply",
-        "common::add_conv_transpose_output_shape",
-        "common::const_elimination",
-        "common::loop_invariant_elimination",
-        "common::remove_symbolic_reshape",
-        "common::noop_elimination",
-        "common::fuse_matmul_weight_bias",
-        "common::fuse_linear_bias",
-        "common::fuse_gelu_tanh_approximation",
-        "common::fuse_gelu_exact",
-        "common::fuse_leaky_relu",
-        "common::rank0_expand_dims_swap",
-        "common::use_reflection_padding",
-        "common::merge_consecutive_paddings", # Should come after use_reflection_padding, which will introduce new padding layers
-        "common::pad_conv_connect", # Should come after merge_consecutive_paddings
-        "common::image_input_preprocess",
-        "common::replace_stack_reshape", # should come before detect_concat_interleave since it may add concat
-        "common::reduce_transposes",
-        "common::fuse_conv_scale",
-        "common::fuse_conv_bias",
-        "common::fuse_onehot_matmul_to_gather",
-        "common::fuse_layernorm_or_instancenorm",  # should come after reduce_transposes, to detect instance_norm
-        "common::fuse_elementwise_to_batchnorm",  # should come after fuse_layernorm_or_instancenorm
-        "common::fuse_reduce_mean", # should come after fuse_layernorm_or_instancenorm
-        "common::fuse_conv_batchnorm", # should come after fuse_elementwise_to_batchnorm
-        "common::fuse_conv_scale", # Re-run the fuse conv scale pass after the conv and batch_norm are fused
-        "common::fuse_conv_bias", # Re-run the fuse conv bias pass after the conv and batch_norm are fused
-        "common::fuse_conv_batchnorm", # In some cases, we need to run conv / batch_norm fusion again after the fuse_conv_scale and fuse_conv_bias passes
-        "common::detect_concat_interleave",
-        "common::concat_to_pixel_shuffle", # should come after detect_concat_interleave and after replace_stack_reshape
-        "common::fuse_prelu", # reduce_transpose pass should run before and after this pass (the one after will be run during the cleanup passes stage)
-        "common::prelu_to_lrelu",
-        "common::merge_consecutive_relus",
-        #  "remove_redundant_ops" pass should be applied towards the end, once other graph passes have done their optimizations.
-        # For instance, it should come after passes such as "reduce_transpose" that can introduce redundant transposes
-        # in the network (while reducing the total number of transposes), and after passes such as "fuse_layernorm_or_instancenorm"
-        # which detects patterns that involve redundant ops ("sub") etc.
-        "common::remove_redundant_ops",
-        "common::dead_code_elimination",  # always end with dce
-    ]
-
-    _apply(common_passes, name="Common")
-
-    for p in passes:
-        if isinstance(p, AbstractQuantizationPass):
-            _apply([p], type(p).__name__)
-
-    cleanup_passes = [
-        "common::dead_code_elimination",
-        "common::const_elimination",
-        "common::cast_optimization",
-        "common::const_elimination",
-        "common::loop_invariant_elimination",
-        "common::noop_elimination",
-        "common::dedup_op_and_var_names",
-        "common::reduce_transposes",  # fuse_layernorm_or_instancenorm can potentially add transposes
-        "common::remove_redundant_ops",
-        "common::topological_reorder",
-        "common::dead_code_elimination",  # always end with dce
-    ]
-
-    _apply(cleanup_passes, name="Clean up")
+    def _apply_all():
+        _apply(pass_pipeline.passes, name="Common")
+
+        for p in passes:
+            if isinstance(p, AbstractQuantizationPass):
+                _apply([p], type(p).__name__)
+
+        _apply(pass_pipeline.cleanup_passes, name="Clean up")
+
+    if validation_level == ValidationLevel.PER_PASS:
+        prog.validate(force=True)
+
+    if pipeline_profile is not None:
+        pipeline_profile._start()
+    try:
+        if validation_level == ValidationLevel.END_OF_PIPELINE:
+            with track_mutations() as mutations:
+                _apply_all()
+            validate_mutations(mutations)
+        else:
+            _apply_all()
+    finally:
+        if pipeline_profile is not None:
+            pipeline_profile._stop()
+
+    if pipeline_profile is not None:
+        logger.info("Profile of the MIL passes:\n{}".format(pipeline_profile))
+        if profile_path:
+            pipeline_profile.save(profile_path)
+
+    return pipeline_profile
@@ -157,7 +157,7 @@ def _fuse_or_cancel_consecutive_casts_block_wrapper(block, cached_vars):
 
     def _fuse_or_cancel_consecutive_casts_block(block, cached_vars):
         block_changed = False
-        for i, op in enumerate(list(block.operations)):
+        for op in block.find_ops_by_type(["cast"], include_ops_with_blocks=True):
             for b in op.blocks:
                 nested_block_changed = True
                 nested_block_cached_vars = {}
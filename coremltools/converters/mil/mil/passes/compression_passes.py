@@ -3,6 +3,9 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 from coremltools import _logger as logger
@@ -16,15 +19,120 @@ from coremltools.converters.mil.mil.ops.defs.iOS16 import (
     constexpr_lut_to_dense,
     constexpr_sparse_to_dense,
 )
+from coremltools.converters.mil.mil.passes.helper import block_context_manager
 from coremltools.converters.mil.mil.passes.quantization_passes import \
     AbstractQuantizationPass
+from coremltools.converters.mil.mil.program import Program
 from coremltools.converters.mil.mil.types.type_mapping import (
     is_builtin, 
     nptype_from_builtin,
     numpy_type_to_builtin_type,
 )
-from coremltools.models.neural_network.quantization_utils import \
-    _get_kmeans_lookup_table_and_weight
+from coremltools.models._bit_packing import pack_bits
+
+
+class AbstractCompressionPass(AbstractQuantizationPass):
+    """
+    Base class of the transforms which compress the weights of const ops.
+
+    The compression of each weight only depends on its value, so that it can run in a pool
+    of ``num_workers`` threads, while the graph is modified on the main thread.
+
+    Derived class needs to implement following methods:
+        - is_valid_op(op)
+        - compress(*args): staticmethod which returns the params of the compressed weight,
+          or None to leave the op unchanged.
+        - _get_compress_args(op): the arguments of compress for the weight of op.
+        - _replace_op(op, params): replaces op by the ops which hold the compressed weight.
+    """
+
+    def __init__(self, op_selector=None, num_workers=1):
+        super().__init__(op_selector=op_selector)
+        if not isinstance(num_workers, int) or num_workers < 1:
+            raise ValueError("num_workers must be a positive integer, got {}".format(num_workers))
+        self.num_workers = num_workers
+
+    def _get_compress_args(self, op):
+        raise NotImplementedError()
+
+    def _replace_op(self, op, params):
+        raise NotImplementedError()
+
+    def transform_op(self, op):
+        params = self.compress(*self._get_compress_args(op))
+        if params is not None:
+            self._replace_op(op, params)
+
+    def _compress_ops(self, ops):
+        """
+        Yields the compression params of each op of `ops`, in order. With several workers,
+        the weights of the next ops are compressed in the background, up to
+        2 * num_workers weights ahead of the op being replaced, which bounds the memory held by
+        pending weights.
+        """
+        if self.num_workers == 1:
+            for op in ops:
+                yield self.compress(*self._get_compress_args(op))
+            return
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            pending = deque()
+            for op in ops:
+                pending.append(executor.submit(self.compress, *self._get_compress_args(op)))
+                if len(pending) > 2 * self.num_workers:
+                    yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+
+    def apply(self, prog):
+        if not isinstance(prog, Program):
+            raise TypeError(
+                'Transform "{}" can only be applied on PyMIL programs.'.format(self)
+            )
+
+        ops = []
+
+        def collect_ops(block):
+            for op in list(block.operations):
+                for b in op.blocks:
+                    collect_ops(b)
+                if self.is_valid_op(op) and self.op_selector(op):
+                    ops.append(op)
+
+        for f in prog.functions.values():
+            collect_ops(f)
+        selected_ops = set(ops)
+        compressed_params = self._compress_ops(ops)
+
+        @block_context_manager
+        def apply_block(block):
+            for op in list(block.operations):
+                for b in op.blocks:
+                    apply_block(b)
+
+                if op in selected_ops:
+                    params = next(compressed_params)
+                    if params is not None:
+                        self._replace_op(op, params)
+
+        for f in prog.functions.values():
+            apply_block(f)
+
+
+def _check_chunk_size(chunk_size):
+    if chunk_size is not None and (not isinstance(chunk_size, int) or chunk_size < 1):
+        raise ValueError("chunk_size must be None or a positive integer, got {}".format(chunk_size))
+
+
+def _get_row_blocks(shape, chunk_size):
+    """
+    Yields the slices of the blocks of rows (along the first axis) of an array of shape
+    `shape`, each holding about `chunk_size` elements, and at least a row.
+    """
+    row_size = int(np.prod(shape[1:]))
+    rows_per_block = max(1, chunk_size // max(1, row_size))
+    for start in range(0, shape[0], rows_per_block):
+        yield slice(start, min(start + rows_per_block, shape[0]))
 
 
 class SparseParams:
@@ -34,22 +142,29 @@ class SparseParams:
         self.shape = shape
 
 
-class WeightSparsifier(AbstractQuantizationPass):
+class WeightSparsifier(AbstractCompressionPass):
     """
     This transform does the following, for each const op and if the "op_selector" return True:
     - (self.sparsity) fraction of values with the least absolute value are zeroed out.
     - If fake_compression=False,  Zeroed-Out Value is encoded via constexpr_sparse_to_dense op
     - If fake_compression=True,   Zeroed-Out Value is encoded via const op
     - Old const is replaced by a new operation with zeroed-out value.
+
+    If chunk_size is set, each weight is sparsified in blocks of about chunk_size elements,
+    and the mask and the nonzero values are written into preallocated arrays, so that no
+    temporary array of the size of the weight is created (but for the percentile_based
+    mode, which needs the absolute values of the whole weight to compute the threshold).
     """
     WEIGHT_SPARSIFICATION_MODES = ("THRESHOLD_BASED", "PERCENTILE_BASED")
 
-    def __init__(self, mode="threshold_based", threshold=1e-3, target_percentile=1.0, fake_compression=False, op_selector=None):
-        super().__init__(op_selector=op_selector)
+    def __init__(self, mode="threshold_based", threshold=1e-3, target_percentile=1.0, fake_compression=False, op_selector=None, num_workers=1, chunk_size=None):
+        super().__init__(op_selector=op_selector, num_workers=num_workers)
+        _check_chunk_size(chunk_size)
         self.fake_compression = fake_compression
         self.mode = mode.upper()
         self.threshold = threshold
         self.target_percentile = target_percentile
+        self.chunk_size = chunk_size
 
         if not self.mode in WeightSparsifier.WEIGHT_SPARSIFICATION_MODES:
             msg = (
@@ -71,7 +186,46 @@ class WeightSparsifier(AbstractQuantizationPass):
         return False
 
     @staticmethod
-    def compress(val, mode, target_percentile=None, threshold=None):
+    def _compress_chunked(val, mode, target_percentile, threshold, chunk_size):
+        flattened_val = val.reshape(-1)
+        if mode == "PERCENTILE_BASED":
+            q = target_percentile * 100
+            threshold = np.percentile(np.abs(flattened_val), q, overwrite_input=True)
+
+        # The blocks start on a byte of the packed mask
+        block_size = max(8, chunk_size - chunk_size % 8)
+        blocks = [
+            slice(start, min(start + block_size, flattened_val.size))
+            for start in range(0, flattened_val.size, block_size)
+        ]
+
+        mask = np.empty((flattened_val.size + 7) // 8, dtype=np.uint8)
+        num_nonzeros = 0
+        for block in blocks:
+            # A NaN is kept, as in the unchunked mode
+            block_mask = ~(np.abs(flattened_val[block]) <= threshold)
+            block_mask &= flattened_val[block] != 0
+            mask[block.start // 8 : (block.stop + 7) // 8] = np.packbits(block_mask, bitorder="little")
+            num_nonzeros += np.count_nonzero(block_mask)
+
+        params = SparseParams()
+        params.nonzero_data = np.empty(num_nonzeros, dtype=val.dtype)
+        offset = 0
+        for block in blocks:
+            block_mask = np.unpackbits(
+                mask[block.start // 8 : (block.stop + 7) // 8],
+                count=block.stop - block.start,
+                bitorder="little",
+            ).view(bool)
+            block_nonzeros = flattened_val[block][block_mask]
+            params.nonzero_data[offset : offset + block_nonzeros.size] = block_nonzeros
+            offset += block_nonzeros.size
+        params.mask = mask
+        params.shape = val.shape
+        return params
+
+    @staticmethod
+    def compress(val, mode, target_percentile=None, threshold=None, chunk_size=None):
 
         mode = mode.upper()
 
@@ -85,6 +239,9 @@ class WeightSparsifier(AbstractQuantizationPass):
         if not isinstance(val, (np.ndarray, np.generic)):
             raise ValueError("Only numpy arrays are supported")
 
+        if chunk_size is not None and val.ndim > 0:
+            return WeightSparsifier._compress_chunked(val, mode, target_percentile, threshold, chunk_size)
+
         flattened_val = val.flatten()
 
         if mode == "PERCENTILE_BASED":
@@ -104,9 +261,11 @@ class WeightSparsifier(AbstractQuantizationPass):
             raise ValueError("Invalid type of params")
         return constexpr_sparse_to_dense.decompress(params.nonzero_data, params.mask, params.shape)
 
-    def transform_op(self, op):
+    def _get_compress_args(self, op):
+        return op.val.val, self.mode, self.target_percentile, self.threshold, self.chunk_size
+
+    def _replace_op(self, op, sparse_params):
         block = op.enclosing_block
-        sparse_params = self.compress(op.val.val, self.mode, self.target_percentile, self.threshold)
 
         if not self.fake_compression:
             new_var = mb.constexpr_sparse_to_dense(
@@ -141,7 +300,92 @@ class LutParams:
         self.shape = shape
 
 
-class WeightPalettizer(AbstractQuantizationPass):
+# Number of elements assigned to the LUT entries at a time, see _get_lut_indices
+_LUT_INDICES_CHUNK_SIZE = 1 << 20
+
+
+def _get_unique_values_and_counts(val):
+    """
+    Returns the sorted unique values of val, and their number of occurrences.
+    """
+    if val.dtype != np.float16:
+        return np.unique(val, return_counts=True)
+
+    # A fp16 weight has at most 65536 distinct values: they are counted in a single pass,
+    # without sorting the weight.
+    counts = np.bincount(np.ascontiguousarray(val).reshape(-1).view(np.uint16), minlength=1 << 16)
+    codes = np.flatnonzero(counts)
+    values = codes.astype(np.uint16).view(np.float16)
+    order = np.argsort(values, kind="stable")
+    values, counts = values[order], counts[codes][order]
+    # -0.0 and 0.0 are the same value
+    values, first_ids = np.unique(values, return_index=True)
+    return values, np.add.reduceat(counts, first_ids)
+
+
+def _kmeans_1d(values, counts, n_clusters, max_iter=300, num_bins=1024):
+    """
+    Lloyd's k-means of the sorted distinct ``values``, each weighted by its number of
+    occurrences in ``counts``. Returns the ``n_clusters`` sorted centers.
+
+    The clusters of sorted values are contiguous, so each one is given by its bounds in
+    ``values``, and its weight and mean by the prefix sums of ``counts`` and
+    ``values * counts``. An iteration thus costs O(n_clusters * log(len(values))),
+    whatever the size of the weight. The centers are initialized from a histogram of the
+    values (see below) rather than at random, so that the result is deterministic.
+    """
+    # Converted once, as np.searchsorted would otherwise convert them at each iteration
+    values = values.astype(np.float64)
+    cum_counts = np.concatenate(([0.0], np.cumsum(counts, dtype=np.float64)))
+    cum_sums = np.concatenate(([0.0], np.cumsum(values * counts)))
+
+    # For a density p of the values, the optimal density of the centers is proportional
+    # to p^(1/3): the centers start at the quantiles of the cube root of a histogram of
+    # the values.
+    edges = np.linspace(values[0], values[-1], num_bins + 1)
+    edge_ids = np.searchsorted(values, edges, side="right")
+    edge_ids[0] = 0
+    bin_counts = np.diff(cum_counts[edge_ids])
+    cum_density = np.concatenate(([0.0], np.cumsum(np.cbrt(bin_counts))))
+    quantiles = (np.arange(n_clusters) + 0.5) / n_clusters * cum_density[-1]
+    centers = np.interp(quantiles, cum_density, edges)
+
+    bounds = None
+    for _ in range(max_iter):
+        # The values up to a midpoint between two centers (included) go to the lower one
+        splits = np.searchsorted(values, (centers[1:] + centers[:-1]) / 2, side="right")
+        new_bounds = np.concatenate(([0], splits, [len(values)]))
+        if bounds is not None and np.array_equal(new_bounds, bounds):
+            break
+        bounds = new_bounds
+        cluster_counts = cum_counts[bounds[1:]] - cum_counts[bounds[:-1]]
+        cluster_sums = cum_sums[bounds[1:]] - cum_sums[bounds[:-1]]
+        # An empty cluster keeps its center
+        centers = np.sort(
+            np.where(
+                cluster_counts > 0, cluster_sums / np.maximum(cluster_counts, 1), centers
+            )
+        )
+    return centers
+
+
+def _get_lut_indices(val, lut):
+    """
+    Returns the index of the nearest entry of the sorted ``lut`` for each element of
+    ``val``, as a flat uint8 array. The elements are processed by chunks, so the int64
+    positions returned by np.searchsorted are never allocated for the whole weight.
+    """
+    val = val.reshape(-1)
+    lut = np.asarray(lut, dtype=np.float64)
+    boundaries = (lut[1:] + lut[:-1]) / 2
+    indices = np.empty(val.size, dtype=np.uint8)
+    for start in range(0, val.size, _LUT_INDICES_CHUNK_SIZE):
+        end = start + _LUT_INDICES_CHUNK_SIZE
+        indices[start:end] = np.searchsorted(boundaries, val[start:end])
+    return indices
+
+
+class WeightPalettizer(AbstractCompressionPass):
     """
     This transform does the following, for each const op and if the "op_selector" return True:
     - A linear look up table with 2**(nbits) entries is created and value is represented via indexing into this look up table.
@@ -150,8 +394,8 @@ class WeightPalettizer(AbstractQuantizationPass):
     - Old const op is replaced by a newly created operation.
     """
     WEIGHT_PALETTIZATION_MODES = ("KMEANS", "UNIFORM", "UNIQUE", "CUSTOM")
-    def __init__(self, nbits, fake_compression=False, op_selector=None, mode="kmeans", lut_function=None):
-        super().__init__(op_selector=op_selector)
+    def __init__(self, nbits, fake_compression=False, op_selector=None, mode="kmeans", lut_function=None, num_workers=1):
+        super().__init__(op_selector=op_selector, num_workers=num_workers)
         self.fake_compression = fake_compression
         self.nbits = nbits
         self.mode = mode.upper()
@@ -195,9 +439,16 @@ class WeightPalettizer(AbstractQuantizationPass):
         mode = mode.upper()
 
         def compress_kmeans(val, nbits):
-            lut, indices = _get_kmeans_lookup_table_and_weight(nbits, val)
-            lut = lut.astype(val.dtype)
-            indices = indices.astype(np.uint8)
+            values, counts = _get_unique_values_and_counts(val)
+            n_clusters = 1 << nbits
+            if len(values) <= n_clusters:
+                centers = values
+            else:
+                centers = _kmeans_1d(values, counts, n_clusters)
+            lut = np.zeros((n_clusters,), dtype=val.dtype)
+            lut[:len(centers)] = centers
+            # The elements are mapped to the nearest entries once rounded to the dtype of the LUT
+            indices = _get_lut_indices(val, lut[:len(centers)])
             return lut, indices
 
         def compress_uniform(val, nbits):
@@ -212,9 +463,7 @@ class WeightPalettizer(AbstractQuantizationPass):
             lut = lut.astype(val.dtype)
             return lut, indices
 
-        def get_nbits_for_unique_mode(val):
-            val = val.flatten()
-            unique_vals = np.unique(val).tolist()
+        def get_nbits_for_unique_mode(unique_vals):
             for nbits in (1, 2, 4, 6, 8):
                 if len(unique_vals) <= 1 << nbits:
                     return nbits
@@ -222,29 +471,17 @@ class WeightPalettizer(AbstractQuantizationPass):
             logger.warning(msg)
             return None
 
-        def compress_unique(val, nbits):
-            val = val.flatten()
-            unique_vals = np.unique(val).tolist()
+        def compress_unique(val, unique_vals, nbits):
             if len(unique_vals) > 1 << nbits:
                 msg = "Too many unique values {} in the weight. Couldn't represented in {} bits.".format(len(unique_vals), nbits)
                 raise ValueError(msg)
-            lut = [0] * (1 << nbits)
+            lut = np.zeros((1 << nbits,), dtype=val.dtype)
             lut[:len(unique_vals)] = unique_vals
-            indices = np.zeros((len(val),))
-            for i, k in enumerate(lut):
-                indices += (i+1) * (val == k).astype(np.int32)
-            indices = indices - 1
-            assert len(np.where(indices == -1)[0]) == 0, "weight must be corresponding to one existing indice"
-
-            lut = np.array(lut).astype(val.dtype)
-            indices = indices.astype(np.uint8)
+            indices = _get_lut_indices(val, unique_vals)
             return lut, indices
 
         def pack_indices_into_bytes_array(indices, nbits):
-            bitarray = np.unpackbits(indices.reshape(-1, 1), bitorder="little", axis=-1)[
-                :, :nbits
-            ]
-            return np.packbits(bitarray.flatten(), bitorder="little")
+            return pack_bits(indices, nbits, bitorder="little")
 
         def check_lut_parameters_are_valid(val, lut, indices):
             if not isinstance(lut, np.ndarray) or not isinstance(indices, np.ndarray):
@@ -270,10 +507,11 @@ class WeightPalettizer(AbstractQuantizationPass):
         elif mode == "UNIFORM":
             lut, indices = compress_uniform(val, nbits)
         elif mode == "UNIQUE":
-            nbits = get_nbits_for_unique_mode(val)
+            unique_vals, _ = _get_unique_values_and_counts(val)
+            nbits = get_nbits_for_unique_mode(unique_vals)
             if nbits is None:
                 return None
-            lut, indices = compress_unique(val, nbits)
+            lut, indices = compress_unique(val, unique_vals, nbits)
         elif mode == "CUSTOM":
             lut, indices = lut_function(val)
 
@@ -292,13 +530,11 @@ class WeightPalettizer(AbstractQuantizationPass):
             raise ValueError("Invalid type of params")
         return constexpr_lut_to_dense.decompress(params.lut, params.indices, params.shape)
 
-    def transform_op(self, op):
-        block = op.enclosing_block
-        lut_params = self.compress(op.val.val, self.mode, self.nbits, self.lut_function)
-
-        if lut_params is None:
-            return
+    def _get_compress_args(self, op):
+        return op.val.val, self.mode, self.nbits, self.lut_function
 
+    def _replace_op(self, op, lut_params):
+        block = op.enclosing_block
         if not self.fake_compression:
             new_var = mb.constexpr_lut_to_dense(
                 indices=lut_params.indices,
@@ -333,20 +569,27 @@ class AffineQuantParams:
         self.axis = axis
 
 
-class WeightAffineQuantizer(AbstractQuantizationPass):
+class WeightAffineQuantizer(AbstractCompressionPass):
     """
     This transform does the following, for each const op and if the "op_selector" return True:
     - Values are linearly quantized into unsigned 8-bits.
     - If fake_compression=False,  compressed value is encoded via constexpr_affine_dequantize op
     - If fake_compression=True,   compressed value is decompressed and then encoded via const op
     - Old const is replaced by a newly created operation.
+
+    If chunk_size is set, each weight is quantized in blocks of rows of about chunk_size
+    elements: the per-channel min / max are reduced block by block, and the quantized values
+    are written into a preallocated array, so that no temporary array of the size of the
+    weight is created.
     """
     WEIGHT_AFFINE_QUANTIZATION_MODES = ("LINEAR_SYMMETRIC", "LINEAR")
     WEIGHT_AFFINE_DTYPES = (types.int8, types.uint8)
-    def __init__(self, fake_compression=False, op_selector=None, mode="linear", dtype=np.int8):
-        super().__init__(op_selector=op_selector)
+    def __init__(self, fake_compression=False, op_selector=None, mode="linear", dtype=np.int8, num_workers=1, chunk_size=None):
+        super().__init__(op_selector=op_selector, num_workers=num_workers)
+        _check_chunk_size(chunk_size)
         self.fake_compression = fake_compression
         self.mode = mode.upper()
+        self.chunk_size = chunk_size
 
         # check mode
         if not self.mode in WeightAffineQuantizer.WEIGHT_AFFINE_QUANTIZATION_MODES:
@@ -382,7 +625,36 @@ class WeightAffineQuantizer(AbstractQuantizationPass):
         return axis
 
     @staticmethod
-    def compress(val, axis, mode, dtype):
+    def _get_channel_range(val, axis, chunk_size):
+        """
+        Returns the per-channel min and max of val along axis, with the reduced axes kept.
+        With a chunk_size, they are reduced over blocks of rows of val.
+        """
+        axes = tuple([i for i in range(len(val.shape)) if i != axis])
+        if chunk_size is None or val.ndim == 0:
+            return np.amin(val, axis=axes, keepdims=True), np.amax(val, axis=axes, keepdims=True)
+
+        range_shape = [1] * val.ndim
+        range_shape[axis] = val.shape[axis]
+        val_min = np.empty(range_shape, dtype=val.dtype)
+        val_max = np.empty(range_shape, dtype=val.dtype)
+        for rows in _get_row_blocks(val.shape, chunk_size):
+            block_min = np.amin(val[rows], axis=axes, keepdims=True)
+            block_max = np.amax(val[rows], axis=axes, keepdims=True)
+            if axis == 0:
+                # The blocks hold whole channels
+                val_min[rows] = block_min
+                val_max[rows] = block_max
+            elif rows.start == 0:
+                val_min[...] = block_min
+                val_max[...] = block_max
+            else:
+                np.minimum(val_min, block_min, out=val_min)
+                np.maximum(val_max, block_max, out=val_max)
+        return val_min, val_max
+
+    @staticmethod
+    def compress(val, axis, mode, dtype, chunk_size=None):
         mode = mode.upper()
         mode_dtype_to_range = {
             (types.int8, "LINEAR"): (-128, 127),
@@ -395,9 +667,7 @@ class WeightAffineQuantizer(AbstractQuantizationPass):
             raise ValueError("Only numpy arrays are supported")
 
         params = AffineQuantParams()
-        axes = tuple([i for i in range(len(val.shape)) if i != axis])
-        val_min = np.amin(val, axis=axes, keepdims=True)
-        val_max = np.amax(val, axis=axes, keepdims=True)
+        val_min, val_max = WeightAffineQuantizer._get_channel_range(val, axis, chunk_size)
 
         if mode == "LINEAR_SYMMETRIC":
             # For the linear_symmetric mode, the range is symmetrical to 0
@@ -415,8 +685,17 @@ class WeightAffineQuantizer(AbstractQuantizationPass):
         params.scale = (val_max - val_min) / (q_val_max - q_val_min)
         params.scale = params.scale.astype(val.dtype).squeeze()
 
-        params.quantized_data = np.round(val * (q_val_max - q_val_min) / (val_max - val_min)).astype(np_dtype)
-        params.quantized_data = params.quantized_data + params.zero_point
+        if chunk_size is None or val.ndim == 0:
+            params.quantized_data = np.round(val * (q_val_max - q_val_min) / (val_max - val_min)).astype(np_dtype)
+            params.quantized_data = params.quantized_data + params.zero_point
+        else:
+            params.quantized_data = np.empty(val.shape, dtype=np_dtype)
+            val_range = val_max - val_min
+            for rows in _get_row_blocks(val.shape, chunk_size):
+                block_range = val_range[rows] if axis == 0 else val_range
+                block_zero_point = params.zero_point[rows] if axis == 0 else params.zero_point
+                block = np.round(val[rows] * (q_val_max - q_val_min) / block_range).astype(np_dtype)
+                np.add(block, block_zero_point, out=params.quantized_data[rows])
 
         params.zero_point = params.zero_point.squeeze()
 
@@ -438,9 +717,11 @@ class WeightAffineQuantizer(AbstractQuantizationPass):
             raise ValueError("Invalid type of params")
         return constexpr_affine_dequantize.decompress(params.quantized_data, params.zero_point, params.scale, params.axis)
 
-    def transform_op(self, op):
+    def _get_compress_args(self, op):
+        return op.val.val, self._get_axis(op), self.mode, self.dtype, self.chunk_size
+
+    def _replace_op(self, op, quant_params):
         block = op.enclosing_block
-        quant_params = self.compress(op.val.val, self._get_axis(op), self.mode, self.dtype)
 
         if not self.fake_compression:
             new_var = mb.constexpr_affine_dequantize(
@@ -77,7 +77,7 @@ def _replace_ops(block, w_concat, h_concat_0, h_concat_1):
     
 @block_context_manager
 def _concat_to_pixel_shuffle_block(block):
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["concat"]):
         layers = _match_pattern(op)
         if layers:
             _replace_ops(block, layers[0], layers[1], layers[2])
@@ -4,50 +4,69 @@
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
 from coremltools.converters.mil.mil import Builder as mb
-from coremltools.converters.mil.mil.passes.graph_pass import AbstractGraphPass
+from coremltools.converters.mil.mil.passes.graph_pass import AbstractFunctionPass
 from coremltools.converters.mil.mil.passes.helper import block_context_manager
 from coremltools.converters.mil.mil.passes.pass_registry import register_pass
 
 
+def _is_foldable(op):
+    # A non-const op whose outputs can all be replaced by consts
+    return (
+        op.op_type != "const"
+        and len(op.outputs) > 0
+        and all(o.can_be_folded_to_const() for o in op.outputs)
+    )
+
+
+def _is_used_outside(var, folded_ops):
+    # Whether var is still used once the ops of folded_ops are removed
+    return (
+        var in var.op.enclosing_block.outputs
+        or len(var.consuming_blocks) > 0
+        or any(child_op not in folded_ops for child_op in var.child_ops)
+    )
+
+
 @block_context_manager
 def _const_elimination_block(block):
-    # shallow copy hides changes on f.operations during the loop
-    for op in list(block.operations):
+    for op in block.find_ops_by_type([], include_ops_with_blocks=True):
+        for b in op.blocks:
+            _const_elimination_block(b)
+
+    # The values of the vars are computed when their ops are created, so a const is
+    # only needed for the values which reach an op that stays in the block (or an
+    # output of the block). The vars in between, e.g. the shape arithmetic feeding a
+    # reshape, are dropped with their ops instead of each getting a const.
+    folded_ops = {op: None for op in block.operations if _is_foldable(op)}
 
+    for op in list(block.operations):
         if op.op_type == "const":
             continue
+        for o in op.outputs:
+            if not o.can_be_folded_to_const() or not _is_used_outside(o, folded_ops):
+                continue
+            res = mb.const(
+                val=o.val,
+                before_op=op,
+                # same var name, but different python
+                # instance does not violate SSA property.
+                name=o.name,
+            )
+            block.replace_uses_of_var_after_op(anchor_op=op, old_var=o, new_var=res)
+            # rename the const output
+            o.set_name(o.name + "_ignored")
 
-        for b in op.blocks:
-            _const_elimination_block(b)
-
-        all_outputs_are_replaced = True
-        for i, o in enumerate(op.outputs):
-            if o.val is not None:
-                res = mb.const(
-                    val=o.val,
-                    before_op=op,
-                    # same var name, but different python
-                    # instance does not violate SSA property.
-                    name=o.name,
-                )
-                
-                if op.enclosing_block.try_replace_uses_of_var_after_op(
-                    anchor_op=op,
-                    old_var=o,
-                    new_var=res,
-                ):
-                    # rename the const output
-                    o.set_name(o.name + '_ignored')
-                else:
-                    all_outputs_are_replaced = False
-            else:
-                all_outputs_are_replaced = False
+    # Remove the folded ops at once, consumers first, as long as nothing else uses them
+    removed_ops = set()
+    for op in reversed(folded_ops):
+        if not any(_is_used_outside(o, removed_ops) for o in op.outputs):
+            removed_ops.add(op)
+    if len(removed_ops) > 0:
+        block.remove_ops(list(removed_ops))
 
-        if all_outputs_are_replaced:
-            op.remove_from_block()
 
 @register_pass(namespace="common")
-class const_elimination(AbstractGraphPass):
+class const_elimination(AbstractFunctionPass):
     """
     prog: Program
 
@@ -64,6 +83,5 @@ class const_elimination(AbstractGraphPass):
     #   %4 = other_op(%2_const, %3)
     #
     """
-    def apply(self, prog):
-        for f in prog.functions.values():
-            _const_elimination_block(f)
+    def apply_function(self, func):
+        _const_elimination_block(func)
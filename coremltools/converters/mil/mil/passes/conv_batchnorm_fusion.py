@@ -138,7 +138,7 @@ def _fuse_conv_batchnorm_block(block):
         return None
 
     fusion_occurred = False
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["conv", "conv_transpose"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
@@ -252,7 +252,7 @@ def _try_to_transform(conv_op, add_op, block):
 @block_context_manager
 def _fuse_conv_bias_block(block):
     fusion_status = False
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["conv", "conv_transpose"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
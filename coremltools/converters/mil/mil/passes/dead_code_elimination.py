@@ -4,7 +4,7 @@
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
 from coremltools import _logger as logger
-from coremltools.converters.mil.mil.passes.graph_pass import AbstractGraphPass
+from coremltools.converters.mil.mil.passes.graph_pass import AbstractFunctionPass
 from coremltools.converters.mil.mil.passes.pass_registry import register_pass
 
 
@@ -39,7 +39,7 @@ def _dead_code_elimination_block(block):
     return used_vars
 
 @register_pass(namespace="common")
-class dead_code_elimination(AbstractGraphPass):
+class dead_code_elimination(AbstractFunctionPass):
     """
     Eliminate unused ops in program.
 
@@ -79,6 +79,5 @@ class dead_code_elimination(AbstractGraphPass):
     In this example, %matmul_0 is an op that's not used in the computation,
     this op and its input ops (%tx_0 and %ty_0) are eliminated in this pass.
     """
-    def apply(self, prog):
-        for f in prog.functions.values():
-            _dead_code_elimination_block(f)
+    def apply_function(self, func):
+        _dead_code_elimination_block(func)
@@ -14,7 +14,7 @@ from coremltools.converters.mil.mil.passes.pass_registry import register_pass
 
 @block_context_manager
 def _divide_to_multiply_block(block):
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["real_div"], include_ops_with_blocks=True):
         for b in op.blocks:
             _divide_to_multiply_block(b)
         if len(op.blocks) > 0:
@@ -91,7 +91,7 @@ def _try_to_transform(mul_op, add_op, block):
 @block_context_manager
 def _fuse_elementwise_to_batchnorm_block(block):
     fusion_status = False
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["mul"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
@@ -98,7 +98,7 @@ def _try_to_transform(op, block):
 @block_context_manager
 def _fuse_gelu_exact_block(block):
     fusion_occurred = False
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["mul", "real_div"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
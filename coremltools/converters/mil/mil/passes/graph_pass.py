@@ -4,7 +4,9 @@
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
+from coremltools.converters.mil.mil.block import _get_thread_state, _shared_thread_state
 
 
 class AbstractGraphPass(ABC):
@@ -19,3 +21,41 @@ class AbstractGraphPass(ABC):
     @abstractmethod
     def apply(self, prog):
         pass
+
+
+class AbstractFunctionPass(AbstractGraphPass):
+    """
+    Base class of the passes which process every function of the program on its own,
+    in ``apply_function``: they neither read nor modify the other functions. The
+    functions can then be processed in several threads at once (see the
+    ``num_workers`` argument of ``PassPipeline``).
+    """
+
+    def __call__(self, prog, num_workers=1):
+        if prog.skip_all_passes:
+            return
+        functions = list(prog.functions.values())
+        if num_workers <= 1 or len(functions) <= 1:
+            self.apply(prog)
+            return
+
+        # The worker threads record their mutations in the sets tracked by this thread,
+        # and generate the names of the new ops from the same counts
+        thread_state = _get_thread_state()
+
+        def apply_function(f):
+            with _shared_thread_state(thread_state):
+                self.apply_function(f)
+
+        with ThreadPoolExecutor(max_workers=min(num_workers, len(functions))) as executor:
+            futures = [executor.submit(apply_function, f) for f in functions]
+            for future in futures:
+                future.result()
+
+    def apply(self, prog):
+        for f in prog.functions.values():
+            self.apply_function(f)
+
+    @abstractmethod
+    def apply_function(self, func):
+        pass
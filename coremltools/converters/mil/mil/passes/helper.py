@@ -3,10 +3,22 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
+from collections import namedtuple
+
 import numpy as np
 
 from coremltools.converters.mil.mil import Block, Var
 
+ValueStats = namedtuple("ValueStats", ["min", "max", "abs_max", "abs_min"])
+ValueStats.__doc__ = """
+Statistics of the value of a float var, see get_value_stats.
+
+min, max: the smallest and the largest values.
+abs_max: the largest magnitude.
+abs_min: the smallest non-zero magnitude, inf if all the values are zeros. A value is
+    subnormal in a float type if its magnitude is below np.finfo(type).tiny.
+"""
+
 
 def block_context_manager(func):
     """
@@ -42,6 +54,31 @@ def block_context_manager(func):
             return func(*args)
     return wrapper
 
+def get_value_stats(var):
+    """
+    :param var: Var of a float tensor or scalar
+    :return: the ValueStats of the value of var, or None if the value is not known.
+
+    The statistics are computed once per value: they are cached in var, until its value
+    is replaced. Passes checking the range of the values of a const (e.g. for
+    overflows) can thus share them, instead of scanning the value for each consumer.
+    """
+    val = var.val
+    if val is None:
+        return None
+    if var._value_stats is not None and var._value_stats[0] is val:
+        return var._value_stats[1]
+
+    abs_val = np.abs(val)
+    stats = ValueStats(
+        min=np.min(val, initial=np.inf),
+        max=np.max(val, initial=-np.inf),
+        abs_max=np.max(abs_val, initial=0.0),
+        abs_min=np.min(abs_val, initial=np.inf, where=abs_val > 0),
+    )
+    var._value_stats = (val, stats)
+    return stats
+
 def _check_child_op_type(op, child_op_type):
     """
     :param op: operation
@@ -786,7 +786,7 @@ def _try_match_and_transform_pattern_4(reduce_op: Operation, block: Block) -> bo
 @block_context_manager
 def _fuse_layernorm_or_instancenorm_block(block: Block):
     fusion_status = False
-    for i, op in enumerate(list(block.operations)):
+    for op in block.find_ops_by_type(["reduce_mean", "reduce_sum"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
@@ -55,7 +55,7 @@ def _try_to_transform(mul_op, block):
 @block_context_manager
 def _fuse_leaky_relu_block(block):
     fusion_status = False
-    for i, op in enumerate(list(block.operations)):
+    for op in block.find_ops_by_type(["mul"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
@@ -82,7 +82,7 @@ def _fuse_linear_bias_block(block):
                 return op_candidate
 
     fusion_occurred = False
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["linear"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
@@ -130,7 +130,7 @@ def _try_to_transform(matmul_op, add_op, block):
 @block_context_manager
 def _fuse_matmul_weight_bias_block(block):
     fusion_status = False
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["matmul"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
@@ -61,7 +61,7 @@ def _replace_ops(block, padding_op, child_padding_op, final_pad):
 
 @block_context_manager
 def _merge_padding_block(block):
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["pad"]):
         result = _match_pattern(block, op)
         if result:
             return True
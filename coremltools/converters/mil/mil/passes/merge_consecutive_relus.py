@@ -29,7 +29,7 @@ def _replace_ops(block, relu_op, child_relu_op):
 @block_context_manager
 def _merge_relus_in_block(block):
     def help_merge_relu_ops(block):
-        for op in list(block.operations):
+        for op in block.find_ops_by_type(["relu"]):
             if _match_and_replace_pattern(block, op):
                 return True
         return False
@@ -5,7 +5,7 @@
 
 import numpy as np
 
-from coremltools.converters.mil.mil.passes.graph_pass import AbstractGraphPass
+from coremltools.converters.mil.mil.passes.graph_pass import AbstractFunctionPass
 from coremltools.converters.mil.mil.passes.helper import block_context_manager
 from coremltools.converters.mil.mil.passes.pass_registry import register_pass
 
@@ -221,7 +221,7 @@ def _noop_elimination_block_wrapper(block):
 
 
 @register_pass(namespace="common")
-class noop_elimination(AbstractGraphPass):
+class noop_elimination(AbstractFunctionPass):
     """
     We remove ops that has no effect.
 
@@ -239,6 +239,5 @@ class noop_elimination(AbstractGraphPass):
 
     """
 
-    def apply(self, prog):
-        for f in prog.functions.values():
-            _noop_elimination_block_wrapper(f)
+    def apply_function(self, func):
+        _noop_elimination_block_wrapper(func)
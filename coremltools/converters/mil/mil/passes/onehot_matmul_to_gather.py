@@ -65,7 +65,7 @@ def _try_to_transform(onehot_op, block):
 @block_context_manager
 def _fuse_onehot_matmul_to_gather_block(block):
     fusion_status = False
-    for i, op in enumerate(list(block.operations)):
+    for op in block.find_ops_by_type(["one_hot"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
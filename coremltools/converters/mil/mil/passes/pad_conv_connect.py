@@ -87,7 +87,7 @@ def _try_to_transform(pad_op, transpose_ops, block):
 @block_context_manager
 def _pad_conv_connect_block(block):
     fusion_status = False
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["pad"], include_ops_with_blocks=True):
         for b in op.blocks:
             block_changed = True
             while block_changed:
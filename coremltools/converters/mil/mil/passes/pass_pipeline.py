@@ -0,0 +1,225 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+from enum import Enum
+
+from coremltools.converters.mil.mil.passes.pass_registry import PASS_REGISTRY
+
+_COMMON_PASSES = [
+    "common::lower_complex_dialect_ops",
+    "common::update_output_dtypes",
+    "common::cast_optimization",
+    "common::const_elimination",
+    "common::sanitize_input_output_names",
+    "common::divide_to_multiply",
+    "common::add_conv_transpose_output_shape",
+    "common::const_elimination",
+    "common::loop_invariant_elimination",
+    "common::remove_symbolic_reshape",
+    "common::noop_elimination",
+    "common::fuse_matmul_weight_bias",
+    "common::fuse_linear_bias",
+    "common::fuse_gelu_tanh_approximation",
+    "common::fuse_gelu_exact",
+    "common::fuse_leaky_relu",
+    "common::rank0_expand_dims_swap",
+    "common::use_reflection_padding",
+    "common::merge_consecutive_paddings", # Should come after use_reflection_padding, which will introduce new padding layers
+    "common::pad_conv_connect", # Should come after merge_consecutive_paddings
+    "common::image_input_preprocess",
+    "common::replace_stack_reshape", # should come before detect_concat_interleave since it may add concat
+    "common::reduce_transposes",
+    "common::fuse_conv_scale",
+    "common::fuse_conv_bias",
+    "common::fuse_onehot_matmul_to_gather",
+    "common::fuse_layernorm_or_instancenorm",  # should come after reduce_transposes, to detect instance_norm
+    "common::fuse_elementwise_to_batchnorm",  # should come after fuse_layernorm_or_instancenorm
+    "common::fuse_reduce_mean", # should come after fuse_layernorm_or_instancenorm
+    "common::fuse_conv_batchnorm", # should come after fuse_elementwise_to_batchnorm
+    "common::fuse_conv_scale", # Re-run the fuse conv scale pass after the conv and batch_norm are fused
+    "common::fuse_conv_bias", # Re-run the fuse conv bias pass after the conv and batch_norm are fused
+    "common::fuse_conv_batchnorm", # In some cases, we need to run conv / batch_norm fusion again after the fuse_conv_scale and fuse_conv_bias passes
+    "common::detect_concat_interleave",
+    "common::concat_to_pixel_shuffle", # should come after detect_concat_interleave and after replace_stack_reshape
+    "common::fuse_prelu", # reduce_transpose pass should run before and after this pass (the one after will be run during the cleanup passes stage)
+    "common::prelu_to_lrelu",
+    "common::merge_consecutive_relus",
+    #  "remove_redundant_ops" pass should be applied towards the end, once other graph passes have done their optimizations.
+    # For instance, it should come after passes such as "reduce_transpose" that can introduce redundant transposes
+    # in the network (while reducing the total number of transposes), and after passes such as "fuse_layernorm_or_instancenorm"
+    # which detects patterns that involve redundant ops ("sub") etc.
+    "common::remove_redundant_ops",
+    "common::dead_code_elimination",  # always end with dce
+]
+
+_CLEANUP_PASSES = [
+    "common::dead_code_elimination",
+    "common::const_elimination",
+    "common::cast_optimization",
+    "common::const_elimination",
+    "common::loop_invariant_elimination",
+    "common::noop_elimination",
+    "common::dedup_op_and_var_names",
+    "common::reduce_transposes",  # fuse_layernorm_or_instancenorm can potentially add transposes
+    "common::remove_redundant_ops",
+    "common::topological_reorder",
+    "common::dead_code_elimination",  # always end with dce
+]
+
+
+class ValidationLevel(Enum):
+    """
+    How much the pass pipeline validates the program (the consistency of the ops, the
+    vars consumed by them, and the block outputs).
+
+    - ``NONE``: no validation.
+    - ``END_OF_PIPELINE``: once all the passes ran, validate the ops and blocks that
+      the passes changed.
+    - ``PER_PASS``: validate the whole program before the first pass, then after each
+      pass the ops and blocks that the pass changed, so that an invalid program is
+      reported along with the pass which produced it.
+
+    Setting ``coremltools.converters.mil.mil.block.DEBUG`` still validates the whole
+    program at every step, whatever the level.
+    """
+    NONE = "none"
+    END_OF_PIPELINE = "end_of_pipeline"
+    PER_PASS = "per_pass"
+
+
+class PassPipeline:
+    """
+    The graph passes run on the MIL program during conversion, in order.
+
+    The passes run in two stages: ``passes`` right after the program is produced by
+    the frontend, and ``cleanup_passes`` after the compute precision transform
+    (see the ``compute_precision`` argument of ``coremltools.convert``). By default,
+    both stages hold the passes that coremltools runs on every model.
+
+    A pass which appears more than once is skipped if its previous run did not change
+    the program, and no other pass changed the program since.
+
+    Examples
+    --------
+
+    .. sourcecode:: python
+
+        pipeline = ct.PassPipeline()
+        # Drop a pass, and run an extra one before the others
+        pipeline.remove_passes(["common::fuse_gelu_exact"])
+        pipeline.insert_pass(0, "common::my_custom_pass")
+        mlmodel = ct.convert(model, pass_pipeline=pipeline)
+
+        # Run no graph pass at all
+        mlmodel = ct.convert(model, pass_pipeline=ct.PassPipeline(passes=[], cleanup_passes=[]))
+
+    Parameters
+    ----------
+    passes: list[str]
+        Names of the passes of the first stage, as registered in the pass registry
+        (e.g. "common::const_elimination"). Defaults to the passes run by coremltools.
+
+    cleanup_passes: list[str]
+        Names of the passes of the clean up stage. Defaults to the passes run by
+        coremltools.
+
+    validation_level: ValidationLevel or str
+        One of "none" (default), "end_of_pipeline" or "per_pass". See ValidationLevel.
+
+    num_workers: int
+        Number of threads in which the passes that process each function on its own
+        (e.g. "common::const_elimination", see AbstractFunctionPass) process the
+        functions of a program at once. Defaults to 1: the functions are processed one
+        after the other.
+    """
+
+    def __init__(
+        self, passes=None, cleanup_passes=None, validation_level=ValidationLevel.NONE, num_workers=1
+    ):
+        if not isinstance(num_workers, int) or num_workers < 1:
+            raise ValueError("num_workers must be a positive integer, got {}".format(num_workers))
+        self.validation_level = ValidationLevel(validation_level)
+        self.num_workers = num_workers
+        self._passes = []
+        self._cleanup_passes = []
+        for pass_name in _COMMON_PASSES if passes is None else passes:
+            self.append_pass(pass_name)
+        for pass_name in _CLEANUP_PASSES if cleanup_passes is None else cleanup_passes:
+            self.append_pass(pass_name, cleanup=True)
+
+    @property
+    def passes(self):
+        return tuple(self._passes)
+
+    @property
+    def cleanup_passes(self):
+        return tuple(self._cleanup_passes)
+
+    @staticmethod
+    def _check_pass_name(pass_name):
+        if pass_name not in PASS_REGISTRY:
+            raise ValueError("Pass {} is not registered".format(pass_name))
+
+    def append_pass(self, pass_name, cleanup=False):
+        """
+        Adds a pass at the end of the first stage, or of the clean up stage if
+        `cleanup` is True.
+        """
+        self._check_pass_name(pass_name)
+        (self._cleanup_passes if cleanup else self._passes).append(pass_name)
+
+    def insert_pass(self, index, pass_name, cleanup=False):
+        """
+        Inserts a pass before position `index` of the first stage, or of the clean up
+        stage if `cleanup` is True.
+        """
+        self._check_pass_name(pass_name)
+        (self._cleanup_passes if cleanup else self._passes).insert(index, pass_name)
+
+    def remove_passes(self, pass_names):
+        """
+        Removes every occurrence of the passes in `pass_names`, from both stages.
+        """
+        pass_names = set(pass_names)
+        self._passes = [p for p in self._passes if p not in pass_names]
+        self._cleanup_passes = [p for p in self._cleanup_passes if p not in pass_names]
+
+    def __str__(self):
+        return "PassPipeline(passes={}, cleanup_passes={}, validation_level={}, num_workers={})".format(
+            list(self._passes),
+            list(self._cleanup_passes),
+            self.validation_level.value,
+            self.num_workers,
+        )
+
+
+def _program_fingerprint(prog):
+    """
+    Returns a hash of the structure of `prog`: the ops, how they are connected, and the
+    names and types of the vars. Two states of a program with the same fingerprint are
+    the same for the graph passes.
+    """
+    items = []
+
+    def _add_block(block):
+        items.append(tuple(id(v) for v in block.outputs))
+        for op in block.operations:
+            items.append(
+                (
+                    id(op),
+                    op.op_type,
+                    op.name,
+                    tuple(id(v) for v in op.get_flattened_inputs()),
+                    tuple((id(v), v.name, v.sym_type) for v in op.outputs),
+                )
+            )
+            for b in op.blocks:
+                items.append(tuple((id(v), v.name, v.sym_type) for v in b.inputs))
+                _add_block(b)
+
+    for name, f in prog.functions.items():
+        items.append((name, tuple((id(v), v.name, v.sym_type) for v in f.inputs.values())))
+        _add_block(f)
+    return hash(tuple(items))
@@ -0,0 +1,212 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+import json
+import os
+import time
+import tracemalloc
+from collections import Counter
+
+# When set to a file path, apply_common_pass_pipeline profiles every graph pass and
+# writes the report to that path in the Chrome trace format (chrome://tracing, Perfetto).
+PASS_PROFILE_ENV_VAR = "COREMLTOOLS_PASS_PROFILE"
+
+
+def _count_op_types(prog):
+    counts = Counter()
+
+    def _count_block(block):
+        for op in block.operations:
+            counts[op.op_type] += 1
+            for b in op.blocks:
+                _count_block(b)
+
+    for f in prog.functions.values():
+        _count_block(f)
+    return counts
+
+
+class PassProfile:
+    """
+    Profile of a single run of a graph pass.
+
+    # Properties
+
+    name: (str)
+        Name of the pass, e.g. "common::const_elimination".
+
+    stage: (str)
+        Name of the group of passes the pass ran in, e.g. "Common".
+
+    start_time: (float)
+        Start time of the pass in seconds, relative to the start of the pipeline.
+
+    duration: (float)
+        Wall time of the pass in seconds.
+
+    ops_before, ops_after: (collections.Counter)
+        Number of ops of each op type in the program before and after the pass.
+
+    peak_memory: (int)
+        Peak memory in bytes allocated by Python during the pass, on top of what was
+        allocated before the pass (as traced by tracemalloc).
+    """
+
+    def __init__(self, name, stage, start_time, duration, ops_before, ops_after, peak_memory):
+        self.name = name
+        self.stage = stage
+        self.start_time = start_time
+        self.duration = duration
+        self.ops_before = ops_before
+        self.ops_after = ops_after
+        self.peak_memory = peak_memory
+
+    @property
+    def num_ops_before(self):
+        return sum(self.ops_before.values())
+
+    @property
+    def num_ops_after(self):
+        return sum(self.ops_after.values())
+
+    @property
+    def op_type_delta(self):
+        """
+        Dict of op type to the change in the number of ops of that type. Op types
+        whose count did not change are omitted.
+        """
+        delta = {}
+        for op_type in set(self.ops_before) | set(self.ops_after):
+            diff = self.ops_after[op_type] - self.ops_before[op_type]
+            if diff != 0:
+                delta[op_type] = diff
+        return delta
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "stage": self.stage,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "num_ops_before": self.num_ops_before,
+            "num_ops_after": self.num_ops_after,
+            "op_type_delta": self.op_type_delta,
+            "peak_memory": self.peak_memory,
+        }
+
+
+class PassPipelineProfile:
+    """
+    Profile of all the graph passes run by ``apply_common_pass_pipeline``.
+
+    Example:
+
+    .. sourcecode:: python
+
+        profile = apply_common_pass_pipeline(prog, [], profile=True)
+        print(profile)  # passes sorted by time spent
+        profile.save("passes.json")  # open it in chrome://tracing
+
+    # Properties
+
+    passes: list[PassProfile]
+        Profiles of the passes, in the order they were run.
+    """
+
+    def __init__(self):
+        self.passes = []
+        self._start_time = None
+        self._owns_tracemalloc = False
+
+    def _start(self):
+        self._start_time = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    def _stop(self):
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def _run_pass(self, graph_pass, prog, name, stage):
+        ops_before = _count_op_types(prog)
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        elif self._owns_tracemalloc:
+            # tracemalloc.reset_peak is only available from Python 3.9
+            tracemalloc.stop()
+            tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        graph_pass(prog)
+        duration = time.perf_counter() - start
+
+        peak_memory = max(tracemalloc.get_traced_memory()[1] - memory_before, 0)
+        self.passes.append(
+            PassProfile(
+                name=name,
+                stage=stage,
+                start_time=start - self._start_time,
+                duration=duration,
+                ops_before=ops_before,
+                ops_after=_count_op_types(prog),
+                peak_memory=peak_memory,
+            )
+        )
+
+    def total_time(self):
+        return sum(p.duration for p in self.passes)
+
+    def time_per_pass(self):
+        """
+        Returns a list of (pass name, total time, number of runs), sorted by total time,
+        aggregating the passes that ran more than once.
+        """
+        times = {}
+        for p in self.passes:
+            total, runs = times.get(p.name, (0.0, 0))
+            times[p.name] = (total + p.duration, runs + 1)
+        result = [(name, total, runs) for name, (total, runs) in times.items()]
+        result.sort(key=lambda x: x[1], reverse=True)
+        return result
+
+    def to_chrome_trace(self):
+        """
+        Returns the profile as a dict in the Chrome trace event format.
+        """
+        pid = os.getpid()
+        events = []
+        for p in self.passes:
+            args = p.to_dict()
+            for key in ("name", "stage", "start_time", "duration"):
+                args.pop(key)
+            events.append(
+                {
+                    "name": p.name,
+                    "cat": p.stage,
+                    "ph": "X",
+                    "ts": p.start_time * 1e6,
+                    "dur": p.duration * 1e6,
+                    "pid": pid,
+                    "tid": 0,
+                    "args": args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path):
+        """
+        Writes the profile to `path` as JSON in the Chrome trace event format.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f, indent=1)
+
+    def __str__(self):
+        lines = ["Total time in graph passes: {:.3f} s".format(self.total_time())]
+        for name, total, runs in self.time_per_pass():
+            lines.append("{:>10.3f} s  {:>3}x  {}".format(total, runs, name))
+        return "\n".join(lines)
@@ -12,7 +12,7 @@ from coremltools.converters.mil.mil.passes.pass_registry import register_pass
 
 @block_context_manager
 def _prelu_to_lrelu_block(block):
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["prelu"], include_ops_with_blocks=True):
         for b in op.blocks:
             _prelu_to_lrelu_block(b)
         if len(op.blocks) > 0:
@@ -3,14 +3,16 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
+from collections import OrderedDict
 from enum import Enum as _Enum
 
 import numpy as np
 
 from coremltools.converters.mil.mil import Builder as mb
-from coremltools.converters.mil.mil import types
+from coremltools.converters.mil.mil import Function, types
 from coremltools.converters.mil.mil.passes.graph_pass import AbstractGraphPass
-from coremltools.converters.mil.mil.passes.helper import block_context_manager
+from coremltools.converters.mil.mil.passes.helper import (block_context_manager,
+                                                          get_value_stats)
 from coremltools.converters.mil.mil.program import Program
 
 
@@ -23,12 +25,14 @@ type_eps = {}
 type_min = {}
 type_negmin = {}
 
-def _close_to_zero(val, np_type):
+def _init_type_limits(np_type):
     if np_type not in type_eps:
         type_eps[np_type] = np.finfo(np_type).eps
         type_min[np_type] = np.nextafter(0., 1., dtype=np_type)
         type_negmin[np_type] = np.nextafter(0., -1., dtype=np_type)
 
+def _close_to_zero(val, np_type):
+    _init_type_limits(np_type)
     return np.isclose(val, 0, atol=type_min[np_type], rtol=type_eps[np_type])
 
 class AbstractQuantizationPass(AbstractGraphPass):
@@ -112,11 +116,22 @@ class FP16ComputePrecision(AbstractQuantizationPass):
     This transform does the following, for each valid op and if the "op_selector" return True:
     - For each input of dtype float32, inject a "cast" op to change it to float16 dtype
     - For each output of dtype float16, inject a "cast" op to change it back to float32
+
+    With ``in_place=True``, the valid ops are not re-created. Their dtype is changed in
+    place, and "cast" ops are only injected at the boundaries of the float16 regions of
+    the graph:
+    - Before a valid op, for each input of dtype float32
+    - Before any other op, for each input changed to float16 by the transform
+    - At the end of a block, for each output changed to float16 by the transform
+
+    The graph is then the one produced by the default mode once "cast_optimization"
+    removed the pairs of casts between the valid ops, without the ops being built twice.
     """
 
-    def __init__(self, op_selector=None):
+    def __init__(self, op_selector=None, in_place=False):
         super(FP16ComputePrecision, self).__init__(op_selector=op_selector)
         self.target_dtype = "fp16"
+        self.in_place = in_place
 
         # Var that feeds into multiple ops will be casted once and cached into this dict
         # For reference: Checkout test_single_input_to_multiple_operations in test_fp16_compute_precision.py
@@ -130,7 +145,7 @@ class FP16ComputePrecision(AbstractQuantizationPass):
                 inputs = [inputs]
             for var in inputs:
                 if var.op is not None and var.op.op_type == "const" and var.is_tensor_or_scalar_of(dtype="fp32"):
-                    if np.max(np.abs(var.op.val.val), initial=0.0) > 65504:
+                    if get_value_stats(var).abs_max > 65504:
                         return True
         return False
 
@@ -162,24 +177,137 @@ class FP16ComputePrecision(AbstractQuantizationPass):
     def _check_underflow_to_zero(self, new_var, var):
         # We check whether there are casted values that "becomes" 0 which is not ideal for eps purposes.
         # However we skip arrays with more than 400 in case we compare through a large sparse matrix.
-        if new_var.val is not None and \
-           len(var.val.flatten()) < 400 and \
-           _close_to_zero(new_var.val, np.float16).any():
-            value_modified = False
-            original_val = var.val.flatten()
-            new_val = new_var.val.flatten()
-
-            for idx in range(len(original_val)):
-                if not _close_to_zero(original_val[idx], np.float32) and \
-                     _close_to_zero(new_val[idx], np.float16):
-                    new_val[idx] = type_min[np.float16] if np.sign(original_val[idx]) > 0 else type_negmin[np.float16]
-                    value_modified = True
-
-            if value_modified:
-                if np.isscalar(new_var.val):
-                    new_var._sym_val.val = new_val[0]
-                else:
-                    new_var._sym_val.val = new_val.reshape(new_var.val.shape)
+        if new_var.val is None or np.size(var.val) >= 400:
+            return
+
+        # Only the magnitudes below 2 fp16 subnormals may round to (close to) 0 in fp16
+        _init_type_limits(np.float16)
+        if get_value_stats(var).abs_min > 2 * type_min[np.float16]:
+            return
+
+        original_val = np.asarray(var.val)
+        new_val = np.array(new_var.val)
+        underflow = ~_close_to_zero(original_val, np.float32) & _close_to_zero(new_val, np.float16)
+        if underflow.any():
+            new_val[underflow] = np.where(
+                original_val[underflow] > 0, type_min[np.float16], type_negmin[np.float16]
+            )
+            new_var._sym_val.val = new_val[()] if np.isscalar(new_var.val) else new_val
+
+    def apply(self, prog):
+        if not self.in_place:
+            super(FP16ComputePrecision, self).apply(prog)
+            return
+
+        if not isinstance(prog, Program):
+            raise TypeError(
+                'Transform "{}" can only be applied on PyMIL programs.'.format(self)
+            )
+
+        # Vars whose dtype was changed from fp32 to fp16 by the transform
+        fp16_vars = set()
+        # Cast of a var to a dtype, by (var, dtype)
+        casts = {}
+
+        @block_context_manager
+        def apply_block(block):
+            block_outputs = set(block.outputs)
+            ops = list(block.operations)
+            for i, op in enumerate(ops):
+                for b in op.blocks:
+                    apply_block(b)
+
+                to_fp16 = self.is_valid_op(op) and self.op_selector(op)
+                self._transform_op_in_place(op, to_fp16, fp16_vars, casts)
+
+                # The outputs of the block are casted back right after the op
+                outputs = [v for v in op.outputs if v in block_outputs]
+                if outputs:
+                    before_op = ops[i + 1] if i + 1 < len(ops) else None
+                    self._cast_outputs(block, outputs, fp16_vars, casts, before_op)
+
+            # Outputs of the block produced in the enclosing blocks
+            self._cast_outputs(block, block.outputs, fp16_vars, casts)
+
+        for f in prog.functions.values():
+            apply_block(f)
+
+    def _cast_outputs(self, block, outputs, fp16_vars, casts, before_op=None):
+        """
+        Replaces the outputs of ``block`` changed to fp16 by the transform with their
+        casts back to fp32.
+        """
+        for var in OrderedDict.fromkeys(v for v in outputs if v in fp16_vars):
+            x = self._get_cast(var, "fp32", block, casts, before_op=before_op)
+            block.replace_block_output_var(var, x)
+            if isinstance(block, Function):
+                # The cast took the name of the output
+                var.name = var.name + "_fp16"
+
+    def _get_cast(self, var, dtype, block, casts, before_op=None):
+        """
+        Returns the cast of ``var`` to ``dtype``, injected in ``block`` before
+        ``before_op`` (at the end of the block if None), unless an existing one is
+        visible there.
+        """
+        x = casts.get((var, dtype))
+        if x is not None:
+            upto_op_with_id = None if before_op is None else block.find_op_id_in_block(before_op)
+            if block.is_var_visible_in_block(x, upto_op_with_id=upto_op_with_id):
+                return x
+        # Casts of the same var in separate blocks don't share names
+        name = var.name + "_to_" + dtype if x is None else None
+        x = mb.cast(x=var, dtype=dtype, name=name, before_op=before_op)
+        if dtype == "fp16":
+            self._check_underflow_to_zero(x, var)
+        casts[(var, dtype)] = x
+        return x
+
+    def _get_casted_inputs(self, op, to_fp16, fp16_vars, casts):
+        """
+        Injects the casts of the inputs of ``op``: to fp16 for its fp32 inputs if
+        ``to_fp16`` is True, else back to fp32 for its inputs which the transform
+        changed to fp16. The parameters which don't support fp16 always get fp32.
+
+        Returns the casted inputs, by parameter.
+        """
+        casted_inputs = {}
+        for param, inputs in op.inputs.items():
+            is_list_input = isinstance(inputs, (list, tuple))
+            if not is_list_input:
+                inputs = [inputs]
+
+            if to_fp16 and self.is_valid_parameter(op, param):
+                dtype = "fp16"
+                needs_cast = [var.is_tensor_or_scalar_of(dtype="fp32") for var in inputs]
+            else:
+                dtype = "fp32"
+                needs_cast = [var in fp16_vars for var in inputs]
+            if not any(needs_cast):
+                continue
+
+            casted = [
+                self._get_cast(var, dtype, op.enclosing_block, casts, before_op=op)
+                if cast else var
+                for var, cast in zip(inputs, needs_cast)
+            ]
+            casted_inputs[param] = tuple(casted) if is_list_input else casted[0]
+
+        return casted_inputs
+
+    def _transform_op_in_place(self, op, to_fp16, fp16_vars, casts):
+        casted_inputs = self._get_casted_inputs(op, to_fp16, fp16_vars, casts)
+        if casted_inputs:
+            op.set_inputs(no_check_var_types=True, **casted_inputs)
+
+        if not to_fp16:
+            return
+        # Either casted or produced by the ops changed earlier, the fp16 inputs change
+        # the dtype of the outputs
+        if casted_inputs or any(v in fp16_vars for v in op.get_flattened_inputs()):
+            fp32_outputs = [v for v in op.outputs if v.is_tensor_or_scalar_of(dtype="fp32")]
+            op.type_value_inference(overwrite_output=True)
+            fp16_vars.update(v for v in fp32_outputs if v.is_tensor_or_scalar_of(dtype="fp16"))
 
     def transform_op(self, op):
         block = op.enclosing_block
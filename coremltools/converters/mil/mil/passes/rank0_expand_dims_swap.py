@@ -84,7 +84,9 @@ def _try_to_transform(op, block):
 @block_context_manager
 def _rank0_expand_dims_swap(block):
     fusion_occurred = False
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(
+        ["add", "sub", "mul", "real_div", "floor_div"], include_ops_with_blocks=True
+    ):
         for b in op.blocks:
             block_changed = True
             while block_changed:
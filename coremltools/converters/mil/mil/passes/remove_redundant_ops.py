@@ -26,7 +26,7 @@ def _get_candidate_ops_list(prospective_ops_list):
         return []
     for op in prospective_ops_list:
         if _is_op_eligible_to_be_removed(op):
-            od[op] = enclosing_block[0].operations.index(op)
+            od[op] = enclosing_block[0].find_op_id_in_block(op)
     # sort the ops according to their index of appearing in block.operations, which is topologically sorted
     return [x[0] for x in sorted(od.items(), key=lambda t: t[1])]
 
@@ -16,7 +16,7 @@ from coremltools.converters.mil.mil.types.symbolic import (any_variadic,
 @block_context_manager
 def _remove_symbolic_reshape_block(block):
     num_changes = 0
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["reshape"], include_ops_with_blocks=True):
         for b in op.blocks:
             num_changes += _remove_symbolic_reshape_block(b)
         if op.op_type != "reshape":
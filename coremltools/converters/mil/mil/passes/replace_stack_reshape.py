@@ -82,7 +82,7 @@ def _replace_stack_reshape_ops(block, stack_op, reshape_op):
 
 @block_context_manager
 def _replace_stack_reshape_block(block):
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["stack"]):
 
         stack_op, reshape_op = _match_operation(op)
 
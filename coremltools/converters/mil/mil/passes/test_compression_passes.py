@@ -4,11 +4,14 @@
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
 
+import itertools
+
 import numpy as np
 import pytest
 
 import coremltools as ct
 from coremltools.converters.mil.mil import Builder as mb
+from coremltools.converters.mil.mil import types
 from coremltools.converters.mil.testing_utils import get_op_types_in_program
 
 from .compression_passes import (WeightAffineQuantizer, WeightPalettizer,
@@ -72,3 +75,94 @@ class TestBasicCompressionGraphPass:
         quantizer.apply(prog)
         expected_ops = ["constexpr_lut_to_dense", "conv"] if not fake_compression else ["conv"]
         assert get_op_types_in_program(prog) == expected_ops
+
+
+class TestWeightPalettizerModes:
+    @staticmethod
+    @pytest.mark.parametrize("dtype", [np.float32, np.float16])
+    def test_kmeans(dtype):
+        val = np.random.randn(40, 50).astype(dtype)
+        params = WeightPalettizer.compress(val, "kmeans", nbits=4)
+
+        assert params.lut.shape == (16,) and params.lut.dtype == dtype
+        # Each element is mapped to the nearest entry of the LUT
+        lut = params.lut.astype(np.float64)
+        nearest = lut[np.argmin(np.abs(val.reshape(-1, 1) - lut), axis=1)]
+        decompressed = WeightPalettizer.decompress(params)
+        np.testing.assert_array_equal(decompressed.reshape(-1), nearest)
+        assert np.mean((decompressed - val.astype(np.float64)) ** 2) < 0.02
+
+        # The clustering is deterministic
+        other_params = WeightPalettizer.compress(val, "kmeans", nbits=4)
+        np.testing.assert_array_equal(other_params.lut, params.lut)
+        np.testing.assert_array_equal(other_params.indices, params.indices)
+
+    @staticmethod
+    @pytest.mark.parametrize("mode", ["kmeans", "unique"])
+    def test_few_unique_values(mode):
+        val = np.random.choice(np.array([-1.5, -0.0, 0.0, 0.25, 3.0], dtype=np.float16), (30, 40))
+        params = WeightPalettizer.compress(val, mode, nbits=4 if mode == "kmeans" else None)
+
+        # -0.0 and 0.0 share an entry of the LUT
+        expected_lut_size = 16 if mode == "kmeans" else 4
+        assert params.lut.shape == (expected_lut_size,)
+        np.testing.assert_array_equal(params.lut[:4], [-1.5, 0.0, 0.25, 3.0])
+        np.testing.assert_array_equal(WeightPalettizer.decompress(params), val)
+
+
+class TestChunkedCompression:
+    # The chunked mode must give the same compressed weights as the default one
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "mode, dtype, axis, chunk_size",
+        itertools.product(
+            ["linear", "linear_symmetric"],
+            [types.int8, types.uint8],
+            [0, 1],
+            [1, 7, 100, 10000],
+        ),
+    )
+    def test_affine_quantizer(mode, dtype, axis, chunk_size):
+        val = np.random.randn(37, 5, 3).astype(np.float32)
+        params = WeightAffineQuantizer.compress(val, axis, mode, dtype)
+        chunked_params = WeightAffineQuantizer.compress(val, axis, mode, dtype, chunk_size=chunk_size)
+        for name in ("quantized_data", "zero_point", "scale"):
+            expected, actual = getattr(params, name), getattr(chunked_params, name)
+            assert actual.dtype == expected.dtype
+            np.testing.assert_array_equal(actual, expected)
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "mode, chunk_size",
+        itertools.product(["threshold_based", "percentile_based"], [1, 13, 64, 10000]),
+    )
+    def test_weight_sparsifier(mode, chunk_size):
+        val = np.random.randn(37, 5, 3).astype(np.float16)
+        val[0, 0, 1] = -0.0
+        params = WeightSparsifier.compress(val, mode, target_percentile=0.4, threshold=0.5)
+        chunked_params = WeightSparsifier.compress(
+            val, mode, target_percentile=0.4, threshold=0.5, chunk_size=chunk_size
+        )
+        assert chunked_params.nonzero_data.dtype == np.float16
+        np.testing.assert_array_equal(chunked_params.nonzero_data, params.nonzero_data)
+        np.testing.assert_array_equal(chunked_params.mask, params.mask)
+        assert chunked_params.shape == params.shape
+
+    @staticmethod
+    def test_graph_pass():
+        prog = _get_conv_program()
+        weight = prog.find_ops(op_type="const")[0].val.val
+        WeightAffineQuantizer(op_selector=lambda const: True, chunk_size=1000).apply(prog)
+        assert get_op_types_in_program(prog) == ["constexpr_affine_dequantize", "conv"]
+        quantized_data = prog.find_ops(op_type="constexpr_affine_dequantize")[0].quantized_data.val
+        np.testing.assert_array_equal(
+            quantized_data, WeightAffineQuantizer.compress(weight, 0, "linear", types.int8).quantized_data
+        )
+
+    @staticmethod
+    def test_invalid_chunk_size():
+        with pytest.raises(ValueError, match="chunk_size must be None or a positive integer"):
+            WeightAffineQuantizer(op_selector=lambda const: True, chunk_size=0)
+        with pytest.raises(ValueError, match="chunk_size must be None or a positive integer"):
+            WeightSparsifier(op_selector=lambda const: True, chunk_size=1.5)
@@ -12,6 +12,7 @@ from coremltools._deps import _IS_MACOS
 from coremltools.converters.mil.mil import Builder as mb
 from coremltools.converters.mil.mil.passes import \
     quantization_passes as transform
+from coremltools.converters.mil.mil.passes.helper import get_value_stats
 from coremltools.converters.mil.testing_utils import (
     apply_pass_and_basic_check, assert_model_is_valid, get_op_types_in_program)
 
@@ -277,3 +278,116 @@ class FP16CastTransform(unittest.TestCase):
             expected_output_shapes={block.outputs[0].name: (1, 2), block.outputs[1].name: (1, 2)},
             backend=("mlprogram", "fp16")
         )
+
+    """
+    Input graph:
+        input -----> square -----> relu -----> sigmoid ---> out
+
+    Output graph, with in_place=True and "relu" not selected:
+        input -----> cast(dtype="fp16") -----> square -----> cast(dtype="fp32") -----> relu
+            -----> cast(dtype="fp16") -----> sigmoid -----> cast(dtype="fp32") ---> out
+    """
+
+    def test_in_place(self):
+        @mb.program(input_specs=[mb.TensorSpec(shape=(10, 20))])
+        def prog(x):
+            x = mb.square(x=x)
+            x = mb.relu(x=x)
+            x = mb.sigmoid(x=x)
+            return x
+
+        square, relu, sigmoid = prog.functions["main"].operations
+        _, _, block = apply_pass_and_basic_check(
+            prog,
+            transform.FP16ComputePrecision(op_selector=lambda op: op.op_type != "relu", in_place=True),
+        )
+
+        self.assertEqual(
+            get_op_types_in_program(prog),
+            ["cast", "square", "cast", "relu", "cast", "sigmoid", "cast"],
+        )
+        # The ops are modified, not re-created
+        self.assertEqual(block.find_ops(op_type="square"), [square])
+        self.assertEqual(block.find_ops(op_type="relu"), [relu])
+        self.assertEqual(block.find_ops(op_type="sigmoid"), [sigmoid])
+        self.assertTrue(square.outputs[0].is_tensor_or_scalar_of(dtype="fp16"))
+        self.assertTrue(relu.outputs[0].is_tensor_or_scalar_of(dtype="fp32"))
+        self.assertTrue(sigmoid.outputs[0].is_tensor_or_scalar_of(dtype="fp16"))
+        self.assertEqual([cast.dtype.val for cast in block.find_ops(op_type="cast")],
+                         ["fp16", "fp32", "fp16", "fp32"])
+        self.assertEqual(block.outputs[0].op.op_type, "cast")
+
+        assert_model_is_valid(
+            prog,
+            {"x": (10, 20)},
+            expected_output_shapes={block.outputs[0].name: (10, 20)},
+        )
+
+    def test_in_place_matches_default_mode(self):
+        def get_prog():
+            @mb.program(input_specs=[mb.TensorSpec(shape=(2, 3)), mb.TensorSpec(shape=(2, 3))])
+            def prog(x, y):
+                x = mb.relu(x=x)
+                z = mb.add(x=x, y=y)
+                x, y = mb.split(x=mb.concat(values=(x, z), axis=0), num_splits=2, axis=0)
+                return mb.mul(x=x, y=y), mb.sigmoid(x=x), mb.shape(x=z)
+
+            return prog
+
+        progs = []
+        for in_place in (False, True):
+            prog = get_prog()
+            apply_pass_and_basic_check(
+                prog, transform.FP16ComputePrecision(op_selector=lambda op: True, in_place=in_place)
+            )
+            for pass_name in [
+                "common::dead_code_elimination",
+                "common::const_elimination",
+                "common::cast_optimization",
+                "common::dead_code_elimination",
+            ]:
+                apply_pass_and_basic_check(prog, pass_name)
+            progs.append(prog)
+
+        default_prog, in_place_prog = progs
+        self.assertEqual(
+            get_op_types_in_program(in_place_prog), get_op_types_in_program(default_prog)
+        )
+
+    def test_underflow_to_zero(self):
+        @mb.program(input_specs=[mb.TensorSpec(shape=(4,))])
+        def prog(x):
+            return mb.add(x=x, y=np.array([1e-9, -1e-9, 0.0, 1.0], dtype=np.float32))
+
+        apply_pass_and_basic_check(
+            prog, transform.FP16ComputePrecision(op_selector=lambda op: True)
+        )
+
+        # The values which would become 0 in fp16 keep their sign, with the smallest magnitude
+        smallest_fp16 = np.nextafter(np.float16(0), np.float16(1))
+        cast = prog.find_ops(op_type="cast")[1]
+        self.assertEqual(cast.dtype.val, "fp16")
+        np.testing.assert_array_equal(cast.outputs[0].val, [smallest_fp16, -smallest_fp16, 0, 1])
+
+    def test_value_stats(self):
+        @mb.program(input_specs=[mb.TensorSpec(shape=(3,))])
+        def prog(x):
+            return mb.add(x=x, y=np.array([-3.0, 1e-9, 0.0], dtype=np.float32))
+
+        var = prog.find_ops(op_type="const")[0].outputs[0]
+        stats = get_value_stats(var)
+        self.assertEqual(stats.min, -3.0)
+        self.assertEqual(stats.max, np.float32(1e-9))
+        self.assertEqual(stats.abs_max, 3.0)
+        self.assertEqual(stats.abs_min, np.float32(1e-9))
+        # The statistics are computed once per value
+        self.assertIs(get_value_stats(var), stats)
+
+        var._sym_val.val = np.array([70000.0, 1.0, 2.0], dtype=np.float32)
+        self.assertEqual(get_value_stats(var).abs_max, 70000.0)
+        self.assertEqual(get_value_stats(var).abs_min, 1.0)
+        self.assertTrue(
+            transform.FP16ComputePrecision(op_selector=lambda op: True).fp16_overflow(
+                prog.find_ops(op_type="add")[0]
+            )
+        )
@@ -0,0 +1,198 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+import threading
+
+import pytest
+
+import coremltools as ct
+from coremltools.converters.mil.mil import Builder as mb
+from coremltools.converters.mil.mil.block import InvalidBlockStateError
+from coremltools.converters.mil.mil.passes.apply_common_pass_pipeline import \
+    apply_common_pass_pipeline
+from coremltools.converters.mil.mil.passes.graph_pass import (
+    AbstractFunctionPass, AbstractGraphPass)
+from coremltools.converters.mil.mil.passes.pass_pipeline import (
+    _CLEANUP_PASSES, _COMMON_PASSES, PassPipeline, ValidationLevel)
+from coremltools.converters.mil.mil.passes.pass_registry import register_pass
+from coremltools.converters.mil.testing_utils import get_op_types_in_program
+
+
+def _get_prog():
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 4))])
+    def prog(x):
+        x = mb.add(x=x, y=0.0)
+        return mb.relu(x=x)
+
+    return prog
+
+
+@register_pass(namespace="test", name="corrupt_relu_input")
+class _CorruptReluInput(AbstractGraphPass):
+    """
+    Rewires the relu to the input of the add, but leaves the relu out of the consumers
+    of that var.
+    """
+    def apply(self, prog):
+        block = prog.functions["main"]
+        relu = block.find_ops(op_type="relu")[0]
+        x = block.inputs["x"]
+        relu.set_inputs(x=x)
+        x.remove_child_op(relu)
+
+
+@register_pass(namespace="test", name="wait_for_other_function")
+class _WaitForOtherFunction(AbstractFunctionPass):
+    """
+    Adds a relu to each function, once the other function is processed too: fails unless
+    the 2 functions of the program are processed at once.
+    """
+    def __init__(self):
+        self.barrier = threading.Barrier(2, timeout=10)
+
+    def apply_function(self, func):
+        self.barrier.wait()
+        with func:
+            relu = mb.relu(x=func.outputs[0], before_op=None)
+        func.set_outputs([relu])
+
+
+def _get_prog_with_two_functions():
+    prog = _get_prog()
+    prog.add_function("other", _get_prog().functions["main"])
+    return prog
+
+
+class TestPassPipeline:
+    def test_default_pipeline(self):
+        pipeline = PassPipeline()
+        assert pipeline.passes == tuple(_COMMON_PASSES)
+        assert pipeline.cleanup_passes == tuple(_CLEANUP_PASSES)
+
+    def test_edit_pipeline(self):
+        pipeline = PassPipeline(passes=["common::noop_elimination"], cleanup_passes=[])
+        pipeline.insert_pass(0, "common::const_elimination")
+        pipeline.append_pass("common::dead_code_elimination")
+        pipeline.append_pass("common::noop_elimination", cleanup=True)
+        assert pipeline.passes == (
+            "common::const_elimination",
+            "common::noop_elimination",
+            "common::dead_code_elimination",
+        )
+        assert pipeline.cleanup_passes == ("common::noop_elimination",)
+
+        pipeline.remove_passes(["common::noop_elimination"])
+        assert pipeline.passes == ("common::const_elimination", "common::dead_code_elimination")
+        assert pipeline.cleanup_passes == ()
+
+    def test_invalid_pass_name(self):
+        with pytest.raises(ValueError, match="Pass common::not_a_pass is not registered"):
+            PassPipeline(passes=["common::not_a_pass"])
+        with pytest.raises(ValueError, match="is not registered"):
+            PassPipeline().append_pass("not_a_pass", cleanup=True)
+
+    def test_convert_with_pipeline(self):
+        prog = ct.convert(
+            _get_prog(),
+            convert_to="milinternal",
+            compute_precision=ct.precision.FLOAT32,
+            pass_pipeline=PassPipeline(passes=[], cleanup_passes=[]),
+        )
+        assert get_op_types_in_program(prog) == ["add", "relu"]
+
+        prog = ct.convert(
+            _get_prog(),
+            convert_to="milinternal",
+            compute_precision=ct.precision.FLOAT32,
+            pass_pipeline=PassPipeline(passes=["common::noop_elimination"], cleanup_passes=[]),
+        )
+        assert get_op_types_in_program(prog) == ["relu"]
+
+        with pytest.raises(ValueError, match="Invalid value of the argument 'pass_pipeline'"):
+            ct.convert(_get_prog(), convert_to="milinternal", pass_pipeline=["common::noop_elimination"])
+
+    def test_skip_rerun_on_unchanged_program(self):
+        pipeline = PassPipeline(
+            passes=["common::noop_elimination"] * 3,
+            cleanup_passes=["common::noop_elimination"],
+        )
+        profile = apply_common_pass_pipeline(_get_prog(), [], profile=True, pass_pipeline=pipeline)
+        # The 1st run removes the add, the 2nd one finds nothing to do, so the others are skipped
+        assert [p.name for p in profile.passes] == ["common::noop_elimination"] * 2
+
+    def test_no_skip_after_program_change(self):
+        pipeline = PassPipeline(
+            passes=[
+                "common::dead_code_elimination",
+                "common::dead_code_elimination",
+                "common::noop_elimination",
+                "common::dead_code_elimination",
+            ],
+            cleanup_passes=[],
+        )
+        prog = _get_prog()
+        profile = apply_common_pass_pipeline(prog, [], profile=True, pass_pipeline=pipeline)
+        assert [p.name for p in profile.passes] == [
+            "common::dead_code_elimination",
+            "common::noop_elimination",
+            "common::dead_code_elimination",
+        ]
+        assert get_op_types_in_program(prog) == ["relu"]
+
+    @pytest.mark.parametrize(
+        "validation_level",
+        [ValidationLevel.NONE, ValidationLevel.END_OF_PIPELINE, ValidationLevel.PER_PASS],
+    )
+    def test_validation_level_valid_program(self, validation_level):
+        prog = _get_prog()
+        apply_common_pass_pipeline(prog, [], pass_pipeline=PassPipeline(validation_level=validation_level))
+        assert get_op_types_in_program(prog) == ["relu"]
+
+    def test_validation_level_invalid_program(self):
+        def _run(validation_level):
+            pipeline = PassPipeline(
+                passes=["test::corrupt_relu_input", "common::dead_code_elimination"],
+                cleanup_passes=[],
+                validation_level=validation_level,
+            )
+            apply_common_pass_pipeline(_get_prog(), [], pass_pipeline=pipeline)
+
+        _run("none")
+        with pytest.raises(InvalidBlockStateError, match="should be consumed by op"):
+            _run("end_of_pipeline")
+        with pytest.raises(
+            InvalidBlockStateError,
+            match='Invalid program after pass "test::corrupt_relu_input"',
+        ):
+            _run("per_pass")
+
+    def test_num_workers(self):
+        pipeline = PassPipeline(
+            passes=[
+                "test::wait_for_other_function",
+                "common::noop_elimination",
+                "common::const_elimination",
+                "common::dead_code_elimination",
+            ],
+            cleanup_passes=[],
+            validation_level="per_pass",
+            num_workers=2,
+        )
+        prog = _get_prog_with_two_functions()
+        apply_common_pass_pipeline(prog, [], pass_pipeline=pipeline)
+        # The worker threads generate the names of the new ops from the same counts, so
+        # they don't clash with the names of the existing ops
+        op_names = set()
+        for func in prog.functions.values():
+            assert [op.op_type for op in func.operations] == ["relu", "relu"]
+            op_names.update(op.name for op in func.operations)
+        assert len(op_names) == 4
+
+        with pytest.raises(ValueError, match="num_workers must be a positive integer"):
+            PassPipeline(num_workers=0)
+
+    def test_invalid_validation_level(self):
+        with pytest.raises(ValueError, match="is not a valid ValidationLevel"):
+            PassPipeline(validation_level="full")
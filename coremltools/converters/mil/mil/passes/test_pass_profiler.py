@@ -0,0 +1,71 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+import json
+import os
+
+from coremltools.converters.mil.mil import Builder as mb
+from coremltools.converters.mil.mil.passes.apply_common_pass_pipeline import \
+    apply_common_pass_pipeline
+from coremltools.converters.mil.mil.passes.pass_profiler import \
+    PASS_PROFILE_ENV_VAR
+
+
+def _get_prog():
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 4))])
+    def prog(x):
+        x = mb.add(x=x, y=0.0)
+        return mb.relu(x=x)
+
+    return prog
+
+
+class TestPassProfiler:
+    def test_profiling_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv(PASS_PROFILE_ENV_VAR, raising=False)
+        assert apply_common_pass_pipeline(_get_prog(), []) is None
+
+    def test_profile(self, monkeypatch):
+        monkeypatch.delenv(PASS_PROFILE_ENV_VAR, raising=False)
+        profile = apply_common_pass_pipeline(_get_prog(), [], profile=True)
+
+        # Reruns of passes on an unchanged program are skipped, and not profiled
+        names = [p.name for p in profile.passes]
+        assert names[0] == "common::lower_complex_dialect_ops"
+        assert names[-1] == "common::topological_reorder"
+        assert names.count("common::reduce_transposes") == 2
+        assert {p.stage for p in profile.passes} == {"Common", "Clean up"}
+
+        noop_elimination = profile.passes[names.index("common::noop_elimination")]
+        assert noop_elimination.num_ops_before == 3  # const, add, relu
+        assert noop_elimination.num_ops_after == 2  # the const is left to dead_code_elimination
+        assert noop_elimination.op_type_delta == {"add": -1}
+        for p in profile.passes:
+            assert p.duration >= 0
+            assert p.peak_memory >= 0
+
+        assert profile.total_time() == sum(p.duration for p in profile.passes)
+        time_per_pass = profile.time_per_pass()
+        assert len(time_per_pass) == len(set(names))
+        assert "common::const_elimination" in str(profile)
+
+    def test_profile_env_var(self, monkeypatch, tmpdir):
+        path = os.path.join(str(tmpdir), "passes.json")
+        monkeypatch.setenv(PASS_PROFILE_ENV_VAR, path)
+        profile = apply_common_pass_pipeline(_get_prog(), [])
+        assert profile is not None
+
+        with open(path) as f:
+            trace = json.load(f)
+        events = trace["traceEvents"]
+        assert len(events) == len(profile.passes)
+        assert events[0]["name"] == "common::lower_complex_dialect_ops"
+        assert events[0]["ph"] == "X"
+        assert set(events[0]["args"].keys()) == {
+            "num_ops_before",
+            "num_ops_after",
+            "op_type_delta",
+            "peak_memory",
+        }
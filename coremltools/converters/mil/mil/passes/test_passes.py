@@ -45,6 +45,25 @@ def test_const_elimination():
         assert_model_is_valid(prog, {"x": (2, 4)})
 
 
+def test_const_elimination_folds_chains_once():
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 4))])
+    def prog(x):
+        shape = mb.shape(x=x)
+        shape = mb.gather(x=shape, indices=[1, 0], axis=0)
+        shape = mb.mul(x=shape, y=1)
+        return mb.reshape(x=x, shape=shape), shape
+
+    num_consts = len(prog.find_ops(op_type="const"))
+    prev_prog = copy.deepcopy(prog)
+    PASS_REGISTRY["common::const_elimination"](prog)
+    assert_same_output_names(prev_prog, prog)
+    assert get_op_types_in_program(prog) == ["reshape"]
+    # The shape arithmetic is folded into a single const, used by the reshape and the output
+    assert len(prog.find_ops(op_type="const")) == num_consts + 1
+
+    if validate_model:
+        assert_model_is_valid(prog, {"x": (2, 4)})
+
 def test_divide_to_multiply():
     @mb.program(input_specs=[mb.TensorSpec(shape=(2, 4))])
     def prog(x):
@@ -322,6 +341,94 @@ def test_generic_child_ordering():
         expected_output_shapes={block.outputs[0].name: (3, 5, 6)},
     )
 
+def test_generic_wide_fan_out():
+    """
+    Checks that the generic pattern matching infrastructure assigns the children of the
+    same op type to the right operations of the pattern, when an operation has many children
+    """
+    unary_ops = [mb.sigmoid, mb.tanh, mb.exp, mb.abs, mb.square, mb.sin, mb.cos, mb.floor]
+
+    def build(x, order):
+        branches = [None] * len(unary_ops)
+        for i in order:
+            relu = mb.relu(x=x, name="relu_{}".format(i))
+            branches[i] = unary_ops[i](x=relu, name="unary_{}".format(i))
+        return mb.concat(values=branches, axis=0, name="concat")
+
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 3))])
+    def prog(x):
+        return build(mb.relu(x=x), order=range(len(unary_ops) - 1, -1, -1))
+
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 3))])
+    def ops_arrangement(x):
+        return build(x, order=range(len(unary_ops)))
+
+    def var_constraints(pattern):
+        return all(
+            getattr(pattern, "relu_{}".format(i)).outputs[0].child_ops[0]
+            is getattr(pattern, "unary_{}".format(i))
+            for i in range(len(unary_ops))
+        )
+
+    def transform_pattern(pattern):
+        x = mb.concat(
+            values=[pattern.root_var] * len(unary_ops), axis=0, before_op=pattern.final_op
+        )
+        pattern.block.replace_uses_of_var_after_op(
+            anchor_op=pattern.final_op, old_var=pattern.final_op.outputs[0], new_var=x
+        )
+        pattern.block.remove_ops(pattern.op_list())
+
+    register_generic_pass(ops_arrangement=ops_arrangement, var_constraints=var_constraints,
+                          transform_pattern=transform_pattern, pass_name="test_generic_wide_fan_out",
+                          namespace="common")
+
+    prev_prog, prev_block, block = apply_pass_and_basic_check(
+        prog, "common::test_generic_wide_fan_out"
+    )
+    assert get_op_types_in_program(prog) == ["relu", "concat"]
+    assert_model_is_valid(
+        prog,
+        {"x": (2, 3)},
+        expected_output_shapes={block.outputs[0].name: (16, 3)},
+    )
+
+def test_generic_several_patterns():
+    """
+    Checks that all the patterns registered under the same pass name are fused
+    """
+    @mb.program(input_specs=[mb.TensorSpec(shape=(3, 5))])
+    def prog(x):
+        x = mb.sigmoid(x=mb.relu(x=x))
+        return mb.tanh(x=mb.relu(x=x))
+
+    def get_ops_arrangement(unary_op):
+        @mb.program(input_specs=[mb.TensorSpec(shape=(3, 5))])
+        def ops_arrangement(x):
+            return unary_op(x=mb.relu(x=x, name="relu"), name="unary")
+
+        return ops_arrangement
+
+    def get_transform_pattern(new_op):
+        def transform_pattern(pattern):
+            x = new_op(x=pattern.root_var, before_op=pattern.final_op)
+            pattern.block.replace_uses_of_var_after_op(
+                anchor_op=pattern.final_op, old_var=pattern.final_op.outputs[0], new_var=x
+            )
+            pattern.block.remove_ops(pattern.op_list())
+
+        return transform_pattern
+
+    for unary_op, new_op in [(mb.sigmoid, mb.softplus), (mb.tanh, mb.softsign)]:
+        register_generic_pass(ops_arrangement=get_ops_arrangement(unary_op),
+                              var_constraints=lambda pattern: True,
+                              transform_pattern=get_transform_pattern(new_op),
+                              pass_name="test_generic_several_patterns", namespace="common")
+
+    assert len(PASS_REGISTRY["common::test_generic_several_patterns"].passes) == 2
+    apply_pass_and_basic_check(prog, "common::test_generic_several_patterns")
+    assert get_op_types_in_program(prog) == ["softplus", "softsign"]
+
 @pytest.mark.parametrize("rank", [1, 2, 3, 4])
 def test_onehot_matmul_to_gather_fusion(rank):
     """
@@ -2127,3 +2234,64 @@ class TestSkipConstexprOps:
             expected_ops = [constexpr_op] * sum([weight_constexpr, bias_constexpr]) + ["conv", "batch_norm"]
 
         assert get_op_types_in_program(prog) == expected_ops
+
+
+class TestCompressionPassesNumWorkers:
+
+    @staticmethod
+    def _get_prog(weights):
+        @mb.program(
+            input_specs=[mb.TensorSpec(shape=(1, 16)), mb.TensorSpec(shape=(1,), dtype=types.bool)],
+            opset_version=ct.target.iOS16,
+        )
+        def prog(x, pred):
+            for w in weights[:3]:
+                x = mb.linear(x=x, weight=w)
+            return mb.cond(
+                pred=pred,
+                _true_fn=lambda: mb.linear(x=x, weight=weights[3]),
+                _false_fn=lambda: mb.linear(x=x, weight=weights[4]),
+            )
+        return prog
+
+    @staticmethod
+    def _get_compressed_vals(prog):
+        vals = []
+        def visit_block(block):
+            for op in block.operations:
+                for b in op.blocks:
+                    visit_block(b)
+                if op.op_type.startswith("constexpr_"):
+                    vals.append(op.value_inference())
+        visit_block(prog.functions["main"])
+        return vals
+
+    @staticmethod
+    @pytest.mark.parametrize("compression_pass", ["sparsifier", "palettizer", "affine_quantizer"])
+    def test_same_result_with_several_workers(compression_pass):
+        def apply_pass(prog, num_workers):
+            kwargs = {"op_selector": lambda op: True, "num_workers": num_workers}
+            if compression_pass == "sparsifier":
+                graph_pass = WeightSparsifier(mode="percentile_based", target_percentile=0.5, **kwargs)
+            elif compression_pass == "palettizer":
+                graph_pass = WeightPalettizer(nbits=2, mode="uniform", **kwargs)
+            else:
+                graph_pass = WeightAffineQuantizer(mode="linear", **kwargs)
+            graph_pass.apply(prog)
+
+        weights = [np.random.rand(16, 16).astype(np.float32) for _ in range(5)]
+        prog = TestCompressionPassesNumWorkers._get_prog(weights)
+        apply_pass(prog, num_workers=1)
+        prog_parallel = TestCompressionPassesNumWorkers._get_prog(weights)
+        apply_pass(prog_parallel, num_workers=2)
+
+        vals = TestCompressionPassesNumWorkers._get_compressed_vals(prog)
+        vals_parallel = TestCompressionPassesNumWorkers._get_compressed_vals(prog_parallel)
+        assert len(vals) == len(vals_parallel) == 5
+        for val, val_parallel in zip(vals, vals_parallel):
+            np.testing.assert_array_equal(val, val_parallel)
+
+    @staticmethod
+    def test_invalid_num_workers():
+        with pytest.raises(ValueError, match="num_workers must be a positive integer, got 0"):
+            WeightPalettizer(nbits=2, mode="uniform", num_workers=0, op_selector=lambda op: True)
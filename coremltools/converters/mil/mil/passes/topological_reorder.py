@@ -39,7 +39,7 @@ def _move_operations_to_the_end_block(block, op_type_to_move):
                 # Current op should be moved right before this first consumer of one of it's output.
                 #  1. Find indices for all the consumer ops of outputs
                 #  2. Move current op right before first consumer i.e. smallest index in block.operations
-                first_use_indices = [block.operations.index(first_use_op) for first_use_op in first_consumers]
+                first_use_indices = [block.find_op_id_in_block(first_use_op) for first_use_op in first_consumers]
                 before_op = block.operations[min(first_use_indices)]
 
             # Create new copy of current operation
@@ -88,7 +88,7 @@ def _move_operations_to_the_end_block(block, op_type_to_move):
             #     }
             # In above example, `%cast_1` will be moved to the end of the block and first_use info for `%cast_0`
             # should point to `%transpose_0` and not to `%cast_1`
-            if v not in first_use or block.operations.index(first_use[v]) > block.operations.index(current_op):
+            if v not in first_use or block.is_op_before(current_op, first_use[v]):
                 first_use[v] = current_op
 
     # Remove ops that are reordered
@@ -99,7 +99,7 @@ def _replace_ops(block, concat_op, slice_ops, axis):
 
 @block_context_manager
 def _reflection_padding_block(block):
-    for op in list(block.operations):
+    for op in block.find_ops_by_type(["concat"]):
         _match_pattern(op, block)
 
 
@@ -14,7 +14,7 @@ from coremltools.converters.mil.mil.ops.helper import _get_version_of_op
 
 from . import types
 from .block import Function
-from .types.symbolic import k_num_internal_syms, k_used_symbols
+from .types.symbolic import k_internal_sym_numbers, k_symbol_table
 from .var import Var
 
 
@@ -124,9 +124,9 @@ class Program:
             raise ValueError(msg.format(found_ops))
         return found_ops
 
-    def validate(self):
+    def validate(self, force=False):
         for f in self.functions.values():
-            f.validate()
+            f.validate(force=force)
 
     def __getitem__(self, func_name):
         if func_name not in self.functions:
@@ -197,10 +197,7 @@ class Placeholder:
 
 
 def get_new_variadic_symbol():
-    global k_num_internal_syms
-    s = Symbol("*is" + str(k_num_internal_syms))
-    k_num_internal_syms += 1
-    return s
+    return Symbol("*is" + str(next(k_internal_sym_numbers)))
 
 
 def get_new_symbol(name=None):
@@ -211,27 +208,24 @@ def get_new_symbol(name=None):
         Optional name that provides more readability. If the name specified is
         not available, an extra integer will be appended.
     """
-    global k_used_symbols
-    global k_num_internal_syms
-
+    internal_sym_number = next(k_internal_sym_numbers)
     if name is not None:
         s = Symbol(name)
-        if s in k_used_symbols:
-            new_name = name + k_num_internal_syms
+        if s in k_symbol_table.used_symbols:
+            new_name = name + str(internal_sym_number)
             msg = 'Symbol name "{}" already occupied. Renaming to {}'
             logger.warning(msg.format(name, new_name))
             s = Symbol(new_name)
     else:
-        s = Symbol("is" + str(k_num_internal_syms))
-    k_num_internal_syms += 1
+        s = Symbol("is" + str(internal_sym_number))
     return s
 
 def get_existing_symbol(name):
-    global k_used_symbols
-    if name not in k_used_symbols:
+    used_symbols = k_symbol_table.used_symbols
+    if name not in used_symbols:
         msg = 'Symbol name {} does not exist'
         raise ValueError(msg.format(name))
-    return k_used_symbols[name]
+    return used_symbols[name]
 
 
 class Symbol(_sm.Symbol):
@@ -248,9 +242,9 @@ class Symbol(_sm.Symbol):
         if not (sym_name[0].isalpha() or sym_name[0] == "*"):
             msg = "Symbol name must start with a letter or *. Got {}"
             raise ValueError(msg.format(sym_name))
-        global k_used_symbols
-        if sym_name in k_used_symbols:
+        used_symbols = k_symbol_table.used_symbols
+        if sym_name in used_symbols:
             msg = "Symbol `{}` is used already."
             raise ValueError(msg.format(sym_name))
-        k_used_symbols[sym_name] = self
+        used_symbols[sym_name] = self
         self.name = sym_name
@@ -9,6 +9,8 @@ import numpy as np
 import pytest
 
 from coremltools.converters.mil.mil import Builder as mb
+from coremltools.converters.mil.mil.block import (track_mutations,
+                                                  validate_mutations)
 from coremltools.converters.mil.mil.passes.test_passes import CONSTEXPR_FUNCS
 from coremltools.converters.mil.testing_utils import (
     assert_same_output_names,
@@ -398,6 +400,40 @@ def test_substitute_nested_op():
     assert len(block.find_ops(op_type="abs")) == 0
 
 
+def test_substitute_var_in_nested_blocks_up_to_end_op():
+    """
+    Replace a var which is consumed inside the blocks of a cond op, both as an op
+    input and as a block output, but only up to the cond op.
+    """
+
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 4)), mb.TensorSpec(shape=(2, 4))])
+    def prog(x0, y0):
+        x1 = mb.relu(x=x0)
+        pred = mb.less(x=x0, y=y0)
+        z = mb.cond(
+            pred=pred, _true_fn=lambda: mb.identity(x=x1), _false_fn=lambda: x1
+        )
+        z1 = mb.log(x=x1)
+        return z, z1
+
+    block = prog.functions["main"]
+    relu = block.find_ops(op_type="relu")[0]
+    cond = block.find_ops(op_type="cond")[0]
+    log = block.find_ops(op_type="log")[0]
+    x1 = relu.outputs[0]
+    with block:
+        x2 = mb.sin(x=block.inputs["x0"], before_op=cond)
+
+    block.replace_uses_of_var_after_op(anchor_op=x2.op, old_var=x1, new_var=x2, end_op=cond)
+
+    true_block, false_block = cond.blocks
+    assert true_block.operations[0].inputs["x"] is x2
+    assert false_block.outputs[0] is x2
+    assert log.inputs["x"] is x1
+    assert x1.child_ops == [log]
+    assert x1.consuming_blocks == []
+
+
 def test_simple_transpose_squash():
     """
     Test eliminate consecutive transpose can be canceled
@@ -492,3 +528,133 @@ def test_duplicate_outputs_substituion():
     assert block.outputs[0].op.name == "new_output"
     assert block.outputs[1].op.name == "new_output"
     assert len(block.outputs[0].consuming_blocks) == 1
+
+
+def test_insert_many_ops_before_same_op():
+    """
+    Repeatedly insert ops right before the same op, so that the order labels of the
+    block run out of room and have to be spread out again.
+    """
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 4))])
+    def prog(x0):
+        x1 = mb.relu(x=x0)
+        x2 = mb.log(x=x1)
+        return x2
+
+    block = prog.functions["main"]
+    relu_op = block.find_ops(op_type="relu")[0]
+    log_op = block.find_ops(op_type="log")[0]
+
+    inserted = []
+    with block:
+        for i in range(200):
+            y = mb.sin(x=relu_op.outputs[0], before_op=log_op, name="sin_{}".format(i))
+            inserted.append(y.op)
+
+    assert block.operations[-1] is log_op
+    assert block.operations[-201:-1] == inserted
+    for i, op in enumerate(block.operations):
+        assert block.find_op_id_in_block(op) == i
+    assert block.is_op_before(relu_op, inserted[0])
+    assert block.is_op_before(inserted[0], inserted[1])
+    assert block.is_op_before(inserted[-1], log_op)
+    assert not block.is_op_before(log_op, inserted[-1])
+
+    block.remove_ops(inserted[::2])
+    assert block.operations[-101:-1] == inserted[1::2]
+    for i, op in enumerate(block.operations):
+        assert block.find_op_id_in_block(op) == i
+    with pytest.raises(ValueError, match="not found"):
+        block.find_op_id_in_block(inserted[0])
+
+
+def test_insert_op_before_its_input_fails():
+    """
+    An op cannot be inserted before the op producing one of its inputs.
+    """
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 4))])
+    def prog(x0):
+        x1 = mb.relu(x=x0)
+        x2 = mb.log(x=x1)
+        return x2
+
+    block = prog.functions["main"]
+    relu_op = block.find_ops(op_type="relu")[0]
+    log_op = block.find_ops(op_type="log")[0]
+
+    with block:
+        mb.sin(x=relu_op.outputs[0], before_op=log_op)
+        with pytest.raises(ValueError, match="is not in scope of"):
+            mb.sin(x=log_op.outputs[0], before_op=relu_op)
+        with pytest.raises(ValueError, match="is not in scope of"):
+            mb.sin(x=relu_op.outputs[0], before_op=relu_op)
+
+
+def test_track_mutations():
+    """
+    Only the ops which are created, rewired, or whose outputs gain or lose consumers
+    are recorded.
+    """
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 4))])
+    def prog(x0):
+        x1 = mb.relu(x=x0)
+        x2 = mb.sqrt(x=x1)
+        x3 = mb.exp(x=x2)
+        return x3
+
+    block = prog.functions["main"]
+    relu_op, sqrt_op, exp_op = block.operations
+
+    with track_mutations() as mutations:
+        with block:
+            x4 = mb.sin(x=relu_op.outputs[0], before_op=exp_op)
+        block.replace_uses_of_var_after_op(anchor_op=x4.op, old_var=sqrt_op.outputs[0], new_var=x4)
+        block.remove_ops([sqrt_op])
+
+    assert mutations == {relu_op, x4.op, exp_op, sqrt_op}
+    validate_mutations(mutations)
+
+
+def test_find_ops_by_type():
+    """
+    The op_type index of a block follows the insertions and removals of ops, and gives
+    the ops in the order of the block.
+    """
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 4))])
+    def prog(x0):
+        x1 = mb.relu(x=x0)
+        x2 = mb.cond(
+            pred=True,
+            _true_fn=lambda: mb.relu(x=x1),
+            _false_fn=lambda: mb.sin(x=x1),
+        )
+        x3 = mb.relu(x=x2)
+        return mb.sin(x=x3)
+
+    block = prog.functions["main"]
+    relu_0, cond_op, relu_1, sin_op = [op for op in block.operations if op.op_type != "const"]
+
+    assert block.find_ops_by_type(["relu"]) == [relu_0, relu_1]
+    assert block.find_ops_by_type(["sin", "relu"]) == [relu_0, relu_1, sin_op]
+    assert block.find_ops_by_type(["relu"], include_ops_with_blocks=True) == [
+        relu_0,
+        cond_op,
+        relu_1,
+    ]
+    assert block.find_ops_by_type(["log"]) == []
+    # find_ops still recurses into the nested blocks
+    assert block.find_ops(op_type="relu") == [relu_0, cond_op.blocks[0].operations[0], relu_1]
+
+    with block:
+        x4 = mb.relu(x=relu_0.outputs[0], before_op=relu_1)
+    assert block.find_ops_by_type(["relu"]) == [relu_0, x4.op, relu_1]
+
+    block.replace_uses_of_var_after_op(
+        anchor_op=relu_1, old_var=relu_1.outputs[0], new_var=relu_1.x
+    )
+    block.remove_ops([relu_1])
+    assert block.find_ops_by_type(["relu"]) == [relu_0, x4.op]
+    for op_type in ["relu", "sin", "cond", "const"]:
+        assert block.find_ops_by_type([op_type]) == [
+            op for op in block.operations if op.op_type == op_type
+        ]
@@ -0,0 +1,236 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+import itertools
+
+import numpy as np
+import pytest
+
+import coremltools as ct
+from coremltools._deps import _HAS_TORCH
+from coremltools.converters.mil.backend.mil.load import BlobWriter
+from coremltools.converters.mil.mil import Builder as mb
+from coremltools.converters.mil.mil import get_new_symbol, types
+from coremltools.converters.mil.mil.executor import ProgramExecutor
+
+if _HAS_TORCH:
+    import torch
+
+
+def _run(op_func, x, **kwargs):
+    @mb.program(input_specs=[mb.TensorSpec(shape=x.shape)])
+    def prog(x):
+        return op_func(x)
+
+    outputs = ProgramExecutor(prog, **kwargs).predict({"x": x})
+    return list(outputs.values())[0]
+
+
+@pytest.mark.skipif(not _HAS_TORCH, reason="The reference outputs come from PyTorch")
+class TestKernels:
+    @pytest.mark.parametrize(
+        "groups, strides, dilations, pad",
+        itertools.product([1, 2], [[1, 1], [2, 1]], [[1, 1], [1, 2]], [[0, 0, 0, 0], [1, 2, 0, 1]]),
+    )
+    def test_conv(self, groups, strides, dilations, pad):
+        x = np.random.rand(2, 4, 9, 10).astype(np.float32)
+        weight = np.random.rand(6, 4 // groups, 3, 2).astype(np.float32)
+        bias = np.random.rand(6).astype(np.float32)
+        out = _run(
+            lambda x: mb.conv(
+                x=x,
+                weight=weight,
+                bias=bias,
+                strides=strides,
+                dilations=dilations,
+                pad_type="custom",
+                pad=pad,
+                groups=groups,
+            ),
+            x,
+        )
+        x_padded = torch.nn.functional.pad(torch.tensor(x), (pad[2], pad[3], pad[0], pad[1]))
+        expected = torch.nn.functional.conv2d(
+            x_padded,
+            torch.tensor(weight),
+            torch.tensor(bias),
+            stride=strides,
+            dilation=dilations,
+            groups=groups,
+        )
+        np.testing.assert_allclose(out, expected.numpy(), rtol=1e-5, atol=1e-5)
+
+    def test_conv1d_same_padding(self):
+        x = np.random.rand(2, 3, 11).astype(np.float32)
+        weight = np.random.rand(5, 3, 3).astype(np.float32)
+        out = _run(lambda x: mb.conv(x=x, weight=weight, pad_type="same"), x)
+        expected = torch.nn.functional.conv1d(torch.tensor(x), torch.tensor(weight), padding=1)
+        np.testing.assert_allclose(out, expected.numpy(), rtol=1e-5, atol=1e-5)
+
+    @pytest.mark.parametrize(
+        "ceil_mode, exclude_padding_from_average",
+        itertools.product([False, True], [False, True]),
+    )
+    def test_pooling(self, ceil_mode, exclude_padding_from_average):
+        x = np.random.rand(2, 4, 9, 10).astype(np.float32)
+        pool_kwargs = {
+            "kernel_sizes": [3, 3],
+            "strides": [2, 2],
+            "pad_type": "custom",
+            "pad": [1, 1, 1, 1],
+            "ceil_mode": ceil_mode,
+        }
+        out = _run(
+            lambda x: mb.avg_pool(
+                x=x, exclude_padding_from_average=exclude_padding_from_average, **pool_kwargs
+            ),
+            x,
+        )
+        expected = torch.nn.functional.avg_pool2d(
+            torch.tensor(x),
+            3,
+            2,
+            1,
+            ceil_mode=ceil_mode,
+            count_include_pad=not exclude_padding_from_average,
+        )
+        np.testing.assert_allclose(out, expected.numpy(), rtol=1e-5, atol=1e-6)
+
+        out = _run(lambda x: mb.max_pool(x=x, **pool_kwargs), x)
+        expected = torch.nn.functional.max_pool2d(torch.tensor(x), 3, 2, 1, ceil_mode=ceil_mode)
+        np.testing.assert_allclose(out, expected.numpy())
+
+    def test_normalization(self):
+        x = np.random.rand(2, 4, 5, 6).astype(np.float32)
+        gamma = np.random.rand(4).astype(np.float32)
+        beta = np.random.rand(4).astype(np.float32)
+        out = _run(lambda x: mb.instance_norm(x=x, gamma=gamma, beta=beta), x)
+        expected = torch.nn.functional.instance_norm(
+            torch.tensor(x), weight=torch.tensor(gamma), bias=torch.tensor(beta)
+        )
+        np.testing.assert_allclose(out, expected.numpy(), rtol=1e-5, atol=1e-5)
+
+        mean = np.random.rand(4).astype(np.float32)
+        variance = np.random.rand(4).astype(np.float32)
+        out = _run(
+            lambda x: mb.batch_norm(x=x, mean=mean, variance=variance, gamma=gamma, beta=beta), x
+        )
+        expected = torch.nn.functional.batch_norm(
+            torch.tensor(x),
+            torch.tensor(mean),
+            torch.tensor(variance),
+            weight=torch.tensor(gamma),
+            bias=torch.tensor(beta),
+        )
+        np.testing.assert_allclose(out, expected.numpy(), rtol=1e-5, atol=1e-5)
+
+        gamma = np.random.rand(5, 6).astype(np.float32)
+        out = _run(lambda x: mb.layer_norm(x=x, axes=[-2, -1], gamma=gamma, beta=gamma), x)
+        expected = torch.nn.functional.layer_norm(
+            torch.tensor(x), (5, 6), torch.tensor(gamma), torch.tensor(gamma)
+        )
+        np.testing.assert_allclose(out, expected.numpy(), rtol=1e-5, atol=1e-5)
+
+
+class TestProgramExecutor:
+    def test_value_inference_fallback(self):
+        x = np.random.rand(2, 3, 4).astype(np.float32)
+        y = np.random.rand(4, 5).astype(np.float32)
+        out = _run(
+            lambda x: mb.softmax(
+                x=mb.reshape(x=mb.matmul(x=mb.relu(x=x), y=y), shape=[-1, 5]), axis=-1
+            ),
+            x,
+        )
+        expected = np.exp(np.maximum(x, 0) @ y).reshape(-1, 5)
+        expected /= expected.sum(axis=-1, keepdims=True)
+        np.testing.assert_allclose(out, expected, rtol=1e-5)
+
+    def test_batched_inputs(self):
+        weight = np.random.rand(4, 3, 1, 1).astype(np.float32)
+
+        @mb.program(input_specs=[mb.TensorSpec(shape=(get_new_symbol(), 3, 8, 8))])
+        def prog(x):
+            return mb.shape(x=mb.conv(x=x, weight=weight, name="y"), name="shape")
+
+        executor = ProgramExecutor(prog)
+        # A symbolic batch dimension takes any batch size
+        out = executor.predict({"x": np.random.rand(5, 3, 8, 8)})
+        np.testing.assert_equal(out["shape"], [5, 4, 8, 8])
+        assert out["shape"].dtype == np.int32
+
+        outputs = executor.predict([{"x": np.random.rand(n, 3, 8, 8)} for n in (1, 2)])
+        assert [out["shape"][0] for out in outputs] == [1, 2]
+
+    def test_control_flow(self):
+        @mb.program(
+            input_specs=[mb.TensorSpec(shape=(2,)), mb.TensorSpec(shape=(1,), dtype=types.int32)]
+        )
+        def prog(a, n):
+            def cond(a, i):
+                return mb.less(x=i, y=n)
+
+            def body(a, i):
+                return mb.mul(x=a, y=2.0), mb.add(x=i, y=1)
+
+            a, _ = mb.while_loop(
+                _cond=cond, _body=body, loop_vars=(a, np.array([0], dtype=np.int32))
+            )
+            pred = mb.greater(x=mb.reduce_sum(x=a), y=10.0)
+            return mb.cond(
+                pred=pred,
+                _true_fn=lambda: mb.add(x=a, y=1.0),
+                _false_fn=lambda: mb.mul(x=a, y=-1.0),
+            )
+
+        executor = ProgramExecutor(prog)
+        out = list(executor.predict({"a": np.array([1.0, 2.0]), "n": np.array([3])}).values())
+        np.testing.assert_equal(out[0], [9.0, 17.0])
+        out = list(executor.predict({"a": np.array([1.0, 2.0]), "n": np.array([1])}).values())
+        np.testing.assert_equal(out[0], [-2.0, -4.0])
+
+    def test_fp16_emulation(self):
+        x = np.array([1.0001, 2.0, 3.0], dtype=np.float32)
+        np.testing.assert_equal(_run(lambda x: mb.mul(x=x, y=3.0), x), x * 3.0)
+        out = _run(lambda x: mb.mul(x=x, y=3.0), x, fp16_emulation=True)
+        assert out.dtype == np.float32
+        np.testing.assert_equal(out, [3.0, 6.0, 9.0])
+
+    def test_invalid_inputs(self):
+        @mb.program(input_specs=[mb.TensorSpec(shape=(2,))])
+        def prog(x):
+            return mb.relu(x=x)
+
+        executor = ProgramExecutor(prog)
+        with pytest.raises(ValueError, match="Missing values for the inputs"):
+            executor.predict({})
+        with pytest.raises(ValueError, match="Unknown inputs"):
+            executor.predict({"x": np.zeros(2), "y": np.zeros(2)})
+        with pytest.raises(ValueError, match="Function not_main not found"):
+            ProgramExecutor(prog, function_name="not_main")
+
+    def test_unsupported_op(self):
+        @mb.program(input_specs=[mb.TensorSpec(shape=(1, 2, 3))])
+        def prog(x):
+            return mb.rnn(x=x, initial_h=np.zeros((1, 4), np.float32),
+                          weight_ih=np.zeros((4, 3), np.float32),
+                          weight_hh=np.zeros((4, 4), np.float32))
+
+        with pytest.raises(NotImplementedError, match="of type rnn is not supported"):
+            ProgramExecutor(prog).predict({"x": np.zeros((1, 2, 3))})
+
+    @pytest.mark.skipif(BlobWriter is None, reason="mlprogram models can't be saved")
+    def test_from_mlmodel(self):
+        weight = np.random.rand(4, 3, 3, 3).astype(np.float32)
+
+        @mb.program(input_specs=[mb.TensorSpec(shape=(1, 3, 8, 8))])
+        def prog(x):
+            return mb.relu(x=mb.conv(x=x, weight=weight))
+
+        x = np.random.rand(1, 3, 8, 8).astype(np.float32)
+        expected = list(ProgramExecutor(prog).predict({"x": x}).values())[0]
+        mlmodel = ct.convert(prog, convert_to="mlprogram")
+        out = list(ProgramExecutor.from_mlmodel(mlmodel).predict({"x": x}).values())[0]
+        np.testing.assert_allclose(out, expected, rtol=1e-2, atol=1e-2)
@@ -3,6 +3,8 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
+import threading
+
 import numpy as np
 import pytest
 
@@ -10,6 +12,7 @@ import coremltools as ct
 from coremltools import _logger as logger
 from coremltools.converters.mil.mil import Builder as mb
 from coremltools.converters.mil.mil import types
+from coremltools.converters.mil.mil.lazy_value import FileValue
 
 np.random.seed(0)
 
@@ -140,6 +143,63 @@ def test_while_example():
         prediction = mlmodel.predict(feed_dict)
         assert len(prediction) == 2
 
+def test_lazy_file_value_const(tmpdir):
+    weight = np.random.rand(3, 2, 4).astype(np.float16)
+    file_name = str(tmpdir.join("weight.bin"))
+    with open(file_name, "wb") as f:
+        f.write(b"\x00" * 64)
+        f.write(weight.tobytes())
+
+    @mb.program(input_specs=[mb.TensorSpec(shape=(3, 2, 4), dtype=types.fp16)])
+    def prog(x):
+        w = mb.const(val=FileValue(file_name, 64, np.float16, (3, 2, 4)), name="w")
+        return mb.add(x=x, y=w)
+
+    const_var = prog.find_ops(op_type="const", exactly_one=True)[0].outputs[0]
+    assert const_var.shape == (3, 2, 4)
+    assert const_var.dtype == types.fp16
+    # the value is only mapped in when it is read
+    assert isinstance(const_var._sym_val.val, FileValue)
+    np.testing.assert_array_equal(const_var.val, weight)
+    assert isinstance(const_var._sym_val.val, np.ndarray)
+
+    # the file is mapped copy-on-write
+    const_var.val[0, 0, 0] = 1.0
+    with open(file_name, "rb") as f:
+        f.seek(64)
+        np.testing.assert_array_equal(np.frombuffer(f.read(), np.float16).reshape(3, 2, 4), weight)
+
+
+def test_build_programs_in_threads():
+    # Both programs are being built at once: the current block and the op names are
+    # those of the thread
+    barrier = threading.Barrier(2, timeout=10)
+    programs = {}
+
+    def build(op_type):
+        @mb.program(input_specs=[mb.TensorSpec(shape=(2, 3))])
+        def prog(x):
+            x = getattr(mb, op_type)(x=x)
+            barrier.wait()
+            x = getattr(mb, op_type)(x=x)
+            barrier.wait()
+            return x
+
+        programs[op_type] = prog
+
+    threads = [threading.Thread(target=build, args=(op_type,)) for op_type in ("relu", "sigmoid")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(programs) == ["relu", "sigmoid"]
+    for op_type, prog in programs.items():
+        ops = prog.functions["main"].operations
+        assert [op.op_type for op in ops] == [op_type, op_type]
+        assert [op.name for op in ops] == [op_type + "_0", op_type + "_1"]
+
+
 def test_reserved_node_names():
     @mb.program(input_specs=[mb.TensorSpec(shape=(10, 20))])
     def prog(x):
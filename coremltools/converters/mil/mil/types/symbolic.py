@@ -3,11 +3,23 @@
 #  Use of this source code is governed by a BSD-3-clause license that can be
 #  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
+import itertools
+import threading
+
 import numpy as np
 import sympy as sm
 
-k_used_symbols = {}
-k_num_internal_syms = 0
+
+class _SymbolTable(threading.local):
+    # Symbols by name, of the conversion running in the current thread
+    def __init__(self):
+        self.used_symbols = {}
+
+
+k_symbol_table = _SymbolTable()
+# Numbers of the internal symbols, shared by all the threads so that two symbols never
+# get the same name, even when they are created by different threads
+k_internal_sym_numbers = itertools.count()
 
 
 def is_compatible_symbolic_vector(val_a, val_b):
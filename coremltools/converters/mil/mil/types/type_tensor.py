@@ -7,6 +7,7 @@ import numpy as np
 import sympy as sm
 
 from coremltools import _logger as logger
+from coremltools.converters.mil.mil.lazy_value import LazyValue
 
 from .get_type_info import get_type_info
 from .type_mapping import (builtin_to_string, is_subtype, is_tensor,
@@ -84,6 +85,11 @@ def tensor(primitive, shape):
 
         @val.setter
         def val(self, v):
+            if isinstance(v, LazyValue) and numpy_type_to_builtin_type(v.dtype) == primitive:
+                # Materialized by Var when the value is read
+                self._val = v
+                return
+
             if not isinstance(v, np.ndarray):
                 raise ValueError(
                     "tensor should have value of type ndarray, got {} instead".format(
@@ -6,6 +6,7 @@
 from typing import Optional
 
 from coremltools.converters.mil.mil import types
+from coremltools.converters.mil.mil.lazy_value import LazyValue
 from coremltools.converters.mil.mil.types import builtin_to_string
 from coremltools.converters.mil.mil.types.symbolic import any_symbolic
 
@@ -60,7 +61,9 @@ class Var:
 
     val [_sym_val]: (np.ndarray or python primitive scalar)
         Numpy (scalar / tensor) value. `val` is not None iff `sym_val` is
-        not None and does not contain symbols.  Read-only.
+        not None and does not contain symbols.  Read-only. If the value is
+        held as a LazyValue (e.g. a weight still in its file), it is
+        materialized on first access.
 
     op [_op]: (Operation)
         The Operation this Var is derived from. May not be None except
@@ -86,6 +89,7 @@ class Var:
         "_child_ops",
         "consuming_blocks",
         "_nonreplaceable_vars_upstream",
+        "_value_stats",
     ]
 
     def __init__(
@@ -120,6 +124,9 @@ class Var:
         self._nonreplaceable_vars_upstream = set()
         self._set_nonreplaceable_vars_upstream()
 
+        # (value, statistics of the value), see passes.helper.get_value_stats
+        self._value_stats = None
+
     @property
     def nonreplaceable_vars_upstream(self):
         return self._nonreplaceable_vars_upstream
@@ -171,7 +178,8 @@ class Var:
         We only fold the var to a const when its value is known AND it doesn't have any
         non-replaceable vars in the upstream.
         """
-        return self.val is not None and not self.nonreplaceable_vars_upstream
+        # The value is read last, as reading it may decompress it
+        return not self.nonreplaceable_vars_upstream and self.val is not None
 
     @property
     def sym_type(self):
@@ -193,17 +201,29 @@ class Var:
             return self._sym_type.get_primitive()
         return self._sym_type
 
+    def _materialize_sym_val(self):
+        val = self._sym_val.val
+        if isinstance(val, LazyValue):
+            lazy_val = val
+            val = lazy_val.materialize()
+            if lazy_val._keep_materialized:
+                self._sym_val.val = val
+        return val
+
     @property
     def sym_val(self):
         if self._sym_val is None:
             return None
-        return self._sym_val.val
+        return self._materialize_sym_val()
 
     @property
     def val(self):
-        if self._sym_val is None or any_symbolic(self._sym_val.val):
+        if self._sym_val is None:
+            return None
+        val = self._materialize_sym_val()
+        if any_symbolic(val):
             return None
-        return self._sym_val.val
+        return val
 
     @property
     def op(self):
@@ -226,7 +246,9 @@ class Var:
 
     def shape_str(self):
         annotation = ""
-        if self.val is not None:
+        # A lazy value is known, and is not materialized to be printed
+        is_lazy = self._sym_val is not None and isinstance(self._sym_val.val, LazyValue)
+        if is_lazy or self.val is not None:
             annotation = "*"
         elif self.sym_val is not None:
             annotation = "^"
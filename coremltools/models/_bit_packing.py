@@ -0,0 +1,167 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+"""
+Packing of n-bit integers (1 <= n <= 8) into a stream of bytes, and back.
+
+Two layouts are used by Core ML:
+
+- ``bitorder="big"``, for the quantized weights of neural networks: the bits of each
+  element go from the most significant one, and fill the bytes from their most
+  significant bit.
+- ``bitorder="little"``, for the indices of ``constexpr_lut_to_dense`` in ML programs:
+  the bits of each element go from the least significant one, and fill the bytes from
+  their least significant bit.
+
+In both cases, the last byte is padded with zeros.
+"""
+
+import numpy as _np
+
+# Number of elements (a multiple of 8) processed at once, which bounds the memory used
+# for the intermediate arrays
+_CHUNK_SIZE = 1 << 22
+
+
+def _check_args(nbits, bitorder):
+    if not isinstance(nbits, (int, _np.integer)) or not 1 <= nbits <= 8:
+        raise ValueError("nbits must be an integer between 1 and 8, got {}".format(nbits))
+    if bitorder not in ("big", "little"):
+        raise ValueError('bitorder must be "big" or "little", got "{}"'.format(bitorder))
+
+
+def _group_dtype(nbits, bitorder):
+    # Smallest unsigned integer type holding the 8 * nbits bits of a group of 8 elements
+    itemsize = 2 if nbits <= 2 else 4 if nbits <= 4 else 8
+    return _np.dtype("{}u{}".format(">" if bitorder == "big" else "<", itemsize))
+
+
+def _element_shifts(nbits, bitorder, dtype):
+    # Position of the least significant bit of each element of a group of 8 elements,
+    # in the integer the group packs into
+    shifts = _np.arange(8, dtype=dtype) * dtype.type(nbits)
+    return shifts[::-1] if bitorder == "big" else shifts
+
+
+def _pack_chunk(arr, nbits, bitorder):
+    # Every group of 8 elements packs into nbits bytes: the bits of the group are
+    # gathered in an integer, whose nbits low order bytes are the packed bytes
+    num_bytes = (arr.size * nbits + 7) // 8
+    dtype = _group_dtype(nbits, bitorder)
+    groups = _np.zeros((arr.size + 7) // 8 * 8, dtype=dtype.newbyteorder("="))
+    groups[:arr.size] = arr
+    groups = groups.reshape(-1, 8) << _element_shifts(nbits, bitorder, groups.dtype)
+    groups = _np.bitwise_or.reduce(groups, axis=1)
+    groups = groups.astype(dtype, copy=False).view(_np.uint8).reshape(-1, dtype.itemsize)
+    if bitorder == "big":
+        groups = groups[:, dtype.itemsize - nbits:]
+    else:
+        groups = groups[:, :nbits]
+    return groups.reshape(-1)[:num_bytes]
+
+
+def _unpack_chunk(byte_arr, num_elements, nbits, bitorder):
+    num_groups = (num_elements + 7) // 8
+    dtype = _group_dtype(nbits, bitorder)
+    groups = _np.zeros((num_groups, dtype.itemsize), dtype=_np.uint8)
+    if bitorder == "big":
+        group_bytes = groups[:, dtype.itemsize - nbits:]
+    else:
+        group_bytes = groups[:, :nbits]
+    padded_bytes = _np.zeros(num_groups * nbits, dtype=_np.uint8)
+    padded_bytes[:byte_arr.size] = byte_arr[:num_groups * nbits]
+    group_bytes[...] = padded_bytes.reshape(num_groups, nbits)
+    groups = groups.view(dtype).astype(dtype.newbyteorder("="), copy=False).reshape(-1, 1)
+    mask = groups.dtype.type((1 << nbits) - 1)
+    values = (groups >> _element_shifts(nbits, bitorder, groups.dtype)) & mask
+    return values.astype(_np.uint8).reshape(-1)[:num_elements]
+
+
+def pack_bits(arr, nbits, bitorder="big"):
+    """
+    Packs the ``nbits`` least significant bits of each element of ``arr``.
+
+    Parameters
+    ----------
+    arr: numpy.array or list
+        Integers in [0, 2 ** nbits - 1]. Flattened if it has more than one dimension.
+
+    nbits: int
+        Number of bits per element, from 1 to 8.
+
+    bitorder: str
+        "big" or "little", see the module documentation.
+
+    Returns
+    -------
+    numpy.array
+        1D array of type uint8, of size ``ceil(arr.size * nbits / 8)``.
+    """
+    _check_args(nbits, bitorder)
+    arr = _np.asarray(arr).reshape(-1).astype(_np.uint8, copy=False)
+    if nbits == 8:
+        return arr.copy()
+    if nbits < 8:
+        arr = arr & _np.uint8((1 << nbits) - 1)
+
+    chunks = [
+        _pack_chunk(arr[start:start + _CHUNK_SIZE], nbits, bitorder)
+        for start in range(0, arr.size, _CHUNK_SIZE)
+    ]
+    if len(chunks) == 0:
+        return _np.zeros((0,), dtype=_np.uint8)
+    return _np.concatenate(chunks)
+
+
+def unpack_bits(byte_arr, num_elements, nbits, bitorder="big"):
+    """
+    Unpacks ``num_elements`` integers of ``nbits`` bits, packed by ``pack_bits``.
+
+    Parameters
+    ----------
+    byte_arr: numpy.array
+        Packed bytes, of type uint8. Flattened if it has more than one dimension.
+
+    num_elements: int
+        Number of elements to unpack.
+
+    nbits: int
+        Number of bits per element, from 1 to 8.
+
+    bitorder: str
+        "big" or "little", see the module documentation.
+
+    Returns
+    -------
+    numpy.array
+        1D array of type uint8, of size ``num_elements``.
+    """
+    _check_args(nbits, bitorder)
+    byte_arr = _np.asarray(byte_arr, dtype=_np.uint8).reshape(-1)
+    num_elements = int(num_elements)
+    if byte_arr.size * 8 < num_elements * nbits:
+        raise ValueError(
+            "{} bytes can't hold {} elements of {} bits".format(
+                byte_arr.size, num_elements, nbits
+            )
+        )
+    if nbits == 8:
+        return byte_arr[:num_elements].copy()
+
+    chunks = []
+    chunk_num_bytes = _CHUNK_SIZE * nbits // 8
+    for start in range(0, num_elements, _CHUNK_SIZE):
+        byte_start = start // _CHUNK_SIZE * chunk_num_bytes
+        chunks.append(
+            _unpack_chunk(
+                byte_arr[byte_start:byte_start + chunk_num_bytes],
+                min(_CHUNK_SIZE, num_elements - start),
+                nbits,
+                bitorder,
+            )
+        )
+    if len(chunks) == 0:
+        return _np.zeros((0,), dtype=_np.uint8)
+    return _np.concatenate(chunks)
@@ -0,0 +1,258 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+"""
+Inspection of a model specification without copying it: a read-only view of a protobuf
+message, and a summary of a model.
+"""
+
+import os as _os
+from collections import Counter as _Counter
+from collections import namedtuple as _namedtuple
+from collections.abc import Mapping as _Mapping
+from collections.abc import MutableMapping as _MutableMapping
+from collections.abc import MutableSequence as _MutableSequence
+from collections.abc import Sequence as _Sequence
+from copy import deepcopy as _deepcopy
+
+from google.protobuf.descriptor import FieldDescriptor as _FieldDescriptor
+from google.protobuf.message import Message as _Message
+
+_READ_ONLY_ERROR_MSG = (
+    "The spec is a read-only view of the spec of the model. Use MLModel.get_spec() "
+    "or copy.deepcopy to get a copy which can be modified."
+)
+
+# Methods of protobuf messages which modify them
+_MUTATING_METHODS = frozenset(
+    [
+        "Clear",
+        "ClearExtension",
+        "ClearField",
+        "CopyFrom",
+        "DiscardUnknownFields",
+        "MergeFrom",
+        "MergeFromString",
+        "ParseFromString",
+        "SetInParent",
+    ]
+)
+
+
+def _read_only(value):
+    if isinstance(value, _Message):
+        return ReadOnlyMessage(value)
+    if isinstance(value, _MutableMapping):
+        return _ReadOnlyMapping(value)
+    if isinstance(value, _MutableSequence):
+        return _ReadOnlySequence(value)
+    return value
+
+
+class ReadOnlyMessage:
+    """
+    Read-only view of a protobuf message, which gives access to its fields (themselves
+    as read-only views) and to the methods that don't modify it, without copying it.
+
+    ``copy.deepcopy`` of the view returns a copy of the message, which can be modified.
+    """
+
+    __slots__ = ("_message",)
+
+    def __init__(self, message):
+        object.__setattr__(self, "_message", message)
+
+    def __getattr__(self, name):
+        if name in _MUTATING_METHODS:
+            raise AttributeError(_READ_ONLY_ERROR_MSG)
+        return _read_only(getattr(self._message, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(_READ_ONLY_ERROR_MSG)
+
+    def __delattr__(self, name):
+        raise AttributeError(_READ_ONLY_ERROR_MSG)
+
+    def ListFields(self):
+        return [(field, _read_only(value)) for field, value in self._message.ListFields()]
+
+    def __eq__(self, other):
+        if isinstance(other, ReadOnlyMessage):
+            other = other._message
+        return self._message == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __deepcopy__(self, memo):
+        return _deepcopy(self._message, memo)
+
+    def __repr__(self):
+        return repr(self._message)
+
+    def __str__(self):
+        return str(self._message)
+
+
+class _ReadOnlySequence(_Sequence):
+    __slots__ = ("_container",)
+
+    def __init__(self, container):
+        self._container = container
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [_read_only(value) for value in self._container[index]]
+        return _read_only(self._container[index])
+
+    def __len__(self):
+        return len(self._container)
+
+    def __eq__(self, other):
+        if isinstance(other, _ReadOnlySequence):
+            other = other._container
+        return list(self._container) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self._container)
+
+
+class _ReadOnlyMapping(_Mapping):
+    __slots__ = ("_container",)
+
+    def __init__(self, container):
+        self._container = container
+
+    def __getitem__(self, key):
+        # Map fields of protobuf insert missing keys on lookup
+        if key not in self._container:
+            raise KeyError(key)
+        return _read_only(self._container[key])
+
+    def __iter__(self):
+        return iter(self._container)
+
+    def __len__(self):
+        return len(self._container)
+
+    def __repr__(self):
+        return repr(self._container)
+
+
+ModelSummary = _namedtuple(
+    "ModelSummary",
+    [
+        "model_type",
+        "specification_version",
+        "inputs",
+        "outputs",
+        "op_counts",
+        "weight_bytes",
+    ],
+)
+ModelSummary.__doc__ = """
+Summary of a model, as returned by ``MLModel.get_summary``.
+
+Attributes
+----------
+model_type: str
+    Type of the model, e.g. ``"mlProgram"`` or ``"neuralNetwork"``.
+
+specification_version: int
+    Specification version of the model.
+
+inputs: list[str]
+    Names of the inputs of the model.
+
+outputs: list[str]
+    Names of the outputs of the model.
+
+op_counts: collections.Counter
+    Number of layers of each type, for neural networks, and number of operations of each
+    type, for ML programs (including the operations of nested blocks). For pipelines,
+    the counts of all their models are added up.
+
+weight_bytes: int
+    Number of bytes of the weights of the model: those of neural network layers and of
+    ML program constants stored in the spec, plus the size of the weight files of an ML
+    program.
+"""
+
+
+def _get_weight_params_bytes(weight_params):
+    return (
+        4 * len(weight_params.floatValue)
+        + len(weight_params.float16Value)
+        + len(weight_params.rawValue)
+        + len(weight_params.int8RawValue)
+    )
+
+
+def _get_sub_messages(message):
+    # Messages directly held by the fields of message
+    for field, value in message.ListFields():
+        if field.type != _FieldDescriptor.TYPE_MESSAGE:
+            continue
+        if field.message_type.GetOptions().map_entry:
+            if field.message_type.fields_by_name["value"].type == _FieldDescriptor.TYPE_MESSAGE:
+                yield from value.values()
+        elif field.label == _FieldDescriptor.LABEL_REPEATED:
+            yield from value
+        else:
+            yield value
+
+
+def _summarize_messages(spec, op_counts):
+    """
+    Walks the messages of spec, counting the layers and ops in op_counts, and returns the
+    number of bytes of the weights held in spec. The repeated scalar fields, which hold
+    the weights, are never iterated.
+    """
+    weight_bytes = 0
+    messages = [spec]
+    while len(messages) > 0:
+        message = messages.pop()
+        message_type = message.DESCRIPTOR.full_name
+        if message_type == "CoreML.Specification.WeightParams":
+            weight_bytes += _get_weight_params_bytes(message)
+            continue
+        if message_type == "CoreML.Specification.NeuralNetworkLayer":
+            op_counts[message.WhichOneof("layer")] += 1
+        elif message_type == "CoreML.Specification.MILSpec.Operation":
+            op_counts[message.type] += 1
+        elif message_type == "CoreML.Specification.MILSpec.TensorValue":
+            weight_bytes += message.ByteSize()
+            continue
+        messages.extend(_get_sub_messages(message))
+    return weight_bytes
+
+
+def get_summary(spec, weights_dir=None):
+    """
+    Returns the ``ModelSummary`` of a spec, whose weight files, if any, are in
+    ``weights_dir``. The spec may be a read-only view.
+    """
+    if isinstance(spec, ReadOnlyMessage):
+        spec = spec._message
+
+    op_counts = _Counter()
+    weight_bytes = _summarize_messages(spec, op_counts)
+    if weights_dir is not None:
+        for dir_path, _, file_names in _os.walk(weights_dir):
+            for file_name in file_names:
+                weight_bytes += _os.path.getsize(_os.path.join(dir_path, file_name))
+
+    return ModelSummary(
+        model_type=spec.WhichOneof("Type"),
+        specification_version=spec.specificationVersion,
+        inputs=[feature.name for feature in spec.description.input],
+        outputs=[feature.name for feature in spec.description.output],
+        op_counts=op_counts,
+        weight_bytes=weight_bytes,
+    )
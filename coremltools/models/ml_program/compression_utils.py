@@ -33,7 +33,8 @@ def _default_op_selector(const_op):
 def _apply_graph_pass(mlmodel, graph_pass):
     # Utility function which compresses a coreml model
     # convert the fully precision mlmodel into pymil program
-    model_spec = mlmodel.get_spec()
+    # The spec is only read, so it isn't copied
+    model_spec = mlmodel._spec
     model_type = model_spec.WhichOneof("Type")
     if model_type in ("neuralNetwork", "neuralNetworkClassifier", "neuralNetworkRegressor", "pipeline", "PipelineClassifier", "PipelineRegressor"):
         msg = ("coremltools.compression_utils are meant to be used only with mlprogram typed coreml models. "
@@ -51,6 +52,8 @@ def _apply_graph_pass(mlmodel, graph_pass):
         model_spec=model_spec,
         specification_version=specification_version,
         file_weights_dir=mlmodel.weights_dir,
+        # Weights are only mapped into memory when the graph pass reads them
+        lazy_file_values=True,
     )
 
     # apply compression graph pass
@@ -67,7 +70,7 @@ def _apply_graph_pass(mlmodel, graph_pass):
     )
     return compressed_mlmodel
 
-def affine_quantize_weights(mlmodel, mode="linear_symmetric", op_selector=None, dtype=_np.int8):
+def affine_quantize_weights(mlmodel, mode="linear_symmetric", op_selector=None, dtype=_np.int8, num_workers=1, chunk_size=None):
     """
     Utility function to convert a float precision MLModel of type ``mlprogram`` that uses
     float-precision weights into a compressed MLModel that uses 8-bit weights. This is
@@ -217,6 +220,18 @@ def affine_quantize_weights(mlmodel, mode="linear_symmetric", op_selector=None,
             * ``coremltools.converters.mil.mil.types.int8``
             * ``coremltools.converters.mil.mil.types.uint8``
 
+    num_workers: int
+        The number of threads which compress the weights in parallel (the default is 1,
+        which compresses them one after the other, on the calling thread). The graph of
+        the model is always updated on the calling thread.
+
+    chunk_size: int (Optional)
+        If set, each weight is quantized in blocks of rows of about ``chunk_size`` elements,
+        and the quantized values are written into a preallocated array, so that the memory
+        used besides the weight and its quantized copy is bounded by the size of a block.
+        It is useful for the weights, such as large embedding tables, whose temporary copies
+        don't fit in memory. The quantized weights are the same with or without it.
+
     Returns
     -------
     
@@ -233,11 +248,11 @@ def affine_quantize_weights(mlmodel, mode="linear_symmetric", op_selector=None,
     """
     if op_selector is None:
         op_selector = _default_op_selector
-    affine_weight_quantizer = _WeightAffineQuantizer(fake_compression=False, mode=mode, op_selector=op_selector, dtype=dtype)
+    affine_weight_quantizer = _WeightAffineQuantizer(fake_compression=False, mode=mode, op_selector=op_selector, dtype=dtype, num_workers=num_workers, chunk_size=chunk_size)
     return _apply_graph_pass(mlmodel, affine_weight_quantizer)
 
 
-def palettize_weights(mlmodel, nbits=None, mode="kmeans", op_selector=None, lut_function=None):
+def palettize_weights(mlmodel, nbits=None, mode="kmeans", op_selector=None, lut_function=None, num_workers=1):
     """
     Utility function to convert a float precision MLModel of type ``mlprogram`` to a
     compressed MLModel by reducing the overall number of weights using a lookup table
@@ -414,6 +429,12 @@ def palettize_weights(mlmodel, nbits=None, mode="kmeans", op_selector=None, lut_
 
                 return lut, indices
 
+    num_workers: int
+        The number of threads which compress the weights in parallel (the default is 1,
+        which compresses them one after the other, on the calling thread). The graph of
+        the model is always updated on the calling thread. In the ``"custom"`` mode,
+        ``lut_function`` is called from several threads at once if ``num_workers > 1``.
+
     Returns
     -------
     model: MLModel
@@ -432,11 +453,11 @@ def palettize_weights(mlmodel, nbits=None, mode="kmeans", op_selector=None, lut_
     """
     if op_selector is None:
         op_selector = _default_op_selector        
-    weight_palettizer = _WeightPalettizer(nbits=nbits, fake_compression=False, op_selector=op_selector, mode=mode, lut_function=lut_function)
+    weight_palettizer = _WeightPalettizer(nbits=nbits, fake_compression=False, op_selector=op_selector, mode=mode, lut_function=lut_function, num_workers=num_workers)
     return _apply_graph_pass(mlmodel, weight_palettizer)
     
 
-def sparsify_weights(mlmodel, mode="threshold_based", threshold=1e-3, target_percentile=1.0, op_selector=None):
+def sparsify_weights(mlmodel, mode="threshold_based", threshold=1e-3, target_percentile=1.0, op_selector=None, num_workers=1, chunk_size=None):
     """
     Utility function to convert a float precision MLModel of type ``mlprogram`` to a
     compressed MLModel using sparse representation. The ``const`` ops storing weight
@@ -543,6 +564,18 @@ def sparsify_weights(mlmodel, mode="threshold_based", threshold=1e-3, target_per
               def op_selector(const_op):
                     returm const_op.val.val.size > 2048:
   
+    num_workers: int
+        The number of threads which compress the weights in parallel (the default is 1,
+        which compresses them one after the other, on the calling thread). The graph of
+        the model is always updated on the calling thread.
+
+    chunk_size: int (Optional)
+        If set, each weight is sparsified in blocks of about ``chunk_size`` elements, and the
+        mask and the nonzero values are written into preallocated arrays, so that the memory
+        used besides the weight and its sparse copy is bounded by the size of a block (the
+        ``percentile_based`` mode still needs a copy of the absolute values of the weight).
+        The sparse weights are the same with or without it.
+
     Returns
     -------
     model: MLModel
@@ -559,7 +592,7 @@ def sparsify_weights(mlmodel, mode="threshold_based", threshold=1e-3, target_per
     """
     if op_selector is None:
         op_selector = _default_op_selector
-    weight_sparsifier = _WeightSparsifier(mode=mode, threshold=threshold, target_percentile=target_percentile, op_selector=op_selector)
+    weight_sparsifier = _WeightSparsifier(mode=mode, threshold=threshold, target_percentile=target_percentile, op_selector=op_selector, num_workers=num_workers, chunk_size=chunk_size)
     return _apply_graph_pass(mlmodel, weight_sparsifier)
 
 def decompress_weights(mlmodel):
@@ -20,9 +20,12 @@ from coremltools.converters.mil.mil.program import Program as _Program
 from ..proto import FeatureTypes_pb2 as _ft
 from ..proto import MIL_pb2 as _MIL_pb2
 from ..proto import Model_pb2 as _Model_pb2
+from ._spec_inspection import ReadOnlyMessage as _ReadOnlyMessage
+from ._spec_inspection import get_summary as _get_summary
 from .utils import (_MLMODEL_EXTENSION, _MLPACKAGE_AUTHOR_NAME,
                     _MLPACKAGE_EXTENSION, _WEIGHTS_DIR_NAME, _create_mlpackage,
-                    _has_custom_layer, _is_macos, _macos_version)
+                    _has_custom_layer, _is_macos, _link_or_copy_tree,
+                    _macos_version)
 from .utils import load_spec as _load_spec
 from .utils import save_spec as _save_spec
 
@@ -433,6 +436,12 @@ class MLModel:
         Save the model to a ``.mlmodel`` format. For an MIL program, the save_path is
         a package directory containing the ``mlmodel`` and weights.
 
+        If the package of the model is a temporary one, e.g. the package of a model returned
+        by ``coremltools.convert`` without ``package_dir``, its files are hard linked into
+        ``save_path`` rather than copied whenever both are on the same file system, so that
+        large weights are neither copied nor stored twice. To write the weights once, into
+        their final location, pass ``package_dir`` to ``coremltools.convert`` instead.
+
         Parameters
         ----------
         save_path: Target file path / bundle directory for the model.
@@ -456,14 +465,27 @@ class MLModel:
                 save_path = "{}{}".format(save_path, _MLPACKAGE_EXTENSION)
             elif ext != _MLPACKAGE_EXTENSION:
                 raise Exception("For an ML Program, extension must be {} (not {})".format(_MLPACKAGE_EXTENSION, ext))
-            _shutil.copytree(self.package_path, save_path)
+            if self.is_temp_package:
+                # Nothing else writes to the temporary package, so it can share its files
+                _link_or_copy_tree(self.package_path, save_path)
+            else:
+                _shutil.copytree(self.package_path, save_path)
         else:
             _save_spec(self._spec, save_path)
 
-    def get_spec(self):
+    def get_spec(self, read_only=False):
         """
         Get a deep copy of the protobuf specification of the model.
 
+        Parameters
+        ----------
+        read_only: bool
+            If ``True``, return a read-only view of the specification instead of a copy.
+            The view is free to create, whereas a copy of a neural network with large
+            weights can take a lot of time and memory. Modifying the view raises an
+            ``AttributeError``, and ``copy.deepcopy(view)`` returns a modifiable copy.
+            The view reflects later changes of the model, such as to its metadata.
+
         Returns
         -------
         model: Model_pb2
@@ -472,9 +494,32 @@ class MLModel:
         Examples
         --------
         spec = model.get_spec()
+        layer_types = [layer.WhichOneof("layer") for layer in model.get_spec(read_only=True).neuralNetwork.layers]
         """
+        if read_only:
+            return _ReadOnlyMessage(self._spec)
         return _deepcopy(self._spec)
 
+    def get_summary(self):
+        """
+        Get a summary of the model, without copying its specification.
+
+        Returns
+        -------
+        summary: ModelSummary
+            Named tuple with the fields ``model_type``, ``specification_version``,
+            ``inputs`` and ``outputs`` (lists of feature names), ``op_counts``
+            (``collections.Counter`` of the types of the layers of a neural network, or of
+            the operations of an ML program) and ``weight_bytes`` (size of the weights,
+            including the weight files of an ML program).
+
+        Examples
+        --------
+        summary = model.get_summary()
+        num_convs = summary.op_counts["conv"]
+        """
+        return _get_summary(self._spec, self.weights_dir)
+
 
     def predict(self, data):
         """
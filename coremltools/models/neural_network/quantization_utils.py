@@ -26,6 +26,8 @@ from ... import (_MINIMUM_FP16_SPEC_VERSION,
                  _MINIMUM_QUANTIZED_MODEL_SPEC_VERSION,
                  _SPECIFICATION_VERSION_IOS_14)
 from ..._deps import _HAS_SKLEARN as _HAS_SKLEARN
+from .._bit_packing import pack_bits as _pack_bits
+from .._bit_packing import unpack_bits as _unpack_bits
 from ..utils import _get_model, _macos_version, _wp_to_fp16wp
 from .optimization_utils import _optimize_nn
 
@@ -272,63 +274,37 @@ def _convert_1bit_array_to_byte_array(arr):
     """
     Convert bit array to byte array.
 
-    arr: list
-        Bits as a list where each element is an integer of 0 or 1
+    arr: list or numpy.array
+        Bits where each element is an integer of 0 or 1
 
     Returns
     -------
     numpy.array
-        1D numpy array of type uint8
+        1D numpy array of type uint8, holding at least one byte
     """
-    # Padding if necessary
-    while len(arr) < 8 or len(arr) % 8:
-        arr.append(0)
-
-    arr = _np.array(arr, dtype="uint8")
-    bit_arr = []
-    idx = 0
-    # Iterate and combine 8-bits into a uint8
-    for arr_idx in range(int(len(arr) / 8)):
-        bit_arr.append(
-            ((arr[idx] << 7) & (1 << 7))
-            | ((arr[idx + 1] << 6) & (1 << 6))
-            | ((arr[idx + 2] << 5) & (1 << 5))
-            | ((arr[idx + 3] << 4) & (1 << 4))
-            | ((arr[idx + 4] << 3) & (1 << 3))
-            | ((arr[idx + 5] << 2) & (1 << 2))
-            | ((arr[idx + 6] << 1) & (1 << 1))
-            | ((arr[idx + 7] << 0) & (1 << 0))
-        )
-        idx += 8
-    return _np.array(bit_arr, dtype="uint8")
+    return _convert_array_to_nbit_quantized_bytes(arr, 1)
 
 
 def _convert_array_to_nbit_quantized_bytes(arr, nbits):
-    split_arr = []
-    for idx in range(len(arr)):
-        for i in reversed(range(nbits)):
-            split_arr.append((arr[idx] >> i) & (1 << 0))
-
-    return _convert_1bit_array_to_byte_array(split_arr)
+    byte_arr = _pack_bits(arr, nbits)
+    if byte_arr.size == 0:
+        return _np.zeros((1,), dtype=_np.uint8)
+    return byte_arr
 
 
 def _decompose_bytes_to_bit_arr(arr):
     """
     Unpack bytes to bits
 
-    arr: list
-        Byte Stream, as a list of uint8 values
+    arr: list or numpy.array
+        Byte Stream of uint8 values
 
     Returns
     -------
-    bit_arr: list
-        Decomposed bit stream as a list of 0/1s of length (len(arr) * 8)
+    bit_arr: numpy.array
+        Decomposed bit stream of 0/1s of length (len(arr) * 8)
     """
-    bit_arr = []
-    for idx in range(len(arr)):
-        for i in reversed(range(8)):
-            bit_arr.append((arr[idx] >> i) & (1 << 0))
-    return bit_arr
+    return _np.unpackbits(_np.asarray(arr, dtype=_np.uint8))
 
 
 def _get_linear_lookup_table_and_weight(nbits, wp):
@@ -613,12 +589,7 @@ def _quantize_wp_field(wp, nbits, qm, shape, axis=0, **kwargs):
 
 def _unpack_to_bytes(byte_arr, num_weights, nbits):
     assert num_weights % 1 == 0
-    num_weights = int(num_weights)
-    bit_arr = _decompose_bytes_to_bit_arr(byte_arr.flatten().tolist())
-    bit_arr = _np.array(bit_arr[: num_weights * nbits]).reshape((num_weights, nbits))
-    expo = 2 ** _np.array(list(reversed(range(0, nbits))))
-    byte_arr = _np.sum(bit_arr * expo, axis=1)
-    return byte_arr
+    return _unpack_bits(byte_arr, int(num_weights), nbits)
 
 
 def _dequantize_linear(weight_8bit, scale, bias, axis=0):
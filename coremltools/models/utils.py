@@ -58,19 +58,13 @@ def _remove_invalid_keys(input_dict, model):
             del input_dict[k]
 
 
-def _create_mlpackage(
-    proto_spec: _Model_pb2,
-    weights_dir: _Optional[str] = None,
-    package_path: _Optional[str] = None,
-) -> str:
+def _create_empty_mlpackage(package_path: _Optional[str] = None) -> str:
     """
     Args:
-        proto_spec: The proto spec of the model.
-        weights_dir: Copy weights from this path to the mlpackage.
         package_path: Place the created mlpackage at this path. Error out if this path is a non-empty directory.
 
     Returns:
-        path to the mlpackage
+        path to the mlpackage, which doesn't have a root model yet
     """
     if package_path is None:
         package_path = _tempfile.mkdtemp(suffix=_MLPACKAGE_EXTENSION)
@@ -88,6 +82,31 @@ def _create_mlpackage(
             f"For an ML Package, extension must be {_MLPACKAGE_EXTENSION} (not {ext})"
         )
 
+    _ModelPackage(package_path)
+    return package_path
+
+
+def _add_weights_dir_to_mlpackage(package_path: str) -> str:
+    """
+    Args:
+        package_path: Path to an mlpackage without weights.
+
+    Returns:
+        path to the empty weights directory added to the mlpackage, where the weight files
+        can be written in place
+    """
+    package = _ModelPackage(package_path)
+    with _tempfile.TemporaryDirectory() as empty_dir:
+        package.addItem(
+            empty_dir,
+            _WEIGHTS_DIR_NAME,
+            _MLPACKAGE_AUTHOR_NAME,
+            "CoreML Model Weights",
+        )
+    return package.findItemByNameAuthor(_WEIGHTS_DIR_NAME, _MLPACKAGE_AUTHOR_NAME).path()
+
+
+def _set_mlpackage_root_model(package_path: str, proto_spec: _Model_pb2) -> None:
     package = _ModelPackage(package_path)
 
     # Save proto to disk as the root model file, and copy into the model package.
@@ -99,9 +118,27 @@ def _create_mlpackage(
     # Spec file is auto cleaned after close, which is fine because it is already added to the model package.
     spec_file.close()
 
+
+def _create_mlpackage(
+    proto_spec: _Model_pb2,
+    weights_dir: _Optional[str] = None,
+    package_path: _Optional[str] = None,
+) -> str:
+    """
+    Args:
+        proto_spec: The proto spec of the model.
+        weights_dir: Copy weights from this path to the mlpackage.
+        package_path: Place the created mlpackage at this path. Error out if this path is a non-empty directory.
+
+    Returns:
+        path to the mlpackage
+    """
+    package_path = _create_empty_mlpackage(package_path)
+    _set_mlpackage_root_model(package_path, proto_spec)
+
     # Add weights bundle into the model package.
     if weights_dir is not None:
-        package.addItem(
+        _ModelPackage(package_path).addItem(
             weights_dir,
             _WEIGHTS_DIR_NAME,
             _MLPACKAGE_AUTHOR_NAME,
@@ -111,6 +148,21 @@ def _create_mlpackage(
     return package_path
 
 
+def _link_or_copy_tree(src: str, dst: str) -> None:
+    """
+    Copies the directory ``src`` to ``dst``, which must not exist, hard linking the files
+    instead of copying them when possible (i.e. when both are on the same file system).
+    """
+    def _link_or_copy(src_file, dst_file):
+        try:
+            _os.link(src_file, dst_file)
+        except OSError:
+            _shutil.copy2(src_file, dst_file)
+        return dst_file
+
+    _shutil.copytree(src, dst, copy_function=_link_or_copy)
+
+
 def save_spec(spec, filename, auto_set_specification_version=False, weights_dir=None):
     """
     Save a protobuf model specification to file.
@@ -23,6 +23,7 @@ EXPECTED_MODULES = [
             "ComputeUnit",
             "EnumeratedShapes",
             "ImageType",
+            "PassPipeline",
             "RangeDim",
             "SPECIFICATION_VERSION",
             "Shape",
@@ -85,6 +86,7 @@ class TestApiVisibilities:
         expected = [
             "author",
             "get_spec",
+            "get_summary",
             "input_description",
             "license",
             "output_description",
@@ -150,6 +152,7 @@ class TestApiVisibilities:
             "RangeDim",
             "Shape",
             "TensorType",
+            "batch_convert",
             "convert",
             "libsvm",
             "mil",
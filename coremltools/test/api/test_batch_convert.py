@@ -0,0 +1,85 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+import os
+
+import pytest
+
+import coremltools as ct
+from coremltools._deps import _HAS_TORCH, MSG_TORCH_NOT_FOUND
+from coremltools.converters.mil import Builder as mb
+
+if _HAS_TORCH:
+    import torch
+
+
+def _get_program():
+    @mb.program(input_specs=[mb.TensorSpec(shape=(2, 3))])
+    def prog(x):
+        return mb.relu(x=x)
+
+    return prog
+
+
+class TestBatchConvert:
+    @staticmethod
+    def test_in_process(tmpdir):
+        jobs = [
+            {
+                "model": _get_program(),
+                "convert_to": "neuralnetwork",
+                "output_path": str(tmpdir.join("model.mlmodel")),
+            },
+            {
+                "model": _get_program(),
+                "convert_to": "neuralnetwork",
+                "minimum_deployment_target": "not_a_target",
+                "output_path": str(tmpdir.join("failing.mlmodel")),
+            },
+        ]
+        results = list(ct.converters.batch_convert(jobs, num_workers=0))
+
+        assert [result.index for result in results] == [0, 1]
+        assert results[0].error is None
+        assert os.path.exists(results[0].output_path)
+        assert results[0].conversion_time > 0
+        assert results[0].peak_rss is None or results[0].peak_rss > 0
+        # A failing job is reported, and doesn't stop the others
+        assert "not_a_target" in results[1].error
+        assert not os.path.exists(results[1].output_path)
+
+    @staticmethod
+    def test_invalid_arguments():
+        with pytest.raises(ValueError, match="Job 0 has no output_path"):
+            ct.converters.batch_convert([{"model": _get_program()}])
+        with pytest.raises(ValueError, match="num_workers must be a non-negative integer"):
+            ct.converters.batch_convert([], num_workers=-1)
+
+    @staticmethod
+    @pytest.mark.skipif(not _HAS_TORCH, reason=MSG_TORCH_NOT_FOUND)
+    def test_process_pool(tmpdir):
+        torch_model = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.ReLU()).eval()
+        model_path = str(tmpdir.join("model.pt"))
+        torch.jit.trace(torch_model, torch.rand(1, 3, 8, 8)).save(model_path)
+
+        jobs = [
+            {
+                "model": model_path,
+                "inputs": [ct.TensorType(shape=(batch_size, 3, 8, 8))],
+                "convert_to": "neuralnetwork",
+                "output_path": str(tmpdir.join("model_{}.mlmodel".format(batch_size))),
+            }
+            for batch_size in (1, 2, 3)
+        ]
+        results = sorted(
+            ct.converters.batch_convert(jobs, num_workers=2, warm_imports=["torch"])
+        )
+
+        assert [result.index for result in results] == [0, 1, 2]
+        for batch_size, result in zip((1, 2, 3), results):
+            assert result.error is None
+            assert result.peak_rss is None or result.peak_rss > 0
+            spec = ct.models.MLModel(result.output_path, skip_model_load=True).get_spec()
+            assert spec.description.input[0].type.multiArrayType.shape[0] == batch_size
@@ -0,0 +1,56 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+"""
+Benchmark of packing n-bit weights into bytes, and of unpacking them.
+
+Packs and unpacks ``num-elements`` random n-bit values for every nbits from 1 to 8,
+in both bit orders, and reports the throughput in MB/s of unpacked (one byte per
+element) data.
+
+Usage:
+    python -m coremltools.test.benchmarks.bench_bit_packing --num-elements 100000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from coremltools.models._bit_packing import pack_bits, unpack_bits
+
+
+def run(num_elements):
+    results = []
+    for bitorder in ("big", "little"):
+        for nbits in range(1, 9):
+            arr = np.random.randint(0, 2 ** nbits, num_elements).astype(np.uint8)
+
+            start = time.perf_counter()
+            packed = pack_bits(arr, nbits, bitorder=bitorder)
+            pack_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            unpacked = unpack_bits(packed, num_elements, nbits, bitorder=bitorder)
+            unpack_time = time.perf_counter() - start
+
+            assert np.array_equal(unpacked, arr)
+            results.append((bitorder, nbits, pack_time, unpack_time))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--num-elements", type=int, default=100000000)
+    args = parser.parse_args()
+
+    megabytes = args.num_elements / 1e6
+    print("{:<10}{:>6}{:>14}{:>14}".format("bitorder", "nbits", "pack MB/s", "unpack MB/s"))
+    for bitorder, nbits, pack_time, unpack_time in run(args.num_elements):
+        print(
+            "{:<10}{:>6}{:>14.1f}{:>14.1f}".format(
+                bitorder, nbits, megabytes / pack_time, megabytes / unpack_time
+            )
+        )
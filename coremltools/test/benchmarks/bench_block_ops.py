@@ -0,0 +1,85 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+"""
+Benchmark of building and rewriting a large pymil program.
+
+Builds a chain of ``num_ops`` relu ops, then rewrites it the way graph passes do:
+an op is inserted right before every relu, the relu input is rewired to it, and the
+inserted ops are finally rewired away (through the rest of the block, like
+noop_elimination does) and removed.
+
+Usage:
+    python -m coremltools.test.benchmarks.bench_block_ops --num-ops 100000
+"""
+
+import argparse
+import time
+
+from coremltools.converters.mil.mil import Builder as mb
+
+
+def _build_program(num_ops):
+    @mb.program(input_specs=[mb.TensorSpec(shape=(1, 4))])
+    def prog(x):
+        for _ in range(num_ops):
+            x = mb.relu(x=x)
+        return x
+
+    return prog
+
+
+def _insert_ops(block):
+    inserted = []
+    with block:
+        for op in list(block.operations):
+            x = op.inputs["x"]
+            y = mb.identity(x=x, before_op=op)
+            block.replace_uses_of_var_after_op(
+                anchor_op=y.op, end_op=op, old_var=x, new_var=y
+            )
+            inserted.append(y.op)
+    return inserted
+
+
+def _remove_ops(block, ops):
+    for op in ops:
+        block.replace_uses_of_var_after_op(
+            anchor_op=op,
+            old_var=op.outputs[0],
+            new_var=op.inputs["x"],
+            no_check_var_visibility=True,
+        )
+    block.remove_ops(ops)
+
+
+def run(num_ops):
+    timings = []
+
+    start = time.perf_counter()
+    prog = _build_program(num_ops)
+    timings.append(("build", time.perf_counter() - start))
+
+    block = prog.functions["main"]
+
+    start = time.perf_counter()
+    inserted = _insert_ops(block)
+    timings.append(("insert + rewire", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    _remove_ops(block, inserted)
+    timings.append(("rewire + remove", time.perf_counter() - start))
+
+    assert len(block.operations) == num_ops
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--num-ops", type=int, default=100000)
+    args = parser.parse_args()
+
+    for name, seconds in run(args.num_ops):
+        print("{:<20}{:8.2f} s".format(name, seconds))
@@ -0,0 +1,67 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+"""
+Benchmark of the memory used by the affine quantization and the sparsification of a weight.
+
+Compresses a random normal weight of shape ``(rows, cols)``, such as an embedding table,
+with ``WeightAffineQuantizer`` and ``WeightSparsifier``, with and without a ``chunk_size``,
+and reports the time taken and the peak memory allocated by NumPy during the compression
+(as traced by ``tracemalloc``), next to the size of the weight. The weight itself is
+allocated before the tracing starts, so the memory reported includes the compressed copy.
+
+Usage:
+    python -m coremltools.test.benchmarks.bench_chunked_compression --rows 250000 --cols 1024
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from coremltools.converters.mil.mil import types
+from coremltools.converters.mil.mil.passes.compression_passes import (
+    WeightAffineQuantizer,
+    WeightSparsifier,
+)
+
+
+def run(rows, cols, chunk_size):
+    weight = np.random.default_rng(0).standard_normal((rows, cols), dtype=np.float32)
+    compressions = {
+        "affine": lambda chunk_size: WeightAffineQuantizer.compress(
+            weight, 0, "linear", types.int8, chunk_size=chunk_size
+        ),
+        "sparsify": lambda chunk_size: WeightSparsifier.compress(
+            weight, "threshold_based", threshold=0.5, chunk_size=chunk_size
+        ),
+    }
+    results = []
+    for name, compress in compressions.items():
+        for size in (None, chunk_size):
+            tracemalloc.start()
+            start = time.perf_counter()
+            params = compress(size)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del params
+            results.append((name, size, elapsed, peak))
+    return weight.nbytes, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--cols", type=int, default=1024)
+    parser.add_argument("--chunk-size", type=int, default=1 << 20)
+    args = parser.parse_args()
+
+    weight_bytes, results = run(args.rows, args.cols, args.chunk_size)
+    print("fp32 weight: {:.1f} MB".format(weight_bytes / 1e6))
+    print("{:<10}{:>12}{:>10}{:>14}".format("pass", "chunk_size", "seconds", "peak MB"))
+    for name, chunk_size, elapsed, peak in results:
+        print("{:<10}{:>12}{:>10.2f}{:>14.1f}".format(name, str(chunk_size), elapsed, peak / 1e6))
@@ -0,0 +1,89 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+"""
+Benchmark of the generic pattern matching infrastructure on graphs with wide fan-out.
+
+Builds a chain of ``num-instances`` copies of a pattern in which a variable feeds
+``fan-out`` relu ops, each followed by a different unary op, gathered by a concat and a
+reduction. All the relu ops share an op type, so the children of the variable can only
+be told apart by their own children. Every instance is fused by ``fuse_all_blocks``.
+
+Usage:
+    python -m coremltools.test.benchmarks.bench_generic_pattern_matching --fan-out 8
+"""
+
+import argparse
+import time
+
+from coremltools.converters.mil.experimental.passes.generic_pass_infrastructure import \
+    fuse_all_blocks
+from coremltools.converters.mil.mil import Builder as mb
+
+_UNARY_OPS = [
+    mb.sigmoid, mb.tanh, mb.exp, mb.abs, mb.square, mb.sin, mb.cos, mb.floor, mb.ceil, mb.sign
+]
+
+
+def _build_instance(x, fan_out, order):
+    branches = [None] * fan_out
+    for i in order:
+        relu = mb.relu(x=x, name="relu_{}".format(i))
+        branches[i] = _UNARY_OPS[i](x=relu, name="unary_{}".format(i))
+    concat = mb.concat(values=branches, axis=0, name="concat")
+    return mb.reduce_max(x=concat, axes=[0], keep_dims=True, name="reduce")
+
+
+def _build_program(num_instances, fan_out):
+    @mb.program(input_specs=[mb.TensorSpec(shape=(1, 4))])
+    def prog(x):
+        for _ in range(num_instances):
+            x = mb.identity(x=x)
+            # Reversed, so that the children are not in the order of the pattern
+            x = _build_instance(x, fan_out, order=range(fan_out - 1, -1, -1))
+        return x
+
+    return prog
+
+
+def _build_pattern(fan_out):
+    @mb.program(input_specs=[mb.TensorSpec(shape=(1, 4))])
+    def pattern(x):
+        return _build_instance(x, fan_out, order=range(fan_out))
+
+    return pattern
+
+
+def _transform_pattern(pattern):
+    x = mb.relu(x=pattern.root_var, before_op=pattern.final_op)
+    pattern.block.replace_uses_of_var_after_op(
+        anchor_op=pattern.final_op, old_var=pattern.final_op.outputs[0], new_var=x
+    )
+    pattern.block.remove_ops(pattern.op_list())
+
+
+def run(num_instances, fan_out):
+    prog = _build_program(num_instances, fan_out)
+
+    start = time.perf_counter()
+    fuse_all_blocks(
+        ops_arrangement=_build_pattern(fan_out),
+        var_constraints=lambda pattern: True,
+        transform_pattern=_transform_pattern,
+        prog=prog,
+    )
+    seconds = time.perf_counter() - start
+
+    assert len(prog.find_ops(op_type="concat")) == 0
+    return seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--num-instances", type=int, default=20)
+    parser.add_argument("--fan-out", type=int, default=8, choices=range(1, len(_UNARY_OPS) + 1))
+    args = parser.parse_args()
+
+    print("fuse_all_blocks: {:.2f} s".format(run(args.num_instances, args.fan_out)))
@@ -0,0 +1,51 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+"""
+Benchmark of the palettization of a large weight.
+
+Palettizes a random normal weight of ``size`` elements, in fp32 and in fp16, in the
+``kmeans`` and ``unique`` modes of ``WeightPalettizer``, and reports the time taken and
+the mean squared error of the palettized weight. The weight of the ``unique`` mode only
+has ``2 ** nbits`` distinct values.
+
+Usage:
+    python -m coremltools.test.benchmarks.bench_palettization --size 100000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from coremltools.converters.mil.mil.passes.compression_passes import WeightPalettizer
+
+
+def run(size, nbits):
+    rng = np.random.default_rng(0)
+    results = []
+    for dtype in (np.float32, np.float16):
+        weight = rng.standard_normal(size, dtype=np.float32).astype(dtype)
+        lattice = rng.standard_normal(1 << nbits).astype(dtype)
+        for mode in ("kmeans", "unique"):
+            val = weight if mode == "kmeans" else lattice[weight.view(np.uint8)[::weight.itemsize] % len(lattice)]
+            start = time.perf_counter()
+            params = WeightPalettizer.compress(val, mode, nbits=nbits if mode == "kmeans" else None)
+            elapsed = time.perf_counter() - start
+            mse = np.mean((WeightPalettizer.decompress(params).astype(np.float32) - val) ** 2)
+            results.append((np.dtype(dtype).name, mode, elapsed, mse))
+            del val
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10_000_000)
+    parser.add_argument("--nbits", type=int, default=4)
+    args = parser.parse_args()
+
+    print("{:<10}{:<10}{:>12}{:>14}".format("dtype", "mode", "seconds", "mse"))
+    for dtype, mode, elapsed, mse in run(args.size, args.nbits):
+        print("{:<10}{:<10}{:>12.2f}{:>14.3g}".format(dtype, mode, elapsed, mse))
@@ -0,0 +1,62 @@
+#  Copyright (c) 2023, Apple Inc. All rights reserved.
+#
+#  Use of this source code is governed by a BSD-3-clause license that can be
+#  found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
+
+"""
+Benchmark of the memory used by the conversion of the parameters of a PyTorch model.
+
+Converts a traced stack of ``num-layers`` linear layers of size ``hidden-size`` to a MIL
+program, in fp32 and in fp16, and reports the peak and the final memory allocated by
+NumPy and Python during the conversion (as traced by ``tracemalloc``), next to the size
+of the fp32 weights. The weights of the model are held by PyTorch, so the memory
+reported is only the one allocated by the conversion.
+
+Usage:
+    python -m coremltools.test.benchmarks.bench_torch_param_memory --num-layers 8
+"""
+
+import argparse
+import tracemalloc
+
+import torch
+
+import coremltools as ct
+
+
+def _build_traced_model(num_layers, hidden_size):
+    model = torch.nn.Sequential(
+        *[torch.nn.Linear(hidden_size, hidden_size) for _ in range(num_layers)]
+    ).eval()
+    return torch.jit.trace(model, torch.rand(1, hidden_size))
+
+
+def run(num_layers, hidden_size):
+    traced_model = _build_traced_model(num_layers, hidden_size)
+    results = []
+    for precision in (ct.precision.FLOAT32, ct.precision.FLOAT16):
+        tracemalloc.start()
+        prog = ct.convert(
+            traced_model,
+            inputs=[ct.TensorType(shape=(1, hidden_size))],
+            convert_to="milinternal",
+            compute_precision=precision,
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(prog.find_ops(op_type="linear")) == num_layers
+        results.append((precision.value, peak, current))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--num-layers", type=int, default=8)
+    parser.add_argument("--hidden-size", type=int, default=2048)
+    args = parser.parse_args()
+
+    weight_megabytes = args.num_layers * (args.hidden_size + 1) * args.hidden_size * 4 / 1e6
+    print("fp32 weights: {:.1f} MB".format(weight_megabytes))
+    print("{:<12}{:>14}{:>14}".format("precision", "peak MB", "final MB"))
+    for precision, peak, current in run(args.num_layers, args.hidden_size):
+        print("{:<12}{:>14.1f}{:>14.1f}".format(precision, peak / 1e6, current / 1e6))
@@ -64,5 +64,40 @@ class WeightTest(unittest.TestCase):
         output_arr = np.array(reader.read_float_data(offset), np.float32)
         np.testing.assert_almost_equal(input_arr, output_arr)
 
+    def test_weight_blob_buffer_round_trip(self):
+        input_arrs = [
+            np.array([-5, -2, 0, 2, 5], dtype=np.int8),
+            np.array([[1, 2, 3], [4, 5, 6]], dtype=np.uint8),
+            np.array([2.3, 4.6, 7.9], dtype=np.float16),
+            np.array([[1.0, 2.4], [3.9, -4.8]], dtype=np.float32),
+        ]
+        writer = BlobWriter(self.working_dir + "/net.wt")
+        offsets = [
+            writer.write_int8_buffer(input_arrs[0]),
+            writer.write_uint8_buffer(input_arrs[1]),
+            writer.write_fp16_buffer(input_arrs[2]),
+            writer.write_float_buffer(input_arrs[3]),
+        ]
+        writer = None
+
+        reader = BlobReader(self.working_dir + "/net.wt")
+        for input_arr, offset in zip(input_arrs, offsets):
+            assert reader.get_data_size(offset) == input_arr.nbytes
+            output_arr = np.memmap(
+                self.working_dir + "/net.wt",
+                dtype=input_arr.dtype,
+                mode="r",
+                offset=reader.get_data_offset(offset),
+                shape=input_arr.shape,
+            )
+            np.testing.assert_equal(input_arr, output_arr)
+
+    def test_weight_blob_buffer_wrong_type(self):
+        writer = BlobWriter(self.working_dir + "/net.wt")
+        with self.assertRaises(ValueError):
+            writer.write_float_buffer(np.array([1, 2, 3], dtype=np.int32))
+        with self.assertRaises(ValueError):
+            writer.write_float_buffer(np.ones((4, 4), dtype=np.float32)[:, ::2])
+
 if __name__ == "__main__":
     unittest.main()
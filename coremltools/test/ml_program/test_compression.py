@@ -10,7 +10,6 @@ import pytest
 import torch
 
 import coremltools as ct
-from coremltools._deps import _HAS_SKLEARN
 from coremltools.converters.mil.testing_utils import get_op_types_in_program
 from coremltools.converters.mil.mil import types
 
@@ -95,7 +94,6 @@ class TestCompressionUtils:
         assert get_op_types_in_program(mlmodel_no_quantized._mil_program) == expected_ops
 
     @staticmethod
-    @pytest.mark.skipif(not _HAS_SKLEARN, reason="Missing scikit-learn. Skipping tests.")
     def test_weight_decompression():
         """
         This test is doing the following steps
@@ -313,7 +311,7 @@ class TestCompressionUtils:
     @staticmethod
     @pytest.mark.parametrize(
         "mode",
-        ("uniform", "kmeans") if _HAS_SKLEARN else ("uniform",)
+        ("uniform", "kmeans")
     )
     def test_weight_palettization(mode):
         model, inputs, torch_input_values, coreml_input_values = get_test_model_and_data()
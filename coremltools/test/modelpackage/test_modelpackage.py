@@ -3,6 +3,7 @@
 # Use of this source code is governed by a BSD-3-clause license that can be
 # found in the LICENSE.txt file or at https://opensource.org/licenses/BSD-3-Clause
 
+import copy
 import os
 import shutil
 import tempfile
@@ -109,6 +110,39 @@ class TestMLModel:
         # cleanup
         _remove_path(package.name)
 
+    def test_read_only_spec(self):
+        model = MLModel(self.spec)
+        spec = model.get_spec(read_only=True)
+        assert spec == model.get_spec()
+        assert [feature.name for feature in spec.description.input] == ["feature_1", "feature_2"]
+        assert spec.WhichOneof("Type") == "glmRegressor"
+
+        with pytest.raises(AttributeError, match="read-only view"):
+            spec.description.metadata.author = "Test author"
+        with pytest.raises(AttributeError, match="read-only view"):
+            spec.CopyFrom(self.spec)
+        with pytest.raises(AttributeError):
+            spec.description.input.add()
+        with pytest.raises(KeyError):
+            spec.description.metadata.userDefined["key"]
+        assert "key" not in model.get_spec().description.metadata.userDefined
+
+        # The view follows the model, and a deep copy of it can be modified
+        model.author = "Test author"
+        assert spec.description.metadata.author == "Test author"
+        spec_copy = copy.deepcopy(spec)
+        spec_copy.description.metadata.author = "Another author"
+        assert model.author == "Test author"
+
+    def test_summary(self):
+        summary = MLModel(self.spec).get_summary()
+        assert summary.model_type == "glmRegressor"
+        assert summary.specification_version == coremltools.SPECIFICATION_VERSION
+        assert summary.inputs == ["feature_1", "feature_2"]
+        assert summary.outputs == ["output"]
+        assert len(summary.op_counts) == 0
+        assert summary.weight_bytes == 0
+
     def test_predict_api(self):
         model = MLModel(self.spec)
 
@@ -491,6 +525,13 @@ class TestSpecAndMLModelAPIs:
             mlmodel_from_spec = MLModel(spec, weights_dir=weights_dir)
             self._test_mlmodel_correctness(mlmodel_from_spec)
 
+    def test_summary(self):
+        summary = self.mlmodel.get_summary()
+        assert summary.model_type == "mlProgram"
+        assert summary.op_counts["linear"] == 1
+        # The weight of the linear is stored in the weight file, in float16
+        assert summary.weight_bytes >= 100 * 5000 * 2
+
     def test_weights_path_correctness(self):
         """
         test that after reloading an mlmodel from the spec, the weights path is updated
@@ -517,3 +558,49 @@ class TestSpecAndMLModelAPIs:
         # verify that findItemByNameAuthor returns None, when item not found
         model_package_item_info = mlpackage.findItemByNameAuthor(_WEIGHTS_DIR_NAME, "inexistent_author_name")
         assert model_package_item_info is None
+
+    def test_save_temp_package_links_weights(self):
+        """
+        Test that saving a converted model hard links its weights rather than copying them
+        """
+        saved_weights_file = os.path.join(
+            ModelPackage(self.mlpackage_path)
+            .findItemByNameAuthor(_WEIGHTS_DIR_NAME, _MLPACKAGE_AUTHOR_NAME)
+            .path(),
+            utils._WEIGHTS_FILE_NAME,
+        )
+        temp_weights_file = os.path.join(self.mlmodel.weights_dir, utils._WEIGHTS_FILE_NAME)
+        if os.stat(saved_weights_file).st_dev == os.stat(temp_weights_file).st_dev:
+            assert os.path.samefile(saved_weights_file, temp_weights_file)
+
+    def test_convert_weights_into_package_dir(self):
+        @mb.program(input_specs=[mb.TensorSpec(shape=(4, 50))])
+        def prog(x):
+            return mb.linear(x=x, weight=np.random.rand(10, 50))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            package_dir = os.path.join(temp_dir, "model.mlpackage")
+            mlmodel = coremltools.convert(prog, convert_to="mlprogram", package_dir=package_dir)
+            assert mlmodel.package_path == package_dir
+            assert not mlmodel.is_temp_package
+            assert os.path.isfile(os.path.join(mlmodel.weights_dir, utils._WEIGHTS_FILE_NAME))
+            assert os.path.commonpath([mlmodel.weights_dir, package_dir]) == package_dir
+
+    def test_failed_conversion_removes_package_dir(self):
+        import torch
+
+        class TestModule(torch.nn.Module):
+            def forward(self, x):
+                return torch.cumprod(x, 1)
+
+        traced_model = torch.jit.trace(TestModule().eval(), torch.rand(1, 2))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            package_dir = os.path.join(temp_dir, "model.mlpackage")
+            with pytest.raises(RuntimeError, match="'cumprod' not implemented"):
+                coremltools.convert(
+                    traced_model,
+                    convert_to="mlprogram",
+                    inputs=[coremltools.TensorType(shape=(1, 2))],
+                    package_dir=package_dir,
+                )
+            assert not os.path.exists(package_dir)
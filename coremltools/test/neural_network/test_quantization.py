@@ -7,6 +7,7 @@
 Module containing unit tests for verifying various quantizations.
 """
 
+import itertools
 import unittest
 
 import numpy as np
@@ -17,9 +18,11 @@ import coremltools.models.datatypes as datatypes
 from coremltools import ComputeUnit
 from coremltools.models import (_QUANTIZATION_MODE_LINEAR_QUANTIZATION,
                                 neural_network)
+from coremltools.models._bit_packing import pack_bits, unpack_bits
 from coremltools.models.neural_network import quantization_utils
 from coremltools.models.neural_network.quantization_utils import (
-    MatrixMultiplyLayerSelector, _quantize_spec_weights,
+    MatrixMultiplyLayerSelector, _convert_array_to_nbit_quantized_bytes,
+    _quantize_spec_weights, _unpack_to_bytes,
     activate_int8_int8_matrix_multiplications)
 
 
@@ -560,3 +563,45 @@ class TestQuantizeWeightsAPI:
     )
     def test_embeddingND_quantize_CPU_and_NE(self):
         self.test_embeddingND_quantize(ComputeUnit.CPU_AND_NE)
+
+
+class TestBitPacking:
+    @staticmethod
+    @pytest.mark.parametrize(
+        "nbits, num_elements, bitorder",
+        itertools.product(range(1, 9), [1, 7, 8, 1001], ["big", "little"]),
+    )
+    def test_pack_unpack_round_trip(nbits, num_elements, bitorder):
+        arr = np.random.randint(0, 2 ** nbits, num_elements).astype(np.uint8)
+        packed = pack_bits(arr, nbits, bitorder=bitorder)
+        assert packed.dtype == np.uint8
+        assert packed.size == (num_elements * nbits + 7) // 8
+        unpacked = unpack_bits(packed, num_elements, nbits, bitorder=bitorder)
+        np.testing.assert_array_equal(unpacked, arr)
+
+    @staticmethod
+    def test_bit_layout():
+        # 3-bit elements 0b101, 0b011, 0b110 as the bit stream 101 011 110 (+ zero padding)
+        arr = np.array([5, 3, 6], dtype=np.uint8)
+        np.testing.assert_array_equal(pack_bits(arr, 3), [0b10101111, 0b00000000])
+        np.testing.assert_array_equal(
+            _convert_array_to_nbit_quantized_bytes(arr, 3), [0b10101111, 0b00000000]
+        )
+        # Least significant bit first: the bit stream is 101 110 011, and fills the bytes
+        # from their least significant bit
+        np.testing.assert_array_equal(
+            pack_bits(arr, 3, bitorder="little"), [0b10011101, 0b00000001]
+        )
+
+    @staticmethod
+    def test_unpack_to_bytes():
+        arr = np.random.randint(0, 2 ** 4, 9).astype(np.uint8)
+        byte_arr = _convert_array_to_nbit_quantized_bytes(arr, 4)
+        np.testing.assert_array_equal(_unpack_to_bytes(byte_arr, 9.0, 4), arr)
+
+    @staticmethod
+    def test_invalid_args():
+        with pytest.raises(ValueError, match="nbits must be an integer between 1 and 8"):
+            pack_bits(np.zeros(4), 9)
+        with pytest.raises(ValueError, match="bytes can't hold 9 elements of 4 bits"):
+            unpack_bits(np.zeros(4, dtype=np.uint8), 9, 4)
@@ -9,6 +9,7 @@
 #include "MILBlob/Util/SpanCast.hpp"
 
 #include <memory>
+#include <stdexcept>
 
 using namespace CoreML::MilStoragePython;
 
@@ -61,6 +62,42 @@ u_int64_t MilStoragePythonWriter::write_float_data(const std::vector<float>& dat
     return writeData<float>(*m_writer, data);
 }
 
+namespace {
+    template <typename T>
+    MILBlob::Util::Span<const T> bufferToSpan(pybind11::buffer& data, const std::string& format) {
+        pybind11::buffer_info info = data.request();
+        if (info.itemsize != sizeof(T) || info.format != format) {
+            throw std::invalid_argument("Buffer has format '" + info.format + "', expected '" + format + "'");
+        }
+        // Only C-contiguous buffers can be written without a copy.
+        size_t expectedStride = info.itemsize;
+        for (size_t i = info.ndim; i > 0; --i) {
+            if (info.shape[i - 1] > 1 && info.strides[i - 1] != expectedStride) {
+                throw std::invalid_argument("Buffer must be C-contiguous");
+            }
+            expectedStride *= info.shape[i - 1];
+        }
+        return MILBlob::Util::Span<const T>(static_cast<const T*>(info.ptr), info.size);
+    }
+}
+
+u_int64_t MilStoragePythonWriter::write_int8_buffer(pybind11::buffer data) {
+    return m_writer->WriteData(bufferToSpan<int8_t>(data, "b"));
+}
+
+u_int64_t MilStoragePythonWriter::write_uint8_buffer(pybind11::buffer data) {
+    return m_writer->WriteData(bufferToSpan<uint8_t>(data, "B"));
+}
+
+u_int64_t MilStoragePythonWriter::write_fp16_buffer(pybind11::buffer data) {
+    auto intSpan = bufferToSpan<uint16_t>(data, "e");
+    return m_writer->WriteData(MILBlob::Util::SpanCast<const MILBlob::Fp16>(intSpan));
+}
+
+u_int64_t MilStoragePythonWriter::write_float_buffer(pybind11::buffer data) {
+    return m_writer->WriteData(bufferToSpan<float>(data, "f"));
+}
+
 
 /*
  *
@@ -109,3 +146,11 @@ const std::vector<uint16_t> MilStoragePythonReader::read_fp16_data(uint64_t offs
 const std::vector<float> MilStoragePythonReader::read_float_data(uint64_t offset) {
     return readData<float>(*m_reader, offset);
 }
+
+uint64_t MilStoragePythonReader::get_data_offset(uint64_t offset) {
+    return m_reader->GetDataOffset(offset);
+}
+
+uint64_t MilStoragePythonReader::get_data_size(uint64_t offset) {
+    return m_reader->GetDataSize(offset);
+}
@@ -9,6 +9,14 @@
 #include <string>
 #include <vector>
 
+#pragma clang diagnostic push
+#pragma clang diagnostic ignored "-Wexit-time-destructors"
+#pragma clang diagnostic ignored "-Wdocumentation"
+#pragma clang diagnostic ignored "-Wrange-loop-analysis"
+#pragma clang diagnostic ignored "-Wdeprecated-declarations"
+#include <pybind11/pybind11.h>
+#pragma clang diagnostic pop
+
 
 namespace MILBlob {
 namespace Blob {
@@ -35,6 +43,14 @@ namespace CoreML {
             u_int64_t write_fp16_data(const std::vector<uint16_t>& data);
             u_int64_t write_float_data(const std::vector<float>& data);
 
+            // Buffer protocol variants: the data is written straight from the
+            // memory of the given object (e.g. a contiguous numpy array)
+            // without first being converted into a std::vector.
+            u_int64_t write_int8_buffer(pybind11::buffer data);
+            u_int64_t write_uint8_buffer(pybind11::buffer data);
+            u_int64_t write_fp16_buffer(pybind11::buffer data);
+            u_int64_t write_float_buffer(pybind11::buffer data);
+
         private:
             std::unique_ptr<MILBlob::Blob::StorageWriter> m_writer;
         };
@@ -54,6 +70,11 @@ namespace CoreML {
             const std::vector<uint16_t> read_fp16_data(uint64_t offset);
             const std::vector<float> read_float_data(uint64_t offset);
 
+            // Location of the raw data in the file, for callers that map the
+            // file themselves instead of copying the data out.
+            uint64_t get_data_offset(uint64_t offset);
+            uint64_t get_data_size(uint64_t offset);
+
         private:
             std::unique_ptr<MILBlob::Blob::StorageReader> m_reader;
         };
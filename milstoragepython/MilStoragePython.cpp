@@ -36,14 +36,20 @@ PYBIND11_PLUGIN(libmilstoragepython) {
       .def("write_int8_data", &MilStoragePythonWriter::write_int8_data)
       .def("write_uint8_data", &MilStoragePythonWriter::write_uint8_data)
       .def("write_fp16_data", &MilStoragePythonWriter::write_fp16_data)
-      .def("write_float_data", &MilStoragePythonWriter::write_float_data);
+      .def("write_float_data", &MilStoragePythonWriter::write_float_data)
+      .def("write_int8_buffer", &MilStoragePythonWriter::write_int8_buffer)
+      .def("write_uint8_buffer", &MilStoragePythonWriter::write_uint8_buffer)
+      .def("write_fp16_buffer", &MilStoragePythonWriter::write_fp16_buffer)
+      .def("write_float_buffer", &MilStoragePythonWriter::write_float_buffer);
 
     py::class_<MilStoragePythonReader> blobStorageReader(m, "_BlobStorageReader");
     blobStorageReader.def(py::init<std::string>())
       .def("read_int8_data", &MilStoragePythonReader::read_int8_data)
       .def("read_uint8_data", &MilStoragePythonReader::read_uint8_data)
       .def("read_fp16_data", &MilStoragePythonReader::read_fp16_data)
-      .def("read_float_data", &MilStoragePythonReader::read_float_data);
+      .def("read_float_data", &MilStoragePythonReader::read_float_data)
+      .def("get_data_offset", &MilStoragePythonReader::get_data_offset)
+      .def("get_data_size", &MilStoragePythonReader::get_data_size);
 
     return m.ptr();
 }